@@ -1,68 +1,182 @@
 import os
+import tempfile
+from functools import partial
 from flask import Flask, jsonify
+from flask.helpers import get_debug_flag
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
 from database import db
-from models import bcrypt
 from routes.auth_routes import auth_bp
 from routes.student_routes import student_bp
 from routes.teacher_routes import teacher_bp
 from routes.institution_routes import institution_bp
 from routes.admin_routes import admin_bp
+from routes.job_routes import jobs_bp
+from utils.identity import init_identity, load_user
+from utils.revocation import init_revocation
+from utils.reference_data import init_reference_cache
+from utils.jobs import job_queue
+from utils.rollups import init_rollups
+from utils.db_pool import engine_options, init_db_pool
+from utils.db_routing import replica_binds, init_db_routing
+from utils.log import init_logging, log_event, logger
+from utils.passwords import init_password_hashing
+from utils.rate_limit import init_rate_limiting
+from utils.json_provider import init_json
+from utils.conditional import init_conditional
 
 load_dotenv()
 
 app = Flask(__name__)
 
 # --- Configurations ---
+# 'production' never enables the reloader or the Werkzeug debugger; 'development' does
+app.config['APP_ENV'] = os.environ.get('APP_ENV', 'production')
+app.config['APP_HOST'] = os.environ.get('APP_HOST', '127.0.0.1')
+app.config['APP_PORT'] = int(os.environ.get('APP_PORT', 5000))
+# Logging: level, json | text, file (empty = stderr), per-event sampling of DEBUG events
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'json')
+app.config['LOG_FILE'] = os.environ.get('LOG_FILE', '')
+app.config['LOG_SAMPLE_RATES'] = os.environ.get('LOG_SAMPLE_RATES', 'auth.user_lookup=0.01,http.request=0.01')
+app.config['LOG_SAMPLE_DEFAULT'] = float(os.environ.get('LOG_SAMPLE_DEFAULT', 1.0))
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# JSON encoding: auto (orjson if installed) | orjson | stdlib; key sorting costs CPU on big payloads
+app.config['JSON_PROVIDER'] = os.environ.get('JSON_PROVIDER', 'auto')
+app.config['JSON_SORT_KEYS'] = os.environ.get('JSON_SORT_KEYS', '1') == '1'
+# bcrypt cost for new hashes; logins with a different stored cost are rehashed
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+# Hash in N worker processes (0 = on the request thread); over MAX_PENDING in flight -> 503
+app.config['PASSWORD_POOL_WORKERS'] = int(os.environ.get('PASSWORD_POOL_WORKERS', 0))
+app.config['PASSWORD_POOL_MAX_PENDING'] = int(os.environ.get('PASSWORD_POOL_MAX_PENDING', 0))
+app.config['PASSWORD_POOL_TIMEOUT'] = float(os.environ.get('PASSWORD_POOL_TIMEOUT', 10))
+# Bulk provisioning: rows per transaction, hashing processes (0 = one per CPU) and
+# bcrypt cost for the batch (0 = BCRYPT_LOG_ROUNDS; lower costs are upgraded on first login)
+app.config['PROVISION_BATCH_ROWS'] = int(os.environ.get('PROVISION_BATCH_ROWS', 1000))
+app.config['PROVISION_HASH_WORKERS'] = int(os.environ.get('PROVISION_HASH_WORKERS', 0))
+app.config['PROVISION_BCRYPT_ROUNDS'] = int(os.environ.get('PROVISION_BCRYPT_ROUNDS', 0))
+# Token-bucket rate limits, '<blueprint>.<key>=<requests>/<seconds>' separated by ';'.
+# 'ip' is charged on every request to the blueprint; login charges 'email' per failed attempt
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+app.config['RATE_LIMITS'] = os.environ.get('RATE_LIMITS', 'auth_bp.ip=30/60;auth_bp.email=5/300')
+# Bucket store: memory (per process) | redis | fakeredis
+app.config['RATE_LIMIT_BACKEND'] = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+app.config['RATE_LIMIT_REDIS_URL'] = os.environ.get('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0')
+app.config['RATE_LIMIT_MAX_KEYS'] = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+# Reverse proxies in front of the app: trust this many X-Forwarded-For entries so the
+# 'ip' limit (and read-your-writes marks) see the client, not the proxy. 0 = not proxied
+app.config['PROXY_FIX_X_FOR'] = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+# Connection pool: size + overflow, checkout timeout and recycle age (seconds), pre-ping
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+# MySQL SELECT timeout (ms, 0 = off); queries slower than DB_SLOW_QUERY_MS are kept for /api/admin/metrics/db
+app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+app.config['DB_SLOW_QUERY_MS'] = float(os.environ.get('DB_SLOW_QUERY_MS', 500))
+app.config['DB_SLOW_QUERY_LOG'] = int(os.environ.get('DB_SLOW_QUERY_LOG', 50))
+# Read replicas (comma-separated URLs, bound as replica_0, replica_1, ...; none = primary only)
+app.config['DB_REPLICA_URLS'] = [url.strip() for url in os.environ.get('DB_REPLICA_URLS', '').split(',') if url.strip()]
+app.config['SQLALCHEMY_BINDS'] = replica_binds(app.config['DB_REPLICA_URLS'])
+# GETs of these blueprints/endpoints read from a replica; DB_PRIMARY_ROUTES wins over both
+app.config['DB_REPLICA_ROUTES'] = os.environ.get('DB_REPLICA_ROUTES', 'student_bp,teacher_bp,institution_bp,admin_bp')
+app.config['DB_PRIMARY_ROUTES'] = os.environ.get('DB_PRIMARY_ROUTES', '')
+# After a write, that user's reads stay on the primary for this many seconds
+app.config['DB_REPLICA_STICKY_SECONDS'] = float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+# Cross-request identity cache (seconds); 0 keeps it to one lookup per request
+app.config['IDENTITY_CACHE_TTL'] = float(os.environ.get('IDENTITY_CACHE_TTL', 0))
+app.config['IDENTITY_CACHE_SIZE'] = int(os.environ.get('IDENTITY_CACHE_SIZE', 1024))
+# 'database' re-checks the role per request; 'claims' trusts the signed token + revocation list
+app.config['AUTH_MODE'] = os.environ.get('AUTH_MODE', 'database')
+app.config['REVOCATION_BACKEND'] = os.environ.get('REVOCATION_BACKEND', 'memory')
+app.config['REVOCATION_SQLITE_PATH'] = os.environ.get('REVOCATION_SQLITE_PATH', 'revocations.sqlite3')
+app.config['REVOCATION_SYNC_INTERVAL'] = float(os.environ.get('REVOCATION_SYNC_INTERVAL', 1.0))
+# Per-route query budgets: off | warn | raise (use 'raise' in test runs)
+app.config['QUERY_BUDGET_MODE'] = os.environ.get('QUERY_BUDGET_MODE', 'off')
+# Reference data cache (schemes, events, institution profiles): memory | redis | fakeredis
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')
+app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+app.config['CACHE_DEFAULT_TTL'] = float(os.environ.get('CACHE_DEFAULT_TTL', 300))
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+# Background jobs: worker threads, per-institution concurrency, memory | sqlite store
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 4))
+app.config['JOB_MAX_PER_INSTITUTION'] = int(os.environ.get('JOB_MAX_PER_INSTITUTION', 1))
+app.config['JOB_STORE'] = os.environ.get('JOB_STORE', 'memory')
+app.config['JOB_SQLITE_PATH'] = os.environ.get('JOB_SQLITE_PATH', 'jobs.sqlite3')
+# Processes sharing the sqlite store renew a lease on their running jobs every third of this;
+# a running job whose lease lapsed (its process died) is failed
+app.config['JOB_LEASE_SECONDS'] = float(os.environ.get('JOB_LEASE_SECONDS', 60))
+# Uploads spooled for jobs (owner-only); files older than JOB_UPLOAD_MAX_AGE seconds are swept at startup
+app.config['JOB_UPLOAD_DIR'] = os.environ.get('JOB_UPLOAD_DIR') or os.path.join(tempfile.gettempdir(), 'edusamagra-uploads')
+app.config['JOB_UPLOAD_MAX_AGE'] = float(os.environ.get('JOB_UPLOAD_MAX_AGE', 86400))
+# KPI rollups: 'commit' applies per-row deltas in the writing transaction, 'deferred' leaves it to the job
+app.config['ROLLUP_REFRESH'] = os.environ.get('ROLLUP_REFRESH', 'commit')
+app.config['ROLLUP_REFRESH_INTERVAL'] = float(os.environ.get('ROLLUP_REFRESH_INTERVAL', 0))
+# Analytics passes: rows per chunk, and how long results are cached (seconds)
+app.config['ANALYTICS_CHUNK_ROWS'] = int(os.environ.get('ANALYTICS_CHUNK_ROWS', 100000))
+app.config['ANALYTICS_CACHE_WINDOW'] = float(os.environ.get('ANALYTICS_CACHE_WINDOW', 3600))
+# Conditional GET: ETags from per-user/institution version tokens kept in the CACHE_BACKEND store.
+# On by default only with a shared store: memory tokens are per process, so with several workers
+# one worker would answer 304 for a write another worker made (see init_conditional)
+app.config['ETAG_ENABLED'] = os.environ.get('ETAG_ENABLED', '0' if app.config['CACHE_BACKEND'] == 'memory' else '1') == '1'
+app.config['ETAG_VERSION_TTL'] = float(os.environ.get('ETAG_VERSION_TTL', 86400))
+app.config['ETAG_VERSION_MAX_ENTRIES'] = int(os.environ.get('ETAG_VERSION_MAX_ENTRIES', 100000))
+
+if app.config['APP_ENV'] == 'production' and get_debug_flag():
+    # The debugger allows arbitrary code execution from the browser
+    raise RuntimeError("FLASK_DEBUG is set but APP_ENV is 'production'; use APP_ENV=development")
 
 # --- Initializations ---
+if app.config['PROXY_FIX_X_FOR']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+init_logging(app)
+init_json(app)
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
 db.init_app(app)
-bcrypt.init_app(app)
+init_db_pool(app)
+init_db_routing(app)
+init_password_hashing(app)
+init_rate_limiting(app)
 jwt = JWTManager(app)
+init_identity(app)
+init_revocation(app, jwt)
+init_reference_cache(app)
+job_queue.init_app(app)
+init_rollups(app)
+init_conditional(app)
 
 # --- JWT Claims Loaders ---
 from models import User
 
 @jwt.user_lookup_loader
 def user_lookup_callback(_jwt_header, jwt_data):
-    # --- DEBUG PRINT ---
-    print("--- 1. USER LOOKUP LOADER ---")
     identity = jwt_data.get("sub")
-    print(f"Identity (sub) from token: {identity}")
     if identity is None:
-        print("ERROR: Token has no 'sub' (identity) claim!")
+        logger.warning("Token has no 'sub' (identity) claim", extra={"jti": jwt_data.get("jti")})
         return None
-        
-    user = User.query.get(identity)
-    print(f"User.query.get(identity) result: {user}")
-    print("--- END USER LOOKUP ---")
-    return user
-    # --- END DEBUG ---
+    log_event('auth.user_lookup', identity=identity)
+
+    # Deferred until first use, so AUTH_MODE='claims' requests never touch the DB
+    return LocalProxy(partial(load_user, identity))
 
 
 @jwt.additional_claims_loader
 def add_claims_to_access_token(identity):
-    # --- DEBUG PRINT ---
-    print("--- 2. ADDITIONAL CLAIMS LOADER ---")
-    print(f"Identity received: {identity}")
-    user = User.query.get(identity)
-    print(f"User.query.get(identity) result: {user}")
-    
+    # Login has already loaded this user, so the identity map answers without SQL
+    user = db.session.get(User, int(identity))
     if user:
-        print(f"Adding role '{user.role}' to token")
-        print("--- END CLAIMS ---")
+        log_event('auth.claims', identity=identity, role=user.role)
         return {"role": user.role}
-        
-    print("ERROR: Could not find user to add claims.")
-    print("--- END CLAIMS ---")
+
+    logger.warning("Could not find user to add claims", extra={"identity": identity})
     return {}
-    # --- END DEBUG ---
 
 
 # --- Register Blueprints ---
@@ -71,6 +185,7 @@ app.register_blueprint(student_bp, url_prefix='/api/student')
 app.register_blueprint(teacher_bp, url_prefix='/api/teacher')
 app.register_blueprint(institution_bp, url_prefix='/api/institution')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
+app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
 
 # --- Base Route ---
 @app.route('/')
@@ -82,5 +197,7 @@ if __name__ == '__main__':
         # Optional: create all tables if they don't exist
         # db.create_all() 
         pass
-    # --- DEBUG MODE ENABLED ---
-    app.run(debug=True)
\ No newline at end of file
+    # Behind a WSGI server (e.g. `gunicorn app:app`) only the APP_ENV check above applies
+    development = app.config['APP_ENV'] == 'development'
+    app.run(host=app.config['APP_HOST'], port=app.config['APP_PORT'], debug=development,
+            use_debugger=development, use_reloader=development, threaded=True)
\ No newline at end of file
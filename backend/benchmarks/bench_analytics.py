@@ -0,0 +1,87 @@
+"""
+Time and peak RSS of the analytics passes (department performance over records,
+enrolment trend over users) at different chunk sizes.
+
+    python benchmarks/bench_analytics.py [--students 50000] [--records 2000000] [--chunks 50000,200000,0]
+
+A chunk size of 0 loads everything in one batch, for comparison. Each chunk size
+runs in a fresh subprocess so its peak RSS is measured in isolation.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import make_app, seed_institution
+
+
+def run_child(chunk_rows, db_path):
+    app = make_app(db_path=db_path)
+    from utils.analytics import department_performance, enrolment_trend
+    with app.app_context():
+        if chunk_rows == 0:
+            chunk_rows = 10 ** 12
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        departments = department_performance(1, chunk_rows=chunk_rows)
+        departments_sec = time.perf_counter() - start
+        start = time.perf_counter()
+        trend = enrolment_trend(bucket='month', chunk_rows=chunk_rows)
+        trend_sec = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    records = sum(d['records'] for d in departments)
+    label = 'all' if chunk_rows >= 10 ** 12 else f"{chunk_rows:,}"
+    # ru_maxrss is in KiB on Linux
+    print(f"chunk {label:>9}: departments {departments_sec:6.2f}s ({records / departments_sec:,.0f} records/s), "
+          f"trend {trend_sec:5.2f}s ({len(trend)} months), peak RSS +{(peak - baseline) / 1024:.1f} MiB")
+
+
+def seed(db_path, n_students, n_records):
+    app = make_app(db_path=db_path)
+    with app.app_context():
+        from database import db
+        seed_institution(n_students=n_students, n_teachers=10)
+        conn = db.session.connection()
+        # Spread sign-ups over ~five years
+        conn.exec_driver_sql("UPDATE users SET created_at = datetime('2020-01-01', '+' || (id * 7 % 1800) || ' days')")
+        student_ids = np.array([sid for (sid,) in conn.exec_driver_sql("SELECT id FROM students")])
+        rng = np.random.default_rng(0)
+        batch = 200_000
+        for offset in range(0, n_records, batch):
+            n = min(batch, n_records - offset)
+            rows = zip(rng.choice(student_ids, n).tolist(), rng.integers(1, 9, n).tolist(),
+                       np.round(rng.uniform(4, 10, n), 2).tolist(), np.round(rng.uniform(50, 100, n), 2).tolist())
+            conn.exec_driver_sql("INSERT INTO records (student_id, semester, gpa, attendance) VALUES (?, ?, ?, ?)",
+                                 list(rows))
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=50_000)
+    parser.add_argument('--records', type=int, default=2_000_000)
+    parser.add_argument('--chunks', default='50000,200000,0')
+    parser.add_argument('--child', type=int)
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.child, args.db)
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='edusamagra-bench-'), 'analytics.sqlite3')
+    start = time.perf_counter()
+    seed(db_path, args.students, args.records)
+    print(f"seeded {args.students:,} students and {args.records:,} records in {time.perf_counter() - start:.1f}s")
+    for chunk_rows in args.chunks.split(','):
+        subprocess.run([sys.executable, __file__, '--child', chunk_rows, '--db', db_path], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Requests/sec for GET /api/student/dashboard with AUTH_MODE='database' vs 'claims'.
+
+    python benchmarks/bench_auth_modes.py [--duration SECONDS]
+"""
+import argparse
+
+from common import make_app, seed_institution, login, requests_per_second
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=3.0)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        seed_institution()
+    client = app.test_client()
+
+    headers = login(client, 'student@bench.in')
+    results = {}
+    for mode in ('database', 'claims'):
+        app.config['AUTH_MODE'] = mode
+        requests_per_second(client, 'get', '/api/student/dashboard', headers, duration=0.3)  # warm-up
+        results[mode] = requests_per_second(client, 'get', '/api/student/dashboard', headers, args.duration)
+
+    for mode, rps in results.items():
+        print(f"{mode:>8}: {rps:8.1f} req/s")
+    print(f" speedup: {results['claims'] / results['database']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Checkout wait and throughput for a burst of concurrent dashboard requests at
+different pool sizes.
+
+    python benchmarks/bench_db_pool.py [--threads 16] [--requests 20] [--pools 2+0,4+4,16+0]
+
+Each pool is given as DB_POOL_SIZE+DB_MAX_OVERFLOW and runs in a fresh
+subprocess, since the engine options are fixed when the app is imported.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import make_app, seed_institution, login
+
+
+def run_child(pool, db_path, threads, n_requests):
+    size, overflow = pool.split('+')
+    app = make_app(db_path=db_path, DB_POOL_SIZE=size, DB_MAX_OVERFLOW=overflow, DB_POOL_TIMEOUT=10)
+    from utils.db_pool import db_pool_monitor
+
+    errors = []
+
+    def burst(headers):
+        client = app.test_client()
+        for _ in range(n_requests):
+            response = client.get('/api/student/dashboard', headers=headers)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    headers = login(app.test_client(), 'student@bench.in')
+    workers = [threading.Thread(target=burst, args=(headers,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    stats = db_pool_monitor.stats()['default']
+    wait, per_request = stats['checkout_wait'], stats['request_wait']
+    print(f"pool {pool:>5}: {threads * n_requests / elapsed:7.1f} req/s, "
+          f"checkout wait avg {wait['avg_ms']:7.2f} ms max {wait['max_ms']:8.2f} ms, "
+          f"per request avg {per_request['avg_ms']:7.2f} ms, "
+          f"peak {stats['pool']['peak_checked_out']} connections, "
+          f"{stats['events']['checkout_timeouts']} timeouts, {len(errors)} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--pools', default='2+0,4+4,16+0')
+    parser.add_argument('--child')
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.db, args.threads, args.requests)
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='edusamagra-bench-'), 'pool.sqlite3')
+    app = make_app(db_path=db_path)
+    with app.app_context():
+        seed_institution(n_students=1000)
+    print(f"{args.threads} threads x {args.requests} requests of /api/student/dashboard")
+    for pool in args.pools.split(','):
+        subprocess.run([sys.executable, __file__, '--child', pool, '--db', db_path,
+                        '--threads', str(args.threads), '--requests', str(args.requests)], check=True)
+
+
+if __name__ == '__main__':
+    main()
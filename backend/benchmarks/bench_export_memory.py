@@ -0,0 +1,70 @@
+"""
+Peak RSS of exporting an institution's student roster: the streaming NDJSON
+export vs. building the whole list in memory (the old details-page path).
+
+    python benchmarks/bench_export_memory.py [--students 100000]
+
+Each path runs in a fresh subprocess so its peak RSS is measured in isolation.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import make_app, seed_institution, login
+
+
+def run_child(mode, db_path):
+    app = make_app(db_path=db_path)
+    client = app.test_client()
+    headers = login(client, 'admin@bench.in')
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+
+    if mode == 'stream':
+        response = client.get('/api/admin/institutions/1/export/students', headers=headers, buffered=False)
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+    else:
+        from flask import jsonify
+        from models import Student, User
+        with app.test_request_context():
+            students = Student.query.join(User).filter(User.institution_id == 1).all()
+            student_list = [{
+                'id': s.id, 'user_id': s.user_id, 'name': s.full_name, 'email': s.user.email,
+                'course': s.course, 'gpa': float(s.overall_gpa), 'attendance': float(s.attendance_percentage)
+            } for s in students]
+            size = len(jsonify(students=student_list).get_data())
+
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux
+    print(f"{mode:>6}: {elapsed:6.2f}s  {size / 1e6:7.1f} MB body  peak RSS {peak / 1024:7.1f} MiB "
+          f"(+{(peak - baseline) / 1024:.1f} MiB over startup)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=100_000)
+    parser.add_argument('--child', choices=['stream', 'list'])
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.db)
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='edusamagra-bench-'), 'export.sqlite3')
+    app = make_app(db_path=db_path)
+    with app.app_context():
+        seed_institution(n_students=args.students, n_teachers=10)
+    print(f"seeded {args.students} students")
+    for mode in ('stream', 'list'):
+        subprocess.run([sys.executable, __file__, '--child', mode, '--db', db_path], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Building and encoding a 50k-row roster payload (Decimal, date and time columns)
+with the stdlib and orjson JSON providers.
+
+    python benchmarks/bench_json.py [--rows 50000] [--repeat 5]
+
+  build   ad-hoc dict comprehension with float()/isoformat() vs a compiled Serializer
+  encode  app.json.response() for each provider, with and without sorted keys
+"""
+import argparse
+import datetime
+import statistics
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from common import make_app
+
+Row = namedtuple('Row', 'id user_id full_name email course overall_gpa attendance_percentage enrolled_on class_start')
+
+
+def rows(n):
+    start = datetime.date(2020, 7, 1)
+    return [Row(i, i + 10, f"Student {i}", f"s{i}@synthetic.in", 'B.Tech CSE',
+                Decimal(f"{5 + i % 500 / 100:.2f}"), Decimal(f"{60 + i % 4000 / 100:.2f}"),
+                start + datetime.timedelta(days=i % 1500), datetime.time(9 + i % 8, 30))
+            for i in range(n)]
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return min(times), statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    from utils.json_provider import StdlibJSONProvider, OrjsonJSONProvider, orjson
+    from utils.serializers import Serializer
+
+    data = rows(args.rows)
+    print(f"{args.rows} rows, best / median of {args.repeat}")
+
+    def adhoc():
+        return [{"id": r.id, "user_id": r.user_id, "name": r.full_name, "email": r.email, "course": r.course,
+                 "gpa": float(r.overall_gpa), "attendance": float(r.attendance_percentage),
+                 "enrolled_on": r.enrolled_on.isoformat(), "class_start": r.class_start.isoformat()} for r in data]
+
+    serializer = Serializer(id='id', user_id='user_id', name='full_name', email='email', course='course',
+                            gpa='overall_gpa', attendance='attendance_percentage',
+                            enrolled_on='enrolled_on', class_start='class_start')
+    for label, fn in (('dict comprehension', adhoc), ('Serializer.many', lambda: serializer.many(data))):
+        best, median, _ = best_ms(fn, args.repeat)
+        print(f"  build  {label:<22} {best:8.1f} / {median:8.1f} ms")
+
+    payload = {"items": serializer.many(data), "next_after_id": None}
+    providers = [('stdlib', StdlibJSONProvider)] + ([('orjson', OrjsonJSONProvider)] if orjson else [])
+    with app.app_context():
+        for name, cls in providers:
+            for sort_keys in (True, False):
+                provider = cls(app)
+                provider.sort_keys = sort_keys
+                best, median, response = best_ms(lambda: provider.response(payload), args.repeat)
+                label = f"{name}{' sorted' if sort_keys else ''}"
+                print(f"  encode {label:<22} {best:8.1f} / {median:8.1f} ms  {len(response.get_data()) / 1e6:5.2f} MB")
+    if not orjson:
+        print("  (orjson not installed: pip install orjson)")
+
+
+if __name__ == '__main__':
+    main()
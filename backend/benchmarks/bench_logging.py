@@ -0,0 +1,71 @@
+"""
+Requests/sec for GET /api/student/dashboard under different logging setups.
+
+    python benchmarks/bench_logging.py [--duration SECONDS]
+
+  info          LOG_LEVEL=INFO: per-request debug events are skipped by a level check
+  debug-sampled LOG_LEVEL=DEBUG with the default sampling rates
+  debug-all     LOG_LEVEL=DEBUG, every event logged through the queue
+  debug-sync    as debug-all, but formatted and written on the request thread
+
+Each setup runs in a fresh subprocess and logs to a temporary file.
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import make_app, seed_institution, login, requests_per_second
+
+SETUPS = {
+    'info': {'LOG_LEVEL': 'INFO'},
+    'debug-sampled': {'LOG_LEVEL': 'DEBUG'},
+    'debug-all': {'LOG_LEVEL': 'DEBUG', 'LOG_SAMPLE_RATES': '', 'LOG_SAMPLE_DEFAULT': 1},
+    'debug-sync': {'LOG_LEVEL': 'DEBUG', 'LOG_SAMPLE_RATES': '', 'LOG_SAMPLE_DEFAULT': 1},
+}
+
+
+def run_child(setup, db_path, duration):
+    log_file = os.path.join(os.path.dirname(db_path), f"{setup}.log")
+    app = make_app(db_path=db_path, LOG_FILE=log_file, **SETUPS[setup])
+    if setup == 'debug-sync':
+        from utils.log import logger, JsonFormatter
+        handler = logging.FileHandler(log_file)
+        handler.setFormatter(JsonFormatter())
+        for target in (logger, app.logger):
+            target.handlers = [handler]
+
+    client = app.test_client()
+    headers = login(client, 'student@bench.in')
+    requests_per_second(client, 'get', '/api/student/dashboard', headers, duration=0.3)  # warm-up
+    rps = requests_per_second(client, 'get', '/api/student/dashboard', headers, duration)
+    logging.shutdown()
+    with open(log_file) as f:
+        lines = sum(1 for _ in f)
+    print(f"{setup:>13}: {rps:8.1f} req/s, {lines:6d} log lines")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--child')
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.db, args.duration)
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='edusamagra-bench-'), 'logging.sqlite3')
+    app = make_app(db_path=db_path)
+    with app.app_context():
+        seed_institution()
+    for setup in SETUPS:
+        subprocess.run([sys.executable, __file__, '--child', setup, '--db', db_path,
+                        '--duration', str(args.duration)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Login throughput and latency at several bcrypt costs, hashing inline vs in the
+password process pool.
+
+    python benchmarks/bench_login.py [--costs 4,8,10,12] [--threads 8] [--duration 3] [--pool-workers N]
+
+Each (cost, mode) pair runs in a fresh subprocess. Stored hashes are brought to the
+cost under test first, so the timed logins do not include the one-off rehash.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import make_app, seed_institution
+
+
+def run_child(cost, workers, db_path, threads, duration):
+    app = make_app(db_path=db_path, BCRYPT_LOG_ROUNDS=cost, PASSWORD_POOL_WORKERS=workers,
+                   PASSWORD_POOL_MAX_PENDING=threads)
+    from database import db
+    from models import User
+
+    # One login per thread so every request verifies a hash
+    emails = [f"s{i}@synthetic.in" for i in range(threads)]
+    with app.app_context():
+        users = User.query.filter(User.email.in_(emails)).all()
+        start = time.perf_counter()
+        for user in users:
+            user.set_password('password123')
+        db.session.commit()
+        rehash_ms = (time.perf_counter() - start) * 1000 / len(users)
+
+    latencies, statuses = [], []
+    deadline = time.perf_counter() + duration
+
+    def worker(email):
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            t = time.perf_counter()
+            response = client.post('/api/login', json={'email': email, 'password': 'password123'})
+            latencies.append((time.perf_counter() - t) * 1000)
+            statuses.append(response.status_code)
+
+    pool = [threading.Thread(target=worker, args=(email,)) for email in emails]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    ok = statuses.count(200)
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    mode = f"pool x{workers}" if workers else "inline"
+    print(f"cost {cost:>2} {mode:>8}: {ok / elapsed:8.1f} logins/s, p50 {statistics.median(latencies):8.1f} ms, "
+          f"p95 {p95:8.1f} ms, hash {rehash_ms:7.1f} ms, {len(statuses) - ok} non-200")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--costs', default='4,8,10,12')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--pool-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--child', type=int)
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.child, args.workers, args.db, args.threads, args.duration)
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='edusamagra-bench-'), 'login.sqlite3')
+    app = make_app(db_path=db_path)
+    with app.app_context():
+        seed_institution(n_students=args.threads)
+    print(f"{args.threads} threads, {os.cpu_count()} CPUs")
+    for cost in args.costs.split(','):
+        for workers in (0, args.pool_workers):
+            subprocess.run([sys.executable, __file__, '--child', cost, '--workers', str(workers), '--db', db_path,
+                            '--threads', str(args.threads), '--duration', str(args.duration)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Accounts created per second: one /api/signup call per user vs the bulk
+provisioning endpoint with inline and pooled hashing.
+
+    python benchmarks/bench_provisioning.py [--rows 200] [--cost 10] [--workers N]
+
+Every mode runs in a fresh subprocess against its own copy of the seeded
+database and creates the same number of accounts at the same bcrypt cost.
+"""
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import make_app, seed_institution, login
+
+
+def run_child(mode, db_path, rows, cost, workers):
+    app = make_app(db_path=db_path, BCRYPT_LOG_ROUNDS=cost, PROVISION_HASH_WORKERS=workers)
+    client = app.test_client()
+    users = [{'email': f"new{i}@bulk.in", 'full_name': f"New {i}", 'password': 'password123',
+              'role': 'student' if i % 10 else 'teacher'} for i in range(rows)]
+
+    start = time.perf_counter()
+    if mode == 'signup':
+        created = sum(client.post('/api/signup', json={'email': u['email'], 'password': u['password'], 'role': u['role'],
+                                                       'fullName': u['full_name']}).status_code == 201
+                      for u in users)
+        hash_sec = None
+    else:
+        csv = "email,full_name,password,role\n" + "".join(
+            f"{u['email']},{u['full_name']},{u['password']},{u['role']}\n" for u in users)
+        response = client.post('/api/institution/users/bulk?sync=1', headers=login(client, 'institution@bench.in'),
+                               data={'file': (io.BytesIO(csv.encode()), 'users.csv')})
+        report = response.get_json()['report']
+        created, hash_sec = report['rows_created'], report['hash_sec']
+    elapsed = time.perf_counter() - start
+
+    label = f"bulk x{workers}" if mode == 'bulk' else mode
+    hashing = f", hashing {hash_sec:6.2f} s" if hash_sec is not None else ""
+    print(f"{label:>8}: {created / elapsed:8.1f} accounts/s ({created} in {elapsed:6.2f} s{hashing})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--cost', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--child')
+    parser.add_argument('--db')
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.db, args.rows, args.cost, args.workers)
+        return
+
+    tmp = tempfile.mkdtemp(prefix='edusamagra-bench-')
+    seeded = os.path.join(tmp, 'seed.sqlite3')
+    app = make_app(db_path=seeded)
+    with app.app_context():
+        seed_institution()
+    print(f"{args.rows} accounts at bcrypt cost {args.cost}, {os.cpu_count()} CPUs")
+    for mode, workers in (('signup', 1), ('bulk', 1), ('bulk', args.workers)):
+        db_path = os.path.join(tmp, f"{mode}-{workers}.sqlite3")
+        shutil.copy(seeded, db_path)
+        subprocess.run([sys.executable, __file__, '--child', mode, '--db', db_path, '--rows', str(args.rows),
+                        '--cost', str(args.cost), '--workers', str(workers)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Typeahead latency: full-text prefix search (utils/search.py) vs the LIKE '%q%'
+filter it replaces, over seeded institutions, students and projects.
+
+    python benchmarks/bench_search.py [--students 50000] [--institutions 2000] [--repeat 20]
+
+The search index is timed through the HTTP route (JSON encoding included); the
+LIKE baseline is a bare ORM query for the same page, sorted by name as the
+unfiltered institution list is, so it gets no ranking and no HTTP overhead.
+"""
+import argparse
+import statistics
+import time
+
+from common import make_app, seed_institution, login
+
+# (index, typed prefix): short prefixes match many rows, longer ones few
+QUERIES = [
+    ('institutions', 'te'), ('institutions', 'tech'), ('institutions', 'kerala col'),
+    ('students', 'st'), ('students', 'student 12'), ('students', 'cse'),
+    ('projects', 'ro'), ('projects', 'robot arm'),
+]
+STATES = ['Kerala', 'Goa', 'Punjab', 'Delhi', 'Assam', 'Bihar']
+WORDS = ['Technology', 'Science', 'Arts', 'Engineering', 'Medical', 'Public', 'National', 'Model']
+
+
+def seed(n_students, n_institutions):
+    from database import db
+    from models import Institution, PortfolioProject
+
+    seed_institution(n_students=n_students, n_teachers=10)
+    db.session.execute(Institution.__table__.insert(), [
+        {'name': f"{WORDS[i % 8]} {WORDS[i // 8 % 8]} College {i}", 'type': 'College',
+         'state': STATES[i % 6], 'district': f"District {i % 40}"} for i in range(n_institutions)])
+    db.session.execute(PortfolioProject.__table__.insert(), [
+        {'student_id': sid, 'title': ('Robot arm', 'Weather app', 'Library system', 'Route planner')[sid // 2 % 4],
+         'description': f"Semester project {sid} built with sensors and a web dashboard"}
+        for sid in range(1, n_students, 2)])
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return statistics.median(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=50_000)
+    parser.add_argument('--institutions', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    import migrations
+    from database import db
+    from models import Institution, Student, PortfolioProject
+    from sqlalchemy import or_
+
+    with app.app_context():
+        seed(args.students, args.institutions)
+        t = time.perf_counter()
+        migrations.upgrade(db.engine, log=lambda msg: None)  # builds the search index from the seeded rows
+        print(f"index built in {time.perf_counter() - t:.2f} s")
+    client = app.test_client()
+    headers = login(client, 'admin@bench.in')
+
+    like_columns = {'institutions': (Institution, Institution.name, Institution.state, Institution.district),
+                    'students': (Student, Student.full_name, Student.course),
+                    'projects': (PortfolioProject, PortfolioProject.title, PortfolioProject.description)}
+    print(f"median / max ms over {args.repeat} runs, first page of 20")
+    for index, q in QUERIES:
+        response = client.get(f"/api/admin/search?type={index}&q={q}", headers=headers)
+        hits = len(response.get_json()['items'])
+        search_ms = timed(lambda: client.get(f"/api/admin/search?type={index}&q={q}", headers=headers), args.repeat)
+
+        model, *columns = like_columns[index]
+        with app.app_context():
+            def like():
+                query = model.query
+                for word in q.split():
+                    query = query.filter(or_(*(c.ilike(f"%{word}%") for c in columns)))
+                return query.order_by(columns[0], model.id).limit(20).all()
+            like_ms = timed(like, args.repeat)
+        print(f"  {index:<12} {q!r:<14} search {search_ms[0]:7.2f} / {search_ms[1]:7.2f}   "
+              f"LIKE {like_ms[0]:7.2f} / {like_ms[1]:7.2f}   ({hits} on page)")
+
+
+if __name__ == '__main__':
+    main()
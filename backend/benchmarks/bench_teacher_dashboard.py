@@ -0,0 +1,80 @@
+"""
+Query count and latency for the teacher dashboard and class list on a large institution.
+
+    python benchmarks/bench_teacher_dashboard.py [--students 50000] [--iterations 20]
+"""
+import argparse
+import datetime
+import statistics
+import time
+
+from common import make_app, seed_institution, login
+
+
+def _timed(client, url, headers, iterations):
+    from utils.query_budget import count_queries
+
+    timings, queries = [], 0
+    for _ in range(iterations):
+        with count_queries() as counter:
+            start = time.perf_counter()
+            response = client.get(url, headers=headers)
+            timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        queries = max(queries, counter.count)
+    return response.get_json(), queries, timings
+
+
+def _legacy_dashboard_ms(inst_id, iterations):
+    # The previous implementation: every student loaded and serialized per request
+    from models import User, Student
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        students = Student.query.join(User).filter(User.institution_id == inst_id).all()
+        [{"id": s.id, "name": s.full_name, "course": s.course, "gpa": float(s.overall_gpa),
+          "attendance": float(s.attendance_percentage)} for s in students]
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=50_000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app(QUERY_BUDGET_MODE='raise')
+    with app.app_context():
+        from database import db
+        from models import Teacher, Timetable, User
+
+        inst_id = seed_institution(n_students=args.students, n_teachers=5)
+        teacher = Teacher.query.join(User).filter(User.email == 'teacher@bench.in').one()
+        for class_name, day in (('CSE - Sem 3', 'Monday'), ('ECE - Sem 5', 'Tuesday')):
+            db.session.add(Timetable(institution_id=inst_id, class_name=class_name, teacher_id=teacher.id,
+                                     subject='Algorithms', day_of_week=day,
+                                     start_time=datetime.time(9), end_time=datetime.time(10)))
+        db.session.commit()
+    client = app.test_client()
+
+    headers = login(client, 'teacher@bench.in')
+    dashboard, dashboard_queries, dashboard_ms = _timed(client, '/api/teacher/dashboard', headers, args.iterations)
+    page, page_queries, page_ms = _timed(
+        client, '/api/teacher/students?sort=gpa&order=desc&limit=50', headers, args.iterations)
+    _, _, next_ms = _timed(
+        client, f"/api/teacher/students?sort=gpa&order=desc&limit=50&cursor={page['next_cursor']}",
+        headers, args.iterations)
+    with app.app_context():
+        legacy_ms = _legacy_dashboard_ms(inst_id, max(args.iterations // 4, 1))
+
+    print(f"students:             {dashboard['kpis']['total_students']:,}")
+    print(f"dashboard:            {statistics.median(dashboard_ms):8.1f} ms median, {dashboard_queries} queries")
+    print(f"class list page 1:    {statistics.median(page_ms):8.1f} ms median, {page_queries} queries")
+    print(f"class list page 2:    {statistics.median(next_ms):8.1f} ms median")
+    print(f"legacy student load:  {statistics.median(legacy_ms):8.1f} ms median (query + serialize only)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Migration round trip: upgrade, downgrade to 0, upgrade again.
+
+    python benchmarks/check_migrations.py [--database-url mysql+pymysql://...]
+
+Runs against a throwaway SQLite database built from the models unless a database
+URL is given (which must already hold the schema.sql tables). Checks that no
+foreign key column indexed after the upgrade loses its last index on the way down
+(MySQL refuses to drop it, error 1553; SQLite does not index foreign keys itself)
+and that the schema after the round trip matches the one before. Exits 1 on a failure.
+"""
+import argparse
+import sys
+
+from sqlalchemy import create_engine, inspect
+
+from common import make_app
+
+
+def snapshot(engine):
+    """
+    {table: (columns, indexes, foreign keys)} for every table.
+    """
+    inspector = inspect(engine)
+    tables = {}
+    for table in inspector.get_table_names():
+        indexes = {(i['name'], tuple(i['column_names']), bool(i['unique'])) for i in inspector.get_indexes(table)}
+        fks = {(tuple(fk['constrained_columns']), fk['referred_table']) for fk in inspector.get_foreign_keys(table)}
+        tables[table] = ({c['name'] for c in inspector.get_columns(table)}, indexes, fks)
+    return tables
+
+
+def unindexed_fks(engine):
+    """
+    'table.column' for foreign key columns no index, unique key or primary key leads with.
+    """
+    inspector = inspect(engine)
+    missing = []
+    for table in inspector.get_table_names():
+        leading = {i['column_names'][0] for i in inspector.get_indexes(table)}
+        leading |= {u['column_names'][0] for u in inspector.get_unique_constraints(table)}
+        leading |= set(inspector.get_pk_constraint(table)['constrained_columns'][:1])
+        missing += [f"{table}.{fk['constrained_columns'][0]}" for fk in inspector.get_foreign_keys(table)
+                    if fk['constrained_columns'][0] not in leading]
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    app = make_app()
+    import migrations
+    from database import db
+
+    failures = []
+
+    def check(label, ok, detail=''):
+        if not ok:
+            failures.append(label)
+        print(f"{'ok' if ok else 'FAIL':>4}  {label}{f': {detail}' if detail else ''}")
+
+    with app.app_context():
+        engine = create_engine(args.database_url) if args.database_url else db.engine
+        quiet = lambda msg: None  # noqa: E731
+        migrations.upgrade(engine, log=quiet)
+        before = snapshot(engine)
+        unindexed = set(unindexed_fks(engine))
+        head = max(v for v, _, _ in migrations.discover())
+        for target in range(head - 1, -1, -1):
+            try:
+                migrations.downgrade(engine, target, log=quiet)
+            except Exception as e:
+                check(f"downgrade to {target}", False, e)
+                break
+            lost = sorted(set(unindexed_fks(engine)) - unindexed)
+            check(f"downgrade to {target}: foreign key columns keep an index", not lost, ', '.join(lost))
+        migrations.upgrade(engine, log=quiet)
+        after = snapshot(engine)
+        changed = sorted(t for t in before.keys() | after.keys() if before.get(t) != after.get(t))
+        check("schema after the round trip matches", not changed, ', '.join(changed))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
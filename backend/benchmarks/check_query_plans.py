@@ -0,0 +1,166 @@
+"""
+EXPLAIN every query the hot routes run on a large seeded dataset and fail if any
+of them full-scans a large table or runs more queries than its @query_budget.
+
+    python benchmarks/check_query_plans.py [--students 50000] [--institutions 10] [--without-indexes]
+
+The schema is brought to the latest migration first; --without-indexes reverts
+0002_hot_path_indexes to show what the plans look like without it. Routes run with
+QUERY_BUDGET_MODE='raise'. Exits 1 on a full scan or a budget overrun. The benchmark database is SQLite (EXPLAIN QUERY PLAN); full_scans()
+also reads MySQL's EXPLAIN output (type=ALL).
+"""
+import argparse
+import datetime
+import sys
+
+from common import make_app, seed_institution, login
+
+# Tables that grow with the number of users; a full scan of these is a regression
+LARGE_TABLES = {'users', 'students', 'teachers', 'records', 'events', 'timetables', 'portfolio_projects',
+                'student_skills', 'student_links', 'ai_insights', 'teacher_qualifications', 'project_tags'}
+
+HOT_ROUTES = [
+    ('student', '/api/student/dashboard'),
+    ('student', '/api/student/portfolio'),
+    ('teacher', '/api/teacher/dashboard'),
+    ('teacher', '/api/teacher/students?sort=gpa&order=desc&limit=50'),
+    ('institution', '/api/institution/overview'),
+    ('admin', '/api/admin/overview'),
+    ('admin', '/api/admin/institutions/1/details?limit=50'),
+    ('admin', '/api/admin/institutions/1/students?after_id=20000&limit=50'),
+    ('institution', '/api/institution/students/search?skills=python,sql&limit=50'),
+    ('admin', '/api/admin/students/search?tags=iot&state=Kerala&limit=50'),
+    ('admin', '/api/admin/students/search?skills=rust&match=any&limit=50'),
+    ('admin', '/api/admin/institutions?q=other'),
+    ('admin', '/api/admin/search?q=oth&type=students'),
+    ('institution', '/api/institution/search?q=proj&type=projects'),
+]
+
+
+def seed_large(n_students, n_institutions):
+    from database import db
+    from models import Institution, Teacher, Timetable, Event, User, PortfolioProject, Student, Skill, Tag
+
+    inst_id = seed_institution(n_students=n_students, n_teachers=50)
+    conn = db.session.connection()
+    pw_hash = db.session.query(User.password_hash).filter(User.email == 'student@bench.in').scalar()
+    # Other institutions, so per-institution filters are actually selective
+    for n in range(1, n_institutions):
+        other = Institution(name=f"Other {n}", type='College', state=('Kerala', 'Goa', 'Punjab')[n % 3], district='X')
+        db.session.add(other)
+        db.session.flush()
+        conn.execute(User.__table__.insert(), [
+            {'email': f"o{n}-{i}@synthetic.in", 'password_hash': pw_hash, 'role': 'student', 'institution_id': other.id}
+            for i in range(n_students // 2)] + [
+            {'email': f"ot{n}-{i}@synthetic.in", 'password_hash': pw_hash, 'role': 'teacher', 'institution_id': other.id}
+            for i in range(200)])
+    conn.exec_driver_sql(
+        "INSERT INTO students (user_id, full_name, course, current_semester, overall_gpa, attendance_percentage) "
+        "SELECT id, 'Other', 'CSE', 1 + id % 8, 7.0, 80 FROM users WHERE email LIKE 'o%@synthetic.in' AND role = 'student'")
+    conn.exec_driver_sql(
+        "INSERT INTO teachers (user_id, full_name, subject, avg_feedback) "
+        "SELECT id, 'Other', 'Maths', 4.0 FROM users WHERE email LIKE 'ot%@synthetic.in'")
+    # A week of classes for every teacher
+    conn.exec_driver_sql(
+        "INSERT INTO timetables (institution_id, class_name, teacher_id, subject, day_of_week, start_time, end_time) "
+        "SELECT u.institution_id, 'CSE - Sem ' || (1 + t.id % 8), t.id, 'Maths', d.day, '09:00:00', '10:00:00' "
+        "FROM teachers t JOIN users u ON u.id = t.user_id, (SELECT 'Monday' AS day UNION ALL SELECT 'Tuesday' "
+        "UNION ALL SELECT 'Wednesday' UNION ALL SELECT 'Thursday' UNION ALL SELECT 'Friday') d")
+    conn.exec_driver_sql(
+        "INSERT INTO records (student_id, semester, gpa, attendance) "
+        "SELECT s.id, k.n, 7.5, 85 FROM students s, (SELECT 1 AS n UNION ALL SELECT 2 UNION ALL SELECT 3) k")
+    conn.execute(Event.__table__.insert(), [
+        {'institution_id': i, 'title': f"Event {d}", 'event_date': datetime.date(2024, 1, 1) + datetime.timedelta(days=d)}
+        for i in range(1, n_institutions + 1) for d in range(200)])
+    teacher = Teacher.query.join(User).filter(User.email == 'teacher@bench.in').one()
+    db.session.add(Timetable(institution_id=inst_id, class_name='CSE - Sem 3', teacher_id=teacher.id, subject='DS',
+                             day_of_week='Monday', start_time=datetime.time(9), end_time=datetime.time(10)))
+    student = Student.query.join(User).filter(User.email == 'student@bench.in').one()
+    conn.execute(PortfolioProject.__table__.insert(), [
+        {'student_id': sid, 'title': f"Project {sid}"} for sid in range(1, n_students, 3)] +
+        [{'student_id': student.id, 'title': 'Mine'}])
+    # Catalog links for search: a handful of common skills and tags, one rare skill
+    skills = ['python', 'sql', 'java', 'excel', 'rust']
+    conn.execute(Skill.__table__.insert(), [{'name': name} for name in skills])
+    conn.exec_driver_sql(
+        "INSERT INTO student_skills (student_id, skill_name, skill_id) "
+        "SELECT s.id, k.name, k.id FROM students s JOIN skills k ON k.id <= 4 AND s.id % (k.id + 1) = 0 "
+        "UNION ALL SELECT s.id, 'rust', 5 FROM students s WHERE s.id % 997 = 0")
+    conn.execute(Tag.__table__.insert(), [{'name': name} for name in ('iot', 'web', 'ml')])
+    conn.exec_driver_sql(
+        "INSERT INTO project_tags (project_id, tag_id) SELECT p.id, 1 + p.id % 3 FROM portfolio_projects p")
+    db.session.commit()
+    db.session.execute(db.text("ANALYZE"))
+
+
+def full_scans(conn, statement, parameters):
+    """
+    Large tables the statement reads without an index, per the database's own plan.
+    """
+    if conn.dialect.name == 'sqlite':
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        scans = set()
+        for row in plan:
+            detail = row[-1]
+            if detail.startswith('SCAN ') and ' USING ' not in detail:
+                scans.add(detail.split()[1])
+        return scans & LARGE_TABLES, [row[-1] for row in plan]
+    plan = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings().all()
+    return {r['table'] for r in plan if r['type'] == 'ALL'} & LARGE_TABLES, \
+        [f"{r['table']}: {r['type']} key={r['key']}" for r in plan]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=50_000)
+    parser.add_argument('--institutions', type=int, default=10)
+    parser.add_argument('--without-indexes', action='store_true')
+    parser.add_argument('--verbose', action='store_true', help="print every plan")
+    args = parser.parse_args()
+
+    app = make_app(QUERY_BUDGET_MODE='raise')
+    # Let QueryBudgetExceeded reach the test client instead of becoming a 500
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    import migrations
+    from database import db
+    from utils.query_budget import QueryBudgetExceeded, count_queries
+
+    with app.app_context():
+        migrations.upgrade(db.engine, log=lambda msg: None)
+        if args.without_indexes:
+            migrations.downgrade(db.engine, 1)
+        seed_large(args.students, args.institutions)
+    client = app.test_client()
+
+    total = 0
+    headers = {role: login(client, f"{role}@bench.in") for role in {r for r, _ in HOT_ROUTES}}
+    for role, url in HOT_ROUTES:
+        failures = 0
+        with count_queries() as counter:
+            try:
+                response = client.get(url, headers=headers[role])
+            except QueryBudgetExceeded as e:
+                print(f"OVER BUDGET  {url}: {e}")
+                total += 1
+                continue
+        assert response.status_code == 200, (url, response.get_data(as_text=True))
+        with app.app_context():
+            conn = db.session.connection()
+            for statement, parameters in zip(counter.statements, counter.parameters):
+                if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    continue
+                scans, plan = full_scans(conn, statement, parameters)
+                if scans:
+                    failures += 1
+                    print(f"FULL SCAN of {', '.join(sorted(scans))} in {url}:\n  {' '.join(statement.split())}")
+                if scans or args.verbose:
+                    print('\n'.join(f"    {line}" for line in plan))
+        print(f"{'FAIL' if failures else 'ok':>4}  {url}  ({counter.count} queries)")
+        total += failures
+
+    print(f"\n{total} full scan(s) or budget overrun(s)" if total else "\nall hot queries use an index and fit the budget")
+    sys.exit(1 if total else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Read-replica routing against two SQLite files standing in for primary and replica.
+
+    python benchmarks/check_replica_routing.py
+
+The replica is a copy of the primary taken after seeding; student GPAs are then
+changed on the primary only, so every response shows which database served it.
+Checks that dashboard GETs read the replica, writes and the writer's reads for
+DB_REPLICA_STICKY_SECONDS afterwards use the primary, other users keep reading
+the replica meanwhile (even from the same address, as behind a proxy), and
+DB_PRIMARY_ROUTES pins an endpoint. Exits 1 on a failure.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from common import make_app, seed_institution, login
+
+STICKY_SECONDS = 1.0
+REPLICA_GPA, PRIMARY_GPA = 8.1, 9.5
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='edusamagra-bench-')
+    primary, replica = os.path.join(workdir, 'primary.sqlite3'), os.path.join(workdir, 'replica.sqlite3')
+    app = make_app(db_path=primary, DB_REPLICA_URLS=f"sqlite:///{replica}",
+                   DB_REPLICA_STICKY_SECONDS=STICKY_SECONDS)
+    from database import db
+    from utils.db_routing import read_router
+
+    with app.app_context():
+        seed_institution()
+        db.engine.dispose()
+    with sqlite3.connect(primary) as conn:
+        conn.execute("UPDATE students SET overall_gpa = ?", (REPLICA_GPA,))
+    shutil.copyfile(primary, replica)
+    # "Replication lag": a change only the primary has seen
+    with sqlite3.connect(primary) as conn:
+        conn.execute("UPDATE students SET overall_gpa = ?", (PRIMARY_GPA,))
+
+    student = app.test_client()
+    other = app.test_client()  # same address as the writer, as behind a reverse proxy
+    failures = []
+
+    def dashboard_gpa(client, headers):
+        response = client.get('/api/student/dashboard', headers=headers)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return response.get_json()['kpis']['gpa']
+
+    def check(label, got, expected):
+        ok = got == expected
+        if not ok:
+            failures.append(label)
+        print(f"{'ok' if ok else 'FAIL':>4}  {label}: {got}")
+
+    headers = login(student, 'student@bench.in')
+    other_headers = login(other, 's0@synthetic.in')
+    time.sleep(STICKY_SECONDS)  # login is not a write, but be safe
+    read_before = dashboard_gpa(student, headers)
+    added = student.post('/api/student/portfolio/project', headers=headers, json={'title': 'Replica check'})
+    read_after_write = dashboard_gpa(student, headers)
+    projects = [p['title'] for p in student.get('/api/student/portfolio', headers=headers).get_json()['projects']]
+    other_read = dashboard_gpa(other, other_headers)
+    time.sleep(STICKY_SECONDS + 0.2)
+    read_later = dashboard_gpa(student, headers)
+    read_router.primary_routes.add('student_bp.get_student_dashboard')
+    pinned = dashboard_gpa(student, headers)
+    read_router.primary_routes.discard('student_bp.get_student_dashboard')
+
+    check("GET reads the replica", read_before, REPLICA_GPA)
+    check("POST writes the primary", added.status_code, 201)
+    check("writer's next GET reads the primary", read_after_write, PRIMARY_GPA)
+    check("writer sees their new project", 'Replica check' in projects, True)
+    check("another student on the same address still reads the replica", other_read, REPLICA_GPA)
+    check(f"after {STICKY_SECONDS}s the writer reads the replica again", read_later, REPLICA_GPA)
+    check("DB_PRIMARY_ROUTES pins the endpoint to the primary", pinned, PRIMARY_GPA)
+    print(f"\nrouted: {read_router.stats()['requests']}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Shared setup for the benchmark scripts: an isolated SQLite copy of the app
+import os
+import sys
+import tempfile
+import time
+import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_app(db_path=None, **env):
+    """
+    Import the Flask app against a SQLite database (a throwaway one unless db_path
+    is given) with all tables created. Extra keyword arguments are exported as
+    environment variables first.
+    """
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix='edusamagra-bench-'), 'bench.sqlite3')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-benchmark-secret-key')
+    # Benchmarks log in far faster than the login throttle allows
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    for key, value in env.items():
+        os.environ[key] = str(value)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    from app import app
+    from database import db
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed_institution(n_students=10, n_teachers=2, password='password123', bcrypt_rounds=4):
+    """
+    Create one institution with a student/teacher/institution/admin login plus
+    n synthetic students and teachers. Must run inside an app context.
+    Returns the institution id.
+    """
+    from database import db
+    from models import Institution, User, Student, Teacher, Record, Scheme, Event
+    from utils.passwords import password_hasher
+
+    pw_hash = password_hasher.hash(password, rounds=bcrypt_rounds)
+    inst = Institution(name='Benchmark University', type='University', state='Delhi', district='New Delhi')
+    db.session.add(inst)
+    db.session.flush()
+
+    def user(email, role, institution_id=inst.id):
+        u = User(email=email, password_hash=pw_hash, role=role, institution_id=institution_id)
+        db.session.add(u)
+        db.session.flush()
+        return u
+
+    student_user = user('student@bench.in', 'student')
+    teacher_user = user('teacher@bench.in', 'teacher')
+    user('institution@bench.in', 'institution')
+    user('admin@bench.in', 'admin', None)
+    student = Student(user_id=student_user.id, full_name='Bench Student', course='B.Tech CSE',
+                      current_semester=4, overall_gpa=8.1, attendance_percentage=82)
+    db.session.add(student)
+    db.session.add(Teacher(user_id=teacher_user.id, full_name='Bench Teacher', subject='Algorithms', avg_feedback=4.2))
+    db.session.flush()
+    db.session.add_all([Record(student_id=student.id, semester=s, gpa=8.0, attendance=85) for s in (1, 2, 3)])
+    db.session.add(Scheme(name='Merit Scholarship', description='Demo scheme', status='active'))
+    db.session.add(Event(institution_id=inst.id, title='Tech Fest', event_date=datetime.date(2024, 3, 1)))
+
+    users = [{'email': f"s{i}@synthetic.in", 'password_hash': pw_hash, 'role': 'student', 'institution_id': inst.id}
+             for i in range(n_students)]
+    users += [{'email': f"t{i}@synthetic.in", 'password_hash': pw_hash, 'role': 'teacher', 'institution_id': inst.id}
+              for i in range(n_teachers)]
+    db.session.execute(User.__table__.insert(), users)
+    rows = db.session.query(User.id, User.role).filter(User.email.like('%@synthetic.in')).all()
+    students = [{'user_id': uid, 'full_name': f"Student {uid}", 'course': ('CSE', 'ECE', 'Mech')[uid % 3],
+                 'current_semester': 1 + uid % 8, 'overall_gpa': 5 + (uid % 50) / 10,
+                 'attendance_percentage': 60 + uid % 40} for uid, role in rows if role == 'student']
+    teachers = [{'user_id': uid, 'full_name': f"Teacher {uid}", 'subject': 'Maths', 'avg_feedback': 3 + uid % 20 / 10}
+                for uid, role in rows if role == 'teacher']
+    if students:
+        db.session.execute(Student.__table__.insert(), students)
+    if teachers:
+        db.session.execute(Teacher.__table__.insert(), teachers)
+    db.session.commit()
+    return inst.id
+
+
+def login(client, email, password='password123'):
+    response = client.post('/api/login', json={'email': email, 'password': password})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+def requests_per_second(client, method, url, headers=None, duration=2.0, expect=200):
+    """
+    Hit one endpoint in a tight loop for `duration` seconds; returns req/s.
+    """
+    call = getattr(client, method)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        response = call(url, headers=headers)
+        assert response.status_code == expect, response.get_data(as_text=True)
+        count += 1
+    return count / (time.perf_counter() - start)
@@ -1,4 +1,7 @@
 # Database connection and setup
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
\ No newline at end of file
+from utils.db_routing import RoutingSession
+
+# Reads of routed GET requests go to a replica bind (see utils/db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
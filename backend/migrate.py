@@ -0,0 +1,36 @@
+"""
+Apply or roll back schema migrations (backend/migrations) against DATABASE_URL.
+
+    python migrate.py status
+    python migrate.py upgrade [--to VERSION]
+    python migrate.py downgrade --to VERSION
+"""
+import argparse
+
+import migrations
+from app import app
+from database import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['status', 'upgrade', 'downgrade'])
+    parser.add_argument('--to', type=int, help="target version (required for downgrade)")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.command == 'status':
+            for m in migrations.status(db.engine):
+                print(f"[{'x' if m['applied'] else ' '}] {m['version']:04d}_{m['name']}")
+        elif args.command == 'upgrade':
+            if not migrations.upgrade(db.engine, args.to):
+                print("Nothing to apply")
+        else:
+            if args.to is None:
+                parser.error("downgrade needs --to VERSION (0 reverts everything)")
+            if not migrations.downgrade(db.engine, args.to):
+                print("Nothing to revert")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# Tables and columns the models define that a database built from an older
+# schema.sql may lack (portfolio tables, insight materialization, KPI rollups).
+# Uses the current model tables with checkfirst, so it is a no-op on fresh databases;
+# an empty database gets every model table.
+from sqlalchemy import text
+
+from migrations import has_column, has_table, create_index, drop_index
+
+# Derived data only: safe to drop on downgrade and rebuild with the refresh jobs
+DERIVED_TABLES = ['ai_insight_dirty', 'institution_rollups', 'state_rollups', 'rollup_dirty']
+PORTFOLIO_TABLES = ['portfolio_projects', 'student_skills', 'student_links']
+
+
+def upgrade(conn):
+    from database import db
+    import models  # noqa: F401  (registers every table on db.metadata)
+
+    if not has_table(conn, 'users'):
+        db.metadata.create_all(conn)
+        return
+    for name in PORTFOLIO_TABLES + DERIVED_TABLES:
+        db.metadata.tables[name].create(conn, checkfirst=True)
+
+    if not has_column(conn, 'ai_insights', 'inputs_signature'):
+        conn.execute(text("ALTER TABLE ai_insights ADD COLUMN inputs_signature VARCHAR(64)"))
+    if not has_column(conn, 'ai_insights', 'updated_at'):
+        conn.execute(text("ALTER TABLE ai_insights ADD COLUMN updated_at TIMESTAMP NULL"))
+    if not has_column(conn, 'ai_insights', 'created_at'):
+        conn.execute(text("ALTER TABLE ai_insights ADD COLUMN created_at TIMESTAMP NULL"))
+    # Keep the newest insight per (user, type) before enforcing uniqueness
+    conn.execute(text(
+        "DELETE FROM ai_insights WHERE user_id IS NOT NULL AND id NOT IN ("
+        " SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM ai_insights"
+        " WHERE user_id IS NOT NULL GROUP BY user_id, insight_type) AS keep)"
+    ))
+    create_index(conn, 'uq_ai_insights_user_type', 'ai_insights', 'user_id', 'insight_type', unique=True)
+
+
+def downgrade(conn):
+    drop_index(conn, 'uq_ai_insights_user_type', 'ai_insights')
+    for name in reversed(DERIVED_TABLES):
+        if has_table(conn, name):
+            conn.execute(text(f"DROP TABLE {name}"))
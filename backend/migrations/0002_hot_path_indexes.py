@@ -0,0 +1,28 @@
+# Composite indexes for the queries the dashboards run on every request
+from migrations import create_index, drop_index
+
+# (name, table, columns); '-' marks a descending column
+INDEXES = [
+    ('ix_records_student_semester', 'records', ['student_id', 'semester']),
+    ('ix_events_institution_date', 'events', ['institution_id', '-event_date']),
+    ('ix_timetables_teacher', 'timetables', ['teacher_id']),
+    ('ix_schemes_status', 'schemes', ['status']),
+    ('ix_portfolio_projects_student_created', 'portfolio_projects', ['student_id', 'created_at']),
+    ('ix_student_skills_student', 'student_skills', ['student_id']),
+    ('ix_student_links_student', 'student_links', ['student_id']),
+    ('ix_users_institution_role', 'users', ['institution_id', 'role']),
+    ('ix_students_course_semester', 'students', ['course', 'current_semester']),
+    ('ix_teacher_qualifications_teacher', 'teacher_qualifications', ['teacher_id']),
+    ('ix_ai_insights_institution_type', 'ai_insights', ['institution_id', 'insight_type']),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, *columns)
+
+
+def downgrade(conn):
+    # Most of these lead with a foreign key column: drop_index re-indexes the column first (MySQL)
+    for name, table, _ in reversed(INDEXES):
+        drop_index(conn, name, table)
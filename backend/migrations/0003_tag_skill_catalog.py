@@ -0,0 +1,74 @@
+# Normalized tag and skill catalog: tags / project_tags / skills tables and
+# student_skills.skill_id, backfilled from portfolio_projects.tags and
+# student_skills.skill_name. The free-text columns stay as they are.
+from sqlalchemy import bindparam, inspect, select, text, update
+
+from migrations import has_column, has_table, create_index, drop_index
+
+CATALOG_TABLES = ['tags', 'project_tags', 'skills']
+BATCH_ROWS = 5000
+
+
+def _backfill_tags(conn):
+    from models import PortfolioProject
+    from utils.catalog import sync_project_tags
+
+    last_id = 0
+    while True:
+        rows = conn.execute(select(PortfolioProject.id, PortfolioProject.tags)
+                            .where(PortfolioProject.id > last_id, PortfolioProject.tags.is_not(None))
+                            .order_by(PortfolioProject.id).limit(BATCH_ROWS)).all()
+        if not rows:
+            return
+        sync_project_tags(conn, dict(rows))
+        last_id = rows[-1][0]
+
+
+def _backfill_skills(conn):
+    from models import StudentSkill
+    from utils.catalog import link_skills
+
+    last_id = 0
+    while True:
+        rows = conn.execute(select(StudentSkill.id, StudentSkill.skill_name)
+                            .where(StudentSkill.id > last_id).order_by(StudentSkill.id).limit(BATCH_ROWS)).all()
+        if not rows:
+            return
+        mappings = [{"skill_name": name} for _, name in rows]
+        link_skills(conn, mappings)
+        conn.execute(update(StudentSkill.__table__).where(StudentSkill.id == bindparam('b_id'))
+                     .values(skill_id=bindparam('b_skill_id')),
+                     [{"b_id": row_id, "b_skill_id": m['skill_id']} for (row_id, _), m in zip(rows, mappings)])
+        last_id = rows[-1][0]
+
+
+def upgrade(conn):
+    from database import db
+    import models  # noqa: F401  (registers every table on db.metadata)
+
+    for name in CATALOG_TABLES:
+        db.metadata.tables[name].create(conn, checkfirst=True)
+    if not has_column(conn, 'student_skills', 'skill_id'):
+        conn.execute(text("ALTER TABLE student_skills ADD COLUMN skill_id INTEGER NULL"))
+    create_index(conn, 'ix_student_skills_skill_student', 'student_skills', 'skill_id', 'student_id')
+    _backfill_tags(conn)
+    _backfill_skills(conn)
+
+
+def downgrade(conn):
+    drop_index(conn, 'ix_student_skills_skill_student', 'student_skills')
+    if has_column(conn, 'student_skills', 'skill_id'):
+        skill_fks = [fk for fk in inspect(conn).get_foreign_keys('student_skills')
+                     if fk['constrained_columns'] == ['skill_id']]
+        if conn.dialect.name == 'mysql':
+            for fk in skill_fks:
+                conn.execute(text(f"ALTER TABLE student_skills DROP FOREIGN KEY {fk['name']}"))
+            conn.execute(text("ALTER TABLE student_skills DROP COLUMN skill_id"))
+        elif not skill_fks:
+            conn.execute(text("ALTER TABLE student_skills DROP COLUMN skill_id"))
+        else:
+            # SQLite cannot drop a column declared in CREATE TABLE with a REFERENCES clause
+            conn.execute(text("UPDATE student_skills SET skill_id = NULL"))
+    for name in reversed(CATALOG_TABLES):
+        if has_table(conn, name):
+            conn.execute(text(f"DROP TABLE {name}"))
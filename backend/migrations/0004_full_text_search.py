@@ -0,0 +1,19 @@
+# Full-text search indexes (utils/search.py): FTS5 tables and sync triggers on
+# SQLite, FULLTEXT indexes on MySQL. Builds the initial index from existing rows.
+from utils.log import logger
+from utils.search import search_engine
+
+
+def upgrade(conn):
+    engine = search_engine(conn.dialect.name)
+    if engine is None or not engine.available(conn):
+        logger.warning("Skipping full-text search indexes: not supported by this database build",
+                       extra={"dialect": conn.dialect.name})
+        return
+    engine.install(conn)
+
+
+def downgrade(conn):
+    engine = search_engine(conn.dialect.name)
+    if engine is not None:
+        engine.uninstall(conn)
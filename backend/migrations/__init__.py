@@ -0,0 +1,147 @@
+# Lightweight versioned schema migrations
+#
+# Every module in this package named NNNN_description.py defines upgrade(conn) and
+# downgrade(conn). Applied versions are recorded in schema_migrations; each migration
+# runs in its own transaction (MySQL still commits DDL statements implicitly).
+import importlib
+import pkgutil
+import re
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, inspect, select
+
+MODULE_RE = re.compile(r'^(\d{4})_(\w+)$')
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(255), nullable=False),
+    Column('applied_at', DateTime, server_default=func.now())
+)
+
+
+def discover():
+    """
+    [(version, name, module)] for every migration in this package, oldest first.
+    """
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        match = MODULE_RE.match(info.name)
+        if match:
+            found.append((int(match.group(1)), match.group(2), importlib.import_module(f"{__name__}.{info.name}")))
+    return sorted(found, key=lambda m: m[0])
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        return {v for (v,) in conn.execute(select(schema_migrations.c.version))}
+
+
+def status(engine):
+    applied = applied_versions(engine)
+    return [{"version": v, "name": name, "applied": v in applied} for v, name, _ in discover()]
+
+
+def upgrade(engine, target=None, log=print):
+    """
+    Apply pending migrations up to and including `target` (default: all).
+    Returns the versions applied.
+    """
+    applied = applied_versions(engine)
+    done = []
+    for version, name, module in discover():
+        if version in applied or (target is not None and version > target):
+            continue
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name))
+        log(f"applied {version:04d}_{name}")
+        done.append(version)
+    return done
+
+
+def downgrade(engine, target, log=print):
+    """
+    Roll back applied migrations newer than `target`, newest first. Returns the versions reverted.
+    """
+    applied = applied_versions(engine)
+    done = []
+    for version, name, module in reversed(discover()):
+        if version not in applied or version <= target:
+            continue
+        with engine.begin() as conn:
+            module.downgrade(conn)
+            conn.execute(schema_migrations.delete().where(schema_migrations.c.version == version))
+        log(f"reverted {version:04d}_{name}")
+        done.append(version)
+    return done
+
+
+# --- Helpers for migration modules (all idempotent) ---
+
+def has_table(conn, table):
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn, table, column):
+    return column in {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def has_index(conn, table, name):
+    inspector = inspect(conn)
+    names = {i['name'] for i in inspector.get_indexes(table)}
+    names |= {u['name'] for u in inspector.get_unique_constraints(table)}
+    return name in names
+
+
+def fk_index_name(table, column):
+    return f"fk_{table}_{column}"
+
+
+def create_index(conn, name, table, *columns, unique=False):
+    """
+    columns are names; a leading '-' makes that column descending. A single-column
+    index drop_index left behind for a foreign key is dropped once this one covers it.
+    """
+    if not has_table(conn, table) or has_index(conn, table, name):
+        return False
+    # resolve_fks=False: on SQLite a column can still reference a table a downgrade dropped
+    reflected = Table(table, MetaData(), autoload_with=conn, resolve_fks=False)
+    Index(name, *(reflected.c[c[1:]].desc() if c.startswith('-') else reflected.c[c] for c in columns),
+          unique=unique).create(conn)
+    fk_index = fk_index_name(table, columns[0].lstrip('-'))
+    if name != fk_index:
+        drop_index(conn, fk_index, table)
+    return True
+
+
+def _keep_fk_indexed(conn, name, table, indexes):
+    """
+    MySQL needs an index leading with every foreign key column (error 1553), and
+    InnoDB drops its implicit one when a composite index leading with the column is
+    added. Before dropping such a composite, give the column its own index again.
+    """
+    inspector = inspect(conn)
+    lead = next(i['column_names'][0] for i in indexes if i['name'] == name)
+    if lead not in {fk['constrained_columns'][0] for fk in inspector.get_foreign_keys(table)}:
+        return
+    others = [i['column_names'] for i in indexes if i['name'] != name]
+    others += [u['column_names'] for u in inspector.get_unique_constraints(table)]
+    others.append(inspector.get_pk_constraint(table)['constrained_columns'])
+    if not any(columns and columns[0] == lead for columns in others):
+        create_index(conn, fk_index_name(table, lead), table, lead)
+
+
+def drop_index(conn, name, table):
+    # Only real indexes: a UNIQUE declared inside CREATE TABLE on SQLite cannot be dropped
+    if not has_table(conn, table):
+        return False
+    indexes = inspect(conn).get_indexes(table)
+    if name not in {i['name'] for i in indexes}:
+        return False
+    _keep_fk_indexed(conn, name, table, indexes)
+    reflected = Table(table, MetaData(), autoload_with=conn, resolve_fks=False)
+    # DROP INDEX only needs the name and table; any column binds the index to the table
+    Index(name, next(iter(reflected.c))).drop(conn)
+    return True
@@ -1,8 +1,7 @@
 # SQLAlchemy database models
 from database import db
-from flask_bcrypt import Bcrypt
+from utils.passwords import password_hasher, needs_rehash
 
-bcrypt = Bcrypt()
 
 class Institution(db.Model):
     __tablename__ = 'institutions'
@@ -22,14 +21,20 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.Enum('student', 'teacher', 'institution', 'admin'), nullable=False)
     institution_id = db.Column(db.Integer, db.ForeignKey('institutions.id'), nullable=True)
+    created_at = db.Column(db.TIMESTAMP, server_default=db.func.now())
     student = db.relationship('Student', backref='user', uselist=False, lazy=True, cascade="all, delete-orphan")
     teacher = db.relationship('Teacher', backref='user', uselist=False, lazy=True, cascade="all, delete-orphan")
+    __table_args__ = (db.Index('ix_users_institution_role', 'institution_id', 'role'),)
 
+    # At BCRYPT_LOG_ROUNDS, inline or in the password pool (see utils/passwords.py)
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
 class Student(db.Model):
     __tablename__ = 'students'
@@ -38,14 +43,17 @@ class Student(db.Model):
     full_name = db.Column(db.String(255), nullable=False)
     course = db.Column(db.String(100))
     current_semester = db.Column(db.Integer, default=1)
-    overall_gpa = db.Column(db.Numeric(3, 2), default=0.00)
-    attendance_percentage = db.Column(db.Numeric(5, 2), default=100.00)
+    # active_history: the KPI rollups apply (new - old) on update, so the old value is loaded before a set
+    overall_gpa = db.column_property(db.Column(db.Numeric(3, 2), default=0.00), active_history=True)
+    attendance_percentage = db.column_property(db.Column(db.Numeric(5, 2), default=100.00), active_history=True)
     records = db.relationship('Record', backref='student', lazy=True, cascade="all, delete-orphan")
     
     # --- Relationships for Portfolio ---
     portfolio_projects = db.relationship('PortfolioProject', back_populates='student', lazy=True, cascade="all, delete-orphan")
     skills = db.relationship('StudentSkill', back_populates='student', lazy=True, cascade="all, delete-orphan")
     links = db.relationship('StudentLink', back_populates='student', lazy=True, cascade="all, delete-orphan")
+    # Teacher class lists match on course + semester
+    __table_args__ = (db.Index('ix_students_course_semester', 'course', 'current_semester'),)
 
 class Teacher(db.Model):
     __tablename__ = 'teachers'
@@ -63,6 +71,7 @@ class Record(db.Model):
     semester = db.Column(db.Integer, nullable=False)
     gpa = db.Column(db.Numeric(3, 2), nullable=False)
     attendance = db.Column(db.Numeric(5, 2), nullable=False)
+    __table_args__ = (db.Index('ix_records_student_semester', 'student_id', 'semester'),)
 
 class Scheme(db.Model):
     __tablename__ = 'schemes'
@@ -70,6 +79,7 @@ class Scheme(db.Model):
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     status = db.Column(db.Enum('active', 'inactive'), default='active')
+    __table_args__ = (db.Index('ix_schemes_status', 'status'),)
 
 class AIInsight(db.Model):
     __tablename__ = 'ai_insights'
@@ -80,6 +90,52 @@ class AIInsight(db.Model):
     risk_level = db.Column(db.Enum('low', 'medium', 'high', 'N/A'), default='N/A')
     confidence = db.Column(db.Numeric(5, 2), default=0.00)
     prediction_text = db.Column(db.Text)
+    # Inputs the prediction was computed from; a mismatch means it is stale
+    inputs_signature = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.TIMESTAMP, server_default=db.func.now())
+    updated_at = db.Column(db.TIMESTAMP, server_default=db.func.now(), onupdate=db.func.now())
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'insight_type', name='uq_ai_insights_user_type'),
+        db.Index('ix_ai_insights_institution_type', 'institution_id', 'insight_type'),
+    )
+
+# Users whose insight inputs changed since the last materialization
+class AIInsightDirty(db.Model):
+    __tablename__ = 'ai_insight_dirty'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    marked_at = db.Column(db.TIMESTAMP, server_default=db.func.now())
+
+# KPI rollups: sums and counts (not averages) so rows can be combined exactly
+class InstitutionRollup(db.Model):
+    __tablename__ = 'institution_rollups'
+    institution_id = db.Column(db.Integer, primary_key=True)
+    user_count = db.Column(db.Integer, nullable=False, default=0)
+    student_count = db.Column(db.Integer, nullable=False, default=0)
+    teacher_count = db.Column(db.Integer, nullable=False, default=0)
+    gpa_sum = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    gpa_count = db.Column(db.Integer, nullable=False, default=0)
+    attendance_sum = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    attendance_count = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.TIMESTAMP, server_default=db.func.now(), onupdate=db.func.now())
+
+class StateRollup(db.Model):
+    __tablename__ = 'state_rollups'
+    state = db.Column(db.String(100), primary_key=True)
+    institution_count = db.Column(db.Integer, nullable=False, default=0)
+    user_count = db.Column(db.Integer, nullable=False, default=0)
+    student_count = db.Column(db.Integer, nullable=False, default=0)
+    teacher_count = db.Column(db.Integer, nullable=False, default=0)
+    gpa_sum = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    gpa_count = db.Column(db.Integer, nullable=False, default=0)
+    attendance_sum = db.Column(db.Numeric(18, 2), nullable=False, default=0)
+    attendance_count = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.TIMESTAMP, server_default=db.func.now(), onupdate=db.func.now())
+
+# Institutions whose rollup is waiting for the refresh job (ROLLUP_REFRESH=deferred)
+class RollupDirty(db.Model):
+    __tablename__ = 'rollup_dirty'
+    institution_id = db.Column(db.Integer, primary_key=True)
+    marked_at = db.Column(db.TIMESTAMP, server_default=db.func.now())
 
 class TeacherQualification(db.Model):
     __tablename__ = 'teacher_qualifications'
@@ -88,6 +144,7 @@ class TeacherQualification(db.Model):
     degree = db.Column(db.String(100), nullable=False)
     university = db.Column(db.String(255), nullable=False)
     year_completed = db.Column(db.Integer)
+    __table_args__ = (db.Index('ix_teacher_qualifications_teacher', 'teacher_id'),)
 
 class Event(db.Model):
     __tablename__ = 'events'
@@ -96,6 +153,8 @@ class Event(db.Model):
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     event_date = db.Column(db.Date, nullable=False)
+    # Latest-first reads per institution
+    __table_args__ = (db.Index('ix_events_institution_date', 'institution_id', db.text('event_date DESC')),)
 
 class Timetable(db.Model):
     __tablename__ = 'timetables'
@@ -107,6 +166,7 @@ class Timetable(db.Model):
     day_of_week = db.Column(db.Enum('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'), nullable=False)
     start_time = db.Column(db.Time, nullable=False)
     end_time = db.Column(db.Time, nullable=False)
+    __table_args__ = (db.Index('ix_timetables_teacher', 'teacher_id'),)
 
 class PortfolioProject(db.Model):
     __tablename__ = 'portfolio_projects'
@@ -115,9 +175,29 @@ class PortfolioProject(db.Model):
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=True)
     project_link = db.Column(db.String(500), nullable=True)
-    tags = db.Column(db.String(255), nullable=True)
+    tags = db.Column(db.String(255), nullable=True)  # as entered; normalized copies in project_tags
     created_at = db.Column(db.TIMESTAMP, server_default=db.func.now())
     student = db.relationship('Student', back_populates='portfolio_projects')
+    __table_args__ = (db.Index('ix_portfolio_projects_student_created', 'student_id', 'created_at'),)
+
+# --- Normalized tag and skill catalog (kept in sync by utils/catalog.py) ---
+
+class Tag(db.Model):
+    __tablename__ = 'tags'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)  # trimmed, lower-case
+
+class ProjectTag(db.Model):
+    __tablename__ = 'project_tags'
+    project_id = db.Column(db.Integer, db.ForeignKey('portfolio_projects.id', ondelete='CASCADE'), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    # Tag search and facets start from the tag
+    __table_args__ = (db.Index('ix_project_tags_tag_project', 'tag_id', 'project_id'),)
+
+class Skill(db.Model):
+    __tablename__ = 'skills'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)  # trimmed, lower-case
 
 # --- NEW TABLES FOR SKILLS AND LINKS ---
 
@@ -127,8 +207,11 @@ class StudentSkill(db.Model):
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
     skill_name = db.Column(db.String(100), nullable=False)
     category = db.Column(db.String(100), nullable=True) # e.g., "Technical", "Soft Skill"
+    skill_id = db.Column(db.Integer, db.ForeignKey('skills.id'), nullable=True)  # catalog entry of skill_name
     
     student = db.relationship('Student', back_populates='skills')
+    __table_args__ = (db.Index('ix_student_skills_student', 'student_id'),
+                      db.Index('ix_student_skills_skill_student', 'skill_id', 'student_id'))
 
 class StudentLink(db.Model):
     __tablename__ = 'student_links'
@@ -137,4 +220,5 @@ class StudentLink(db.Model):
     title = db.Column(db.String(100), nullable=False) # e.g., "GitHub", "LinkedIn"
     url = db.Column(db.String(500), nullable=False)
     
-    student = db.relationship('Student', back_populates='links')
\ No newline at end of file
+    student = db.relationship('Student', back_populates='links')
+    __table_args__ = (db.Index('ix_student_links_student', 'student_id'),)
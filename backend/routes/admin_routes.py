@@ -1,5 +1,23 @@
 from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt_identity
 from utils.jwt_helper import role_required
+from utils.identity import invalidate_identity
+from utils.reference_data import reference_cache, invalidate_institution, institution_profile
+from utils.pagination import parse_page_args, parse_fields, keyset_page
+from utils.serializers import row_serializer
+from utils.jobs import job_queue
+from utils.insights import rebuild_insights
+from utils.rollups import nationwide_kpis, refresh_rollups
+from utils.analytics import BUCKETS, cached_enrolment_trend, cache_window
+from utils.conditional import conditional, versions, NATIONWIDE
+from utils.query_budget import query_budget
+from utils.db_pool import db_pool_monitor
+from utils.db_routing import read_router
+from utils.rate_limit import rate_limiter
+from utils.provisioning import provision_from_request
+from utils.catalog import SEARCH_FIELDS, parse_search_args, search_response
+from utils.search import INDEXES, SearchUnavailable, text_search, parse_text_search_args
+from utils.rosters import STUDENT_FIELDS, TEACHER_FIELDS, ROSTERS, roster_query, export_roster
 # --- ADD IMPORTS for models used in the new route ---
 from models import db, User, Institution, Student, Teacher 
 # --- END ADD IMPORTS ---
@@ -9,34 +27,35 @@ from sqlalchemy import cast, String # Keep this if used elsewhere, not needed fo
 admin_bp = Blueprint('admin_bp', __name__)
 
 @admin_bp.route('/overview', methods=['GET'])
+@query_budget(3)
 @role_required('admin')
+@conditional(lambda user: [NATIONWIDE], cache_control='private, max-age=30', extra=lambda: [cache_window()])
 def get_admin_overview():
-    total_institutions = db.session.query(func.count(Institution.id)).scalar()
-    total_users = db.session.query(func.count(User.id)).scalar() # Requires User model
-    total_students = db.session.query(func.count(Student.id)).scalar() # Requires Student model
-    total_teachers = db.session.query(func.count(Teacher.id)).scalar() # Requires Teacher model
+    """
+    Nationwide KPIs and the state heatmap from the state rollups;
+    ?live=1 recomputes them from the base tables for auditing.
+    ?trend_bucket=year|month sets the enrolment trend granularity.
+    """
+    bucket = request.args.get('trend_bucket', 'year')
+    if bucket not in BUCKETS:
+        return jsonify(msg=f"trend_bucket must be one of: {', '.join(BUCKETS)}"), 400
+    nationwide = nationwide_kpis(live=request.args.get('live') == '1')
     
-    # Mock nationwide chart data
-    enrolment_trend = [
-        {"year": 2021, "students": 15000}, {"year": 2022, "students": 17500},
-        {"year": 2023, "students": 19000}, {"year": 2024, "students": 22000},
-    ]
+    # Enrolments per period from users.created_at (cached per time window)
+    enrolment_trend = cached_enrolment_trend(bucket=bucket)
     
     # State-wise data
-    state_data = db.session.query(
-        Institution.state, 
-        func.count(Institution.id).label('count')
-    ).group_by(Institution.state).all() # Requires Institution model
-    
-    state_heatmap = [{"state": s.state, "institutions": s.count} for s in state_data]
+    state_heatmap = [{
+        "state": s["state"],
+        "institutions": s["institutions"],
+        "students": s["total_students"],
+        "avg_gpa": s["avg_gpa"]
+    } for s in nationwide["states"]]
 
     overview_data = {
-        "kpis": {
-            "total_institutions": total_institutions,
-            "total_users": total_users,
-            "total_students": total_students,
-            "total_teachers": total_teachers
-        },
+        "kpis": nationwide["kpis"],
+        "kpis_source": nationwide["source"],
+        "kpis_refreshed_at": nationwide["refreshed_at"],
         "charts": {
             "enrolment_trend": enrolment_trend,
             "state_heatmap": state_heatmap
@@ -67,7 +86,16 @@ def manage_institutions():
             'institution': { 'id': new_inst.id, 'name': new_inst.name, 'type': new_inst.type, 'state': new_inst.state }
         }), 201
 
-    # GET request
+    # GET request; ?q= narrows to full-text matches (best first, ?limit=, default 20)
+    if request.args.get('q') is not None:
+        try:
+            _, limit = parse_page_args(default_limit=20, max_limit=100)
+            inst_list, _ = text_search('institutions', request.args['q'], limit=limit)
+        except ValueError as e:
+            return jsonify(msg=str(e)), 400
+        except SearchUnavailable as e:
+            return jsonify(msg=str(e)), 503
+        return jsonify(inst_list), 200
     institutions = Institution.query.order_by(Institution.name).all() # Added ordering
     inst_list = [{
         "id": i.id, "name": i.name, "type": i.type,
@@ -88,6 +116,7 @@ def manage_institution(id):
         inst.state = data.get('state', inst.state)
         inst.district = data.get('district', inst.district)
         db.session.commit()
+        invalidate_institution(id)
         return jsonify(msg="Institution updated"), 200
         
     if request.method == 'DELETE':
@@ -96,52 +125,203 @@ def manage_institution(id):
         User.query.filter_by(institution_id=id).update({"institution_id": None})
         db.session.delete(inst)
         db.session.commit()
+        # The bulk update skips ORM events, so drop every cached identity
+        invalidate_identity()
+        # Events go with the institution through ON DELETE CASCADE, also invisible to the ORM
+        invalidate_institution(id)
         return jsonify(msg="Institution deleted"), 200
 
-# --- NEW ROUTE: Get Specific Institution Details ---
+# --- Institution Details (keyset-paginated rosters) ---
+
+def _roster_page(kind, institution_id, after_id, limit, fields):
+    model, _ = ROSTERS[kind]
+    rows, next_after_id = keyset_page(roster_query(kind, institution_id, fields), model.id, after_id, limit)
+    return row_serializer(fields).many(rows), next_after_id
+
 @admin_bp.route('/institutions/<int:id>/details', methods=['GET'])
 @role_required('admin')
 def get_institution_details(id):
-    institution = Institution.query.get_or_404(id)
-
-    # Fetch related students - Ensure relationships are loaded efficiently
-    # Using options(joinedload(Student.user)) might be needed for email if lazy loading is off
-    students = Student.query.join(User).filter(User.institution_id == id).all()
-
-    # Fetch related teachers
-    teachers = Teacher.query.join(User).filter(User.institution_id == id).all()
-
-    # Prepare data for JSON response
-    student_list = []
-    for s in students:
-        # Check if user relationship exists before accessing email
-        user_email = s.user.email if s.user else 'N/A'
-        student_list.append({
-            'id': s.id, 'user_id': s.user_id, 'name': s.full_name,
-            'email': user_email, 'course': s.course,
-            'gpa': float(s.overall_gpa) if s.overall_gpa is not None else None, # Handle potential None
-            'attendance': float(s.attendance_percentage) if s.attendance_percentage is not None else None # Handle potential None
-        })
-
-    teacher_list = []
-    for t in teachers:
-        user_email = t.user.email if t.user else 'N/A'
-        teacher_list.append({
-            'id': t.id, 'user_id': t.user_id, 'name': t.full_name,
-            'email': user_email, 'subject': t.subject,
-            'avg_feedback': float(t.avg_feedback) if t.avg_feedback is not None else None # Handle potential None
-        })
+    """
+    Institution profile plus the first page of students and teachers.
+    Further pages come from /students and /teachers with ?after_id=.
+    """
+    institution = institution_profile(id)
+    if institution is None:
+        return jsonify(msg="Institution not found"), 404
+
+    try:
+        _, limit = parse_page_args()
+        fields = parse_fields({**STUDENT_FIELDS, **TEACHER_FIELDS})
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    student_fields = [f for f in fields if f in STUDENT_FIELDS]
+    teacher_fields = [f for f in fields if f in TEACHER_FIELDS]
+
+    student_list, students_next = _roster_page('students', id, 0, limit, student_fields)
+    teacher_list, teachers_next = _roster_page('teachers', id, 0, limit, teacher_fields)
 
     return jsonify({
-        'institution': {
-            'id': institution.id,
-            'name': institution.name,
-            'type': institution.type,
-            'state': institution.state,
-            'district': institution.district
-            # Add other details like created_at if needed
-        },
+        'institution': institution,
         'students': student_list,
-        'teachers': teacher_list
+        'teachers': teacher_list,
+        'students_next_after_id': students_next,
+        'teachers_next_after_id': teachers_next
     }), 200
-# --- END NEW ROUTE ---
\ No newline at end of file
+
+@admin_bp.route('/institutions/<int:id>/<any(students, teachers):kind>', methods=['GET'])
+@role_required('admin')
+def get_institution_roster(id, kind):
+    """
+    One page of an institution's students or teachers: ?after_id=&limit=&fields=
+    """
+    try:
+        after_id, limit = parse_page_args()
+        fields = parse_fields(ROSTERS[kind][1])
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+
+    items, next_after_id = _roster_page(kind, id, after_id, limit, fields)
+    return jsonify(items=items, next_after_id=next_after_id), 200
+
+@admin_bp.route('/institutions/<int:id>/export/<any(students, teachers):kind>', methods=['GET'])
+@role_required('admin')
+def export_institution_roster(id, kind):
+    """
+    Full roster as a streamed NDJSON/CSV download (?format=&fields=&gzip=1).
+    """
+    try:
+        return export_roster(kind, id)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+
+@admin_bp.route('/institutions/<int:id>/counts', methods=['GET'])
+@role_required('admin')
+def get_institution_counts(id):
+    """
+    Roster totals in one query, so the UI can show them without loading rows.
+    """
+    students = db.session.query(func.count(Student.id)).join(User).filter(User.institution_id == id).scalar_subquery()
+    teachers = db.session.query(func.count(Teacher.id)).join(User).filter(User.institution_id == id).scalar_subquery()
+    total_students, total_teachers = db.session.query(students, teachers).one()
+    return jsonify(students=total_students, teachers=total_teachers), 200
+
+# --- Student search across institutions ---
+
+@admin_bp.route('/students/search', methods=['GET'])
+@query_budget(6)
+@role_required('admin')
+def search_students():
+    """
+    Students by skill, project tag, institution and state:
+    ?skills=python&tags=iot&match=all|any&institution_id=&state=&after_id=&limit=&fields=
+    The first page also carries skill, tag, institution and state facet counts.
+    """
+    try:
+        filters = parse_search_args(admin=True)
+        after_id, limit = parse_page_args()
+        fields = parse_fields(SEARCH_FIELDS)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    return jsonify(search_response(filters, fields, after_id, limit,
+                                   ('skills', 'tags', 'institutions', 'states'))), 200
+
+# --- Full-text search ---
+
+@admin_bp.route('/search', methods=['GET'])
+@query_budget(3)
+@role_required('admin')
+def full_text_search():
+    """
+    Prefix search, best match first: ?q=&type=institutions|students|projects
+    &institution_id=&limit=&cursor=
+    """
+    try:
+        index, q = parse_text_search_args(list(INDEXES))
+        _, limit = parse_page_args(default_limit=20, max_limit=100)
+        institution_id = request.args.get('institution_id', type=int)
+        items, next_cursor = text_search(index, q, institution_id, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    except SearchUnavailable as e:
+        return jsonify(msg=str(e)), 503
+    return jsonify(items=items, next_cursor=next_cursor), 200
+
+@admin_bp.route('/institutions/<int:id>/users/bulk', methods=['POST'])
+@role_required('admin')
+def provision_institution_users(id):
+    """
+    Create student/teacher accounts for an institution from a CSV or JSON batch.
+    """
+    if db.session.get(Institution, id) is None:
+        return jsonify(msg="Institution not found"), 404
+    return provision_from_request(id, int(get_jwt_identity()))
+
+# --- AI Insights ---
+
+@admin_bp.route('/insights/rebuild', methods=['POST'])
+@role_required('admin')
+def rebuild_ai_insights():
+    """
+    Recompute stored insights: ?mode=incremental (default) or full.
+    Runs as a background job (202 + job id); ?sync=1 returns the counts directly.
+    """
+    mode = request.args.get('mode', 'incremental')
+    if mode not in ('incremental', 'full'):
+        return jsonify(msg="mode must be 'incremental' or 'full'"), 400
+
+    if request.args.get('sync') == '1':
+        return jsonify(rebuild_insights(full=mode == 'full')), 200
+
+    job = job_queue.submit('rebuild_insights', {'full': mode == 'full'}, user_id=int(get_jwt_identity()))
+    return jsonify(msg=f"{mode.capitalize()} rebuild queued", job_id=job['id'],
+                   status_url=f"/api/jobs/{job['id']}"), 202
+
+@admin_bp.route('/rollups/refresh', methods=['POST'])
+@role_required('admin')
+def refresh_kpi_rollups():
+    """
+    Refresh KPI rollups: ?mode=incremental (dirty institutions, default) or full.
+    Runs as a background job (202 + job id); ?sync=1 returns the counts directly.
+    """
+    mode = request.args.get('mode', 'incremental')
+    if mode not in ('incremental', 'full'):
+        return jsonify(msg="mode must be 'incremental' or 'full'"), 400
+
+    if request.args.get('sync') == '1':
+        return jsonify(refresh_rollups(full=mode == 'full')), 200
+
+    job = job_queue.submit('refresh_rollups', {'full': mode == 'full'}, user_id=int(get_jwt_identity()))
+    return jsonify(msg=f"{mode.capitalize()} refresh queued", job_id=job['id'],
+                   status_url=f"/api/jobs/{job['id']}"), 202
+
+# --- Monitoring ---
+
+@admin_bp.route('/metrics/cache', methods=['GET'])
+@role_required('admin')
+def get_cache_metrics():
+    return jsonify(reference_cache.stats()), 200
+
+@admin_bp.route('/metrics/db', methods=['GET'])
+@role_required('admin')
+def get_db_metrics():
+    """
+    Per engine: pool usage, checkout-wait and query-time histograms, recent slow queries;
+    plus how many requests read from a replica.
+    """
+    return jsonify(engines=db_pool_monitor.stats(), read_routing=read_router.stats()), 200
+
+@admin_bp.route('/metrics/rate-limits', methods=['GET'])
+@role_required('admin')
+def get_rate_limit_metrics():
+    """
+    Allowed/rejected counts per rule and the expensive work (bcrypt checks) rejections avoided.
+    """
+    return jsonify(rate_limiter.stats()), 200
+
+@admin_bp.route('/metrics/etags', methods=['GET'])
+@role_required('admin')
+def get_etag_metrics():
+    """
+    Conditional GETs answered 304 vs in full, and responses left untagged because of replica lag.
+    """
+    return jsonify(versions.stats()), 200
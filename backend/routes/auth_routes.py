@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from models import db, User, Student, Teacher
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt
+from utils.revocation import revocation_list
+from utils.passwords import PasswordPoolBusy
+from utils.rate_limit import rate_limiter, guards
+from utils.log import logger
 import datetime
 
 auth_bp = Blueprint('auth_bp', __name__)
@@ -50,14 +54,33 @@ def signup():
         return jsonify(msg=f"Error: {str(e)}"), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@guards('hash_checks')
 def login():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
 
+    # Per-IP limit was charged before the view; an address whose failed-attempt
+    # bucket is empty is turned away here, before any bcrypt work
+    email_key = email.strip().lower() if isinstance(email, str) else None
+    retry_after = rate_limiter.check(request.blueprint, 'email', email_key)
+    if retry_after:
+        return rate_limiter.reject(retry_after, msg="Too many failed sign-ins for this account, please retry later")
+
     user = User.query.filter_by(email=email).first()
 
-    if user and user.check_password(password):
+    try:
+        valid = user is not None and user.check_password(password)
+    except PasswordPoolBusy:
+        return jsonify(msg="Too many sign-ins right now, please retry"), 503, {'Retry-After': '1'}
+
+    if not valid:
+        rate_limiter.hit(request.blueprint, 'email', email_key)
+
+    if valid:
+        if user.password_needs_rehash():
+            _rehash(user, password)
+
         # --- THIS IS THE FIX ---
         # The identity must be a string, not an integer
         access_token = create_access_token(
@@ -68,4 +91,24 @@ def login():
         
         return jsonify(access_token=access_token, role=user.role), 200
     else:
-        return jsonify(msg="Bad email or password"), 401
\ No newline at end of file
+        return jsonify(msg="Bad email or password"), 401
+
+def _rehash(user, password):
+    # Stored cost differs from BCRYPT_LOG_ROUNDS: upgrade while we have the plaintext.
+    # Best effort; a failure leaves the old (still valid) hash for the next login.
+    try:
+        user.set_password(password)
+        db.session.commit()
+    except PasswordPoolBusy:
+        pass
+    except Exception:
+        db.session.rollback()
+        logger.warning("Password rehash failed", extra={"user_id": user.id}, exc_info=True)
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    # Revoke this token; the entry expires together with the token itself
+    claims = get_jwt()
+    revocation_list.revoke_token(claims['jti'], claims['exp'])
+    return jsonify(msg="Logged out"), 200
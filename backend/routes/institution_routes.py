@@ -1,49 +1,55 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.jwt_helper import role_required
+from utils.identity import current_user
+from utils.query_budget import query_budget
+from utils.rosters import export_roster
+from utils.ingest import ingest_records_csv
+from utils.provisioning import provision_from_request
+from utils.catalog import SEARCH_FIELDS, parse_search_args, search_response
+from utils.pagination import parse_page_args, parse_fields
+from utils.search import SearchUnavailable, text_search, parse_text_search_args
+from utils.jobs import job_queue
+from utils.insights import institution_insight
+from utils.rollups import institution_kpis
+from utils.analytics import cached_department_performance, cache_window
+from utils.conditional import conditional
+from utils.serializers import FACULTY
 from models import db, User, Student, Teacher, Institution
 from sqlalchemy.sql import func
-import pandas as pd
-import io
 
 institution_bp = Blueprint('institution_bp', __name__)
 
 @institution_bp.route('/overview', methods=['GET'])
+@query_budget(4)
 @role_required('institution')
+@conditional(lambda user: [('institution', user.institution_id)], extra=lambda: [cache_window()])
 def get_institution_overview():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    """
+    KPIs come from the institution's rollup row; ?live=1 recomputes them from the base tables.
+    """
+    user = current_user()
     
     # --- Check for associated institution ---
     if not user or not user.institution_id:
         return jsonify(msg="User or institution ID not found"), 404
         
-    institution = Institution.query.get(user.institution_id)
+    # Eager-loaded with the user by the identity layer
+    institution = user.institution
 
     if not institution:
         return jsonify(msg="Institution data not found"), 404
 
-    # KPIs (using mock values and simple aggregation)
-    total_students = db.session.query(func.count(Student.id)).join(User).filter(User.institution_id == institution.id).scalar()
-    total_teachers = db.session.query(func.count(Teacher.id)).join(User).filter(User.institution_id == institution.id).scalar()
-    avg_gpa = db.session.query(func.avg(Student.overall_gpa)).join(User).filter(User.institution_id == institution.id).scalar()
+    # KPIs (precomputed rollup)
+    kpis = institution_kpis(institution.id, live=request.args.get('live') == '1')
     
     # Mock Faculty List for the dashboard card
-    teachers = Teacher.query.join(User).filter(User.institution_id == institution.id).all()
-    faculty_list = [{
-        "id": t.id,
-        "name": t.full_name,
-        "subject": t.subject,
-        "avg_feedback": float(t.avg_feedback)
-    } for t in teachers]
+    # Driven from ix_users_institution_role, then teachers.user_id
+    faculty_ids = db.session.query(User.id).filter(User.institution_id == institution.id, User.role == 'teacher')
+    teachers = Teacher.query.filter(Teacher.user_id.in_(faculty_ids)).all()
+    faculty_list = FACULTY.many(teachers)
     
-    # Mock Chart Data
-    department_performance = [
-        {"name": "CSE", "avg_gpa": 8.5},
-        {"name": "Mech", "avg_gpa": 7.8},
-        {"name": "Civil", "avg_gpa": 7.2},
-        {"name": "EEE", "avg_gpa": 8.1},
-    ]
+    # Per-course averages over the semester records (cached per time window)
+    department_performance = cached_department_performance(institution.id)
 
     dashboard_data = {
         "profile": {
@@ -52,31 +58,127 @@ def get_institution_overview():
             "state": institution.state
         },
         "kpis": {
-            "total_students": total_students,
-            "total_teachers": total_teachers,
-            "avg_gpa": round(float(avg_gpa or 0), 2),
+            "total_students": kpis["total_students"],
+            "total_teachers": kpis["total_teachers"],
+            "avg_gpa": kpis["avg_gpa"],
+            "avg_attendance": kpis["avg_attendance"],
             "nirf_rank": 42 # Mocked
         },
+        "kpis_source": kpis["source"],
+        "kpis_refreshed_at": kpis["refreshed_at"],
         "faculty": faculty_list,
+        "ai_insight": institution_insight(institution.id, kpis["total_students"], kpis["avg_gpa"]),
         "charts": {
             "department_performance": department_performance
         }
     }
     return jsonify(dashboard_data), 200
 
-# --- MOCK CSV UPLOAD ROUTE (needed for Institution Dashboard UI) ---
+# --- Roster Export ---
+
+@institution_bp.route('/export/<any(students, teachers):kind>', methods=['GET'])
+@role_required('institution')
+def export_own_roster(kind):
+    user = current_user()
+    if not user.institution_id:
+        return jsonify(msg="User or institution ID not found"), 404
+    try:
+        return export_roster(kind, user.institution_id)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+
+# --- Student search (skills / project tags) ---
+
+@institution_bp.route('/students/search', methods=['GET'])
+@query_budget(4)
+@role_required('institution')
+def search_own_students():
+    """
+    Own students by skill and project tag: ?skills=python,sql&tags=flask&match=all|any
+    &after_id=&limit=&fields=. The first page also carries skill and tag facet counts.
+    """
+    user = current_user()
+    if not user.institution_id:
+        return jsonify(msg="User or institution ID not found"), 404
+    try:
+        filters = parse_search_args()
+        after_id, limit = parse_page_args()
+        fields = parse_fields(SEARCH_FIELDS, default=[f for f in SEARCH_FIELDS if f != 'institution_id'])
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    filters['institution_id'] = user.institution_id
+    return jsonify(search_response(filters, fields, after_id, limit, ('skills', 'tags'))), 200
+
+@institution_bp.route('/search', methods=['GET'])
+@query_budget(3)
+@role_required('institution')
+def search_own():
+    """
+    Prefix search over own students or their projects, best match first:
+    ?q=&type=students|projects&limit=&cursor=
+    """
+    user = current_user()
+    if not user.institution_id:
+        return jsonify(msg="User or institution ID not found"), 404
+    try:
+        index, q = parse_text_search_args(['students', 'projects'])
+        _, limit = parse_page_args(default_limit=20, max_limit=100)
+        items, next_cursor = text_search(index, q, user.institution_id, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    except SearchUnavailable as e:
+        return jsonify(msg=str(e)), 503
+    return jsonify(items=items, next_cursor=next_cursor), 200
+
+# --- CSV UPLOAD (semester records) ---
 
 @institution_bp.route('/upload', methods=['POST'])
 @role_required('institution')
 def upload_data():
+    """
+    Bulk-upsert semester records from a CSV (email, semester, gpa, attendance,
+    plus optional student profile columns). Runs as a background job and returns
+    202 with the job id; ?sync=1 processes inline and returns the report.
+    """
     if 'file' not in request.files:
         return jsonify(msg="No file part"), 400
     file = request.files['file']
     if file.filename == '':
         return jsonify(msg="No selected file"), 400
+    if not file.filename.endswith('.csv'):
+        return jsonify(msg="Invalid file type. Please upload a CSV."), 400
+
+    user = current_user()
+    if not user.institution_id:
+        return jsonify(msg="User or institution ID not found"), 404
+
+    if request.args.get('sync') != '1':
+        # Spool to disk and hand off to the job queue; poll /api/jobs/<id> for progress
+        path = job_queue.spool(file.stream, '.csv')
+        job = job_queue.submit('ingest_records', {'path': path, 'institution_id': user.institution_id},
+                               institution_id=user.institution_id, user_id=user.id)
+        return jsonify(msg="Upload accepted for processing", job_id=job['id'],
+                       status_url=f"/api/jobs/{job['id']}"), 202
+
+    try:
+        report = ingest_records_csv(file.stream, user.institution_id)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
 
-    if file and file.filename.endswith('.csv'):
-        # Mock processing: just return success
-        return jsonify(msg=f"Successfully uploaded and processed mock data."), 200
-            
-    return jsonify(msg="Invalid file type. Please upload a CSV."), 400
\ No newline at end of file
+    msg = f"Processed {report['rows_total']} rows: {report['rows_ok']} saved, {report['rows_failed']} failed."
+    return jsonify(msg=msg, report=report), 200
+
+# --- Bulk account provisioning ---
+
+@institution_bp.route('/users/bulk', methods=['POST'])
+@role_required('institution')
+def bulk_create_users():
+    """
+    Create student/teacher accounts from a CSV upload or JSON body
+    (email, full_name, password, role, optional course/current_semester/subject).
+    Returns 202 with the job id; ?sync=1 returns the per-row report.
+    """
+    user = current_user()
+    if not user.institution_id:
+        return jsonify(msg="User or institution ID not found"), 404
+    return provision_from_request(user.institution_id, user.id)
@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from utils.jobs import job_queue, serialize_job
+
+jobs_bp = Blueprint('jobs_bp', __name__)
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """
+    Status, progress counters, result and error of a background job.
+    Visible to the user who started it and to admins.
+    """
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify(msg="Job not found"), 404
+    if str(job['user_id']) != get_jwt_identity() and get_jwt().get('role') != 'admin':
+        return jsonify(msg="Job not found"), 404
+    return jsonify(serialize_job(job)), 200
@@ -1,56 +1,91 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
 from utils.jwt_helper import role_required
+from utils.identity import current_student
 # Import all required models
 from models import db, Student, Record, Scheme, Event, User, PortfolioProject, StudentSkill, StudentLink
-from utils.ai_model import predict_student_risk
+from utils.insights import student_insight
+from utils.query_budget import query_budget
+from utils.reference_data import active_schemes, cached_latest_events, store_latest_events
+from utils.serializers import EVENT_ROW, GPA_TREND, PROJECT, SKILL, LINK
+from utils.portfolio import portfolio, apply_operations
+from utils.conditional import conditional, SCHEMES
+from sqlalchemy import select, union_all, literal, null, type_coerce, Integer, String, Date
 
 # Define the blueprint ONCE
 student_bp = Blueprint('student_bp', __name__)
 
 # --- Dashboard Route ---
 
+def _records_and_events(student_id, institution_id):
+    """
+    Fetch the student's semester records and the institution's latest five
+    events in a single round trip (UNION ALL with a kind discriminator).
+    """
+    records = select(
+        literal('record').label('kind'),
+        Record.semester.label('semester'),
+        Record.gpa.label('gpa'),
+        Record.attendance.label('attendance'),
+        type_coerce(null(), Integer).label('event_id'),
+        type_coerce(null(), String).label('title'),
+        type_coerce(null(), Date).label('event_date')
+    ).where(Record.student_id == student_id)
+
+    latest_events = select(Event.id, Event.title, Event.event_date) \
+        .where(Event.institution_id == institution_id) \
+        .order_by(Event.event_date.desc()).limit(5).subquery()
+    events = select(
+        literal('event'), null(), null(), null(),
+        latest_events.c.id, latest_events.c.title, latest_events.c.event_date
+    )
+
+    rows = db.session.execute(union_all(records, events)).all()
+    record_rows = sorted((r for r in rows if r.kind == 'record'), key=lambda r: r.semester)
+    event_rows = sorted((r for r in rows if r.kind == 'event'), key=lambda r: r.event_date, reverse=True)
+    return record_rows, event_rows
+
 @student_bp.route('/dashboard', methods=['GET'])
+@query_budget(4)
 @role_required('student')
+@conditional(lambda user: [('user', user.id), ('institution', user.institution_id), SCHEMES])
 def get_student_dashboard():
-    user_id = get_jwt_identity()
-    student = Student.query.filter_by(user_id=user_id).first()
+    # User, profile and institution arrive in one joined query from the identity layer
+    student = current_student()
 
     if not student:
         return jsonify(msg="Student profile not found"), 404
-        
-    # Fetch academic records including attendance
-    records = Record.query.filter_by(student_id=student.id).order_by(Record.semester).all()
-    gpa_trend = [
-        {"semester": r.semester, "gpa": float(r.gpa), "attendance": float(r.attendance)} 
-        for r in records
-    ]
-    
-    # Get active schemes
-    schemes = Scheme.query.filter_by(status='active').all()
-    scheme_list = [{"id": s.id, "name": s.name, "description": s.description} for s in schemes]
-    
-    # Get institution events
+
     user = student.user
-    events = []
-    if user and user.institution_id: # Check if user and institution_id exist
-        events = Event.query.filter_by(institution_id=user.institution_id).order_by(Event.event_date.desc()).limit(5).all()
+    # Latest events are shared by the whole institution and cached; on a miss they
+    # ride along with the records query instead of costing a round trip of their own
+    event_list = cached_latest_events(user.institution_id) if user.institution_id else []
+    if event_list is None:
+        records, events = _records_and_events(student.id, user.institution_id)
+        event_list = EVENT_ROW.many(events)
+        store_latest_events(user.institution_id, event_list)
+    else:
+        records = db.session.query(Record.semester, Record.gpa, Record.attendance) \
+            .filter_by(student_id=student.id).order_by(Record.semester).all()
+
+    # Academic records including attendance
+    gpa_trend = GPA_TREND.many(records)
     
-    event_list = [{"id": e.id, "title": e.title, "date": e.event_date.isoformat()} for e in events]
+    # Active schemes (cached, invalidated on scheme writes)
+    scheme_list = active_schemes()
     
-    # Get AI Insight
-    ai_insight = predict_student_risk(float(student.attendance_percentage), float(student.overall_gpa))
+    # AI Insight (materialized; recomputed inline only if the inputs moved since)
+    ai_insight = student_insight(user.id, student.attendance_percentage, student.overall_gpa)
 
     dashboard_data = {
         "profile": {
             "name": student.full_name,
             "course": student.course,
-            "institution": student.user.institution.name if user and user.institution else "N/A",
+            "institution": user.institution.name if user.institution else "N/A",
             "semester": student.current_semester
         },
         "kpis": {
-            "gpa": float(student.overall_gpa),
-            "attendance": float(student.attendance_percentage),
+            "gpa": student.overall_gpa,
+            "attendance": student.attendance_percentage,
             "credits_earned": (student.current_semester - 1) * 20 # Mocked
         },
         "charts": {
@@ -66,41 +101,48 @@ def get_student_dashboard():
 # --- Portfolio Routes ---
 
 @student_bp.route('/portfolio', methods=['GET'])
+@query_budget(4)
 @role_required('student')
+@conditional(lambda user: [('user', user.id)])
 def get_portfolio():
-    user_id = get_jwt_identity()
-    student = Student.query.filter_by(user_id=user_id).first()
+    student = current_student()
     if not student:
         return jsonify(msg="Student profile not found"), 404
 
-    # Get Projects
-    projects = PortfolioProject.query.filter_by(student_id=student.id).order_by(PortfolioProject.created_at.desc()).all()
-    project_list = [
-        {"id": p.id, "title": p.title, "description": p.description, "project_link": p.project_link, "tags": p.tags.split(',') if p.tags else []}
-        for p in projects
-    ]
-    
-    # Get Skills
-    skills = StudentSkill.query.filter_by(student_id=student.id).all()
-    skill_list = [{"id": s.id, "skill_name": s.skill_name, "category": s.category} for s in skills]
-    
-    # Get Links
-    links = StudentLink.query.filter_by(student_id=student.id).all()
-    link_list = [{"id": l.id, "title": l.title, "url": l.url} for l in links]
-    
-    # Return all portfolio data
-    return jsonify(
-        projects=project_list,
-        skills=skill_list,
-        links=link_list
-    ), 200
+    return jsonify(portfolio(student.id)), 200
+
+
+@student_bp.route('/portfolio/batch', methods=['POST'])
+@role_required('student')
+def batch_portfolio():
+    """
+    Apply a list of add/update/delete operations on projects, skills and links in
+    one transaction: {"operations": [{"op", "type", "id", "data"}, ...]}.
+    All or nothing; returns per-operation results and the updated portfolio.
+    """
+    student = current_student()
+    if not student:
+        return jsonify(msg="Student profile not found"), 404
+
+    student_id = student.id  # COMMIT expires the loaded profile
+    data = request.get_json(silent=True) or {}
+    try:
+        ok, results = apply_operations(student, data.get('operations'))
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    except Exception as e:
+        return jsonify(msg=f"Error applying operations: {str(e)}"), 500
+
+    if not ok:
+        failed = sum(r['status'] == 'error' for r in results)
+        return jsonify(msg=f"No changes applied: {failed} operation(s) failed", results=results), 400
+    return jsonify(msg=f"Applied {len(results)} operation(s)", results=results, portfolio=portfolio(student_id)), 200
 
 
 @student_bp.route('/portfolio/project', methods=['POST'])
 @role_required('student')
 def add_project():
-    user_id = get_jwt_identity()
-    student = Student.query.filter_by(user_id=user_id).first()
+    student = current_student()
     if not student:
         return jsonify(msg="Student profile not found"), 404
         
@@ -121,13 +163,7 @@ def add_project():
         db.session.add(new_project)
         db.session.commit()
         
-        return jsonify({
-            "id": new_project.id,
-            "title": new_project.title,
-            "description": new_project.description,
-            "project_link": new_project.project_link,
-            "tags": new_project.tags.split(',') if new_project.tags else []
-        }), 201
+        return jsonify(PROJECT.one(new_project)), 201
     except Exception as e:
         db.session.rollback()
         return jsonify(msg=f"Error adding project: {str(e)}"), 500
@@ -135,8 +171,7 @@ def add_project():
 @student_bp.route('/portfolio/project/<int:project_id>', methods=['DELETE'])
 @role_required('student')
 def delete_project(project_id):
-    user_id = get_jwt_identity()
-    student = Student.query.filter_by(user_id=user_id).first()
+    student = current_student()
     if not student:
         return jsonify(msg="Student profile not found"), 404
 
@@ -160,8 +195,7 @@ def delete_project(project_id):
 @student_bp.route('/portfolio/skill', methods=['POST'])
 @role_required('student')
 def add_skill():
-    user_id = get_jwt_identity()
-    student = Student.query.filter_by(user_id=user_id).first()
+    student = current_student()
     if not student:
         return jsonify(msg="Student not found"), 404
         
@@ -177,17 +211,12 @@ def add_skill():
     db.session.add(new_skill)
     db.session.commit()
     
-    return jsonify({
-        "id": new_skill.id,
-        "skill_name": new_skill.skill_name,
-        "category": new_skill.category
-    }), 201
+    return jsonify(SKILL.one(new_skill)), 201
 
 @student_bp.route('/portfolio/skill/<int:skill_id>', methods=['DELETE'])
 @role_required('student')
 def delete_skill(skill_id):
-    user_id = get_jwt_identity()
-    student = Student.query.filter_by(user_id=user_id).first()
+    student = current_student()
     if not student:
         return jsonify(msg="Student not found"), 404
 
@@ -207,8 +236,7 @@ def delete_skill(skill_id):
 @student_bp.route('/portfolio/link', methods=['POST'])
 @role_required('student')
 def add_link():
-    user_id = get_jwt_identity()
-    student = Student.query.filter_by(user_id=user_id).first()
+    student = current_student()
     if not student:
         return jsonify(msg="Student not found"), 404
         
@@ -224,17 +252,12 @@ def add_link():
     db.session.add(new_link)
     db.session.commit()
     
-    return jsonify({
-        "id": new_link.id,
-        "title": new_link.title,
-        "url": new_link.url
-    }), 201
+    return jsonify(LINK.one(new_link)), 201
 
 @student_bp.route('/portfolio/link/<int:link_id>', methods=['DELETE'])
 @role_required('student')
 def delete_link(link_id):
-    user_id = get_jwt_identity()
-    student = Student.query.filter_by(user_id=user_id).first()
+    student = current_student()
     if not student:
         return jsonify(msg="Student not found"), 404
 
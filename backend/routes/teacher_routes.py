@@ -1,19 +1,36 @@
-from flask import Blueprint, jsonify
-from flask_jwt_extended import get_jwt_identity
+from flask import Blueprint, jsonify, request
 from utils.jwt_helper import role_required
+from utils.identity import current_teacher
 # --- THIS LINE IS THE FIX ---
 from models import db, User, Teacher, Student, TeacherQualification, Timetable
 # --- END OF FIX ---
-from utils.ai_model import predict_teacher_performance
+from utils.insights import teacher_insight
+from utils.query_budget import query_budget
+from utils.pagination import parse_page_args, parse_fields, parse_sort_args, sorted_keyset_page
+from utils.serializers import QUALIFICATION, TIMETABLE_ENTRY, row_serializer
+from utils.conditional import conditional
+from utils.rosters import STUDENT_FIELDS, STUDENT_SORTS, class_filter, class_student_query, unmatched_class_names
 from sqlalchemy.sql import func
 
 teacher_bp = Blueprint('teacher_bp', __name__)
 
+DASHBOARD_STUDENTS = 10
+CLASS_LIST_FIELDS = ['id', 'name', 'course', 'gpa', 'attendance']
+
+
+def _class_students_page(inst_id, class_names, fields, sort, descending, cursor, limit):
+    sort_expr = STUDENT_SORTS[sort]
+    query = class_student_query(inst_id, class_names, fields, sort_expr)
+    rows, next_cursor = sorted_keyset_page(query, sort_expr, Student.id, cursor, limit, descending)
+    return row_serializer(fields).many(rows), next_cursor
+
+
 @teacher_bp.route('/dashboard', methods=['GET'])
+@query_budget(6)
 @role_required('teacher')
+@conditional(lambda user: [('user', user.id), ('institution', user.institution_id)])
 def get_teacher_dashboard():
-    user_id = get_jwt_identity()
-    teacher = Teacher.query.filter_by(user_id=user_id).first()
+    teacher = current_teacher()
 
     if not teacher:
         return jsonify(msg="Teacher profile not found"), 404
@@ -21,41 +38,27 @@ def get_teacher_dashboard():
     # Get institution ID from the teacher's user record
     inst_id = teacher.user.institution_id
     
-    # KPIs (Mocked for students in the same institution)
-    # These queries require 'User' to be imported
-    students_in_inst = Student.query.join(User).filter(User.institution_id == inst_id).all()
-    total_students = len(students_in_inst)
-    avg_gpa = db.session.query(func.avg(Student.overall_gpa)).filter(User.institution_id == inst_id).join(User).scalar()
-    avg_attendance = db.session.query(func.avg(Student.attendance_percentage)).filter(User.institution_id == inst_id).join(User).scalar()
-    
-    # Student List (Mocked: all students in institution)
-    student_list = [{
-        "id": s.id,
-        "name": s.full_name,
-        "course": s.course,
-        "gpa": float(s.overall_gpa),
-        "attendance": float(s.attendance_percentage)
-    } for s in students_in_inst]
-    
-    # Qualifications
-    qualifications = TeacherQualification.query.filter_by(teacher_id=teacher.id).all()
-    qualification_list = [{
-        "degree": q.degree,
-        "university": q.university,
-        "year": q.year_completed
-    } for q in qualifications]
-    
     # Timetable
     timetable_entries = Timetable.query.filter_by(teacher_id=teacher.id).all()
-    timetable_list = [{
-        "class": t.class_name,
-        "subject": t.subject,
-        "day": t.day_of_week,
-        "time": f"{t.start_time.strftime('%H:%M')} - {t.end_time.strftime('%H:%M')}"
-    } for t in timetable_entries]
+    timetable_list = TIMETABLE_ENTRY.many(timetable_entries)
+    class_names = {t.class_name for t in timetable_entries}
+
+    # KPIs: one aggregate over the students of the teacher's classes (the same set as the list)
+    total_students, avg_gpa, avg_attendance = db.session.query(
+        func.count(Student.id), func.avg(Student.overall_gpa), func.avg(Student.attendance_percentage)
+    ).join(User).filter(User.institution_id == inst_id, class_filter(class_names)).one()
+
+    # Qualifications
+    qualifications = TeacherQualification.query.filter_by(teacher_id=teacher.id).all()
+    qualification_list = QUALIFICATION.many(qualifications)
+
+    # Student List: first page of the teacher's own classes (more via /students)
+    student_list, students_next = _class_students_page(
+        inst_id, class_names, CLASS_LIST_FIELDS, 'name', False, None, DASHBOARD_STUDENTS
+    )
 
     # AI Insight
-    ai_insight = predict_teacher_performance(float(avg_gpa or 0), float(teacher.avg_feedback))
+    ai_insight = teacher_insight(teacher.user_id, avg_gpa, teacher.avg_feedback)
     
     dashboard_data = {
         "profile": {
@@ -68,9 +71,53 @@ def get_teacher_dashboard():
             "avg_attendance": round(float(avg_attendance or 0), 2)
         },
         "students": student_list,
+        "students_next_cursor": students_next,
+        # Timetable classes not named "<course> - Sem <n>": their students cannot be listed
+        "unmatched_classes": unmatched_class_names(class_names),
         "qualifications": qualification_list,
         "timetable": timetable_list,
         "ai_insight": ai_insight
     }
     
-    return jsonify(dashboard_data), 200
\ No newline at end of file
+    return jsonify(dashboard_data), 200
+
+
+@teacher_bp.route('/students', methods=['GET'])
+@query_budget(3)
+@role_required('teacher')
+def get_class_students():
+    """
+    Students in the teacher's timetabled classes, keyset-paginated:
+    ?class=&sort=name|gpa|attendance|id&order=asc|desc&limit=&cursor=&fields=
+    """
+    teacher = current_teacher()
+    if not teacher:
+        return jsonify(msg="Teacher profile not found"), 404
+
+    try:
+        _, limit = parse_page_args(default_limit=50, max_limit=200)
+        sort, descending = parse_sort_args(STUDENT_SORTS, default='name')
+        fields = parse_fields(STUDENT_FIELDS, default=CLASS_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+
+    classes = sorted(name for (name,) in db.session.query(Timetable.class_name)
+                     .filter_by(teacher_id=teacher.id).distinct())
+    selected = request.args.get('class')
+    if selected and selected not in classes:
+        return jsonify(msg="You do not teach this class"), 404
+
+    try:
+        student_list, next_cursor = _class_students_page(
+            teacher.user.institution_id, [selected] if selected else classes, fields,
+            sort, descending, request.args.get('cursor'), limit
+        )
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+
+    return jsonify({
+        "classes": classes,
+        "unmatched_classes": unmatched_class_names(classes),
+        "students": student_list,
+        "next_cursor": next_cursor
+    }), 200
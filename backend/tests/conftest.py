@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from common import make_app, seed_institution  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    """
+    The app on a throwaway SQLite database with one seeded institution
+    (benchmarks/common.py logins), query budgets enforced.
+    """
+    app = make_app(QUERY_BUDGET_MODE='raise')
+    # Let QueryBudgetExceeded reach the test instead of becoming a 500
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    import migrations
+    from database import db
+
+    with app.app_context():
+        seed_institution(n_students=20, n_teachers=3)
+        migrations.upgrade(db.engine, log=lambda msg: None)  # search indexes
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import text
+
+from common import login
+from database import db
+from utils.query_budget import QueryBudgetExceeded, query_budget
+
+# Every @query_budget route; the app fixture runs with QUERY_BUDGET_MODE='raise'
+BUDGETED_ROUTES = [
+    ('student', '/api/student/dashboard'),
+    ('student', '/api/student/portfolio'),
+    ('teacher', '/api/teacher/dashboard'),
+    ('teacher', '/api/teacher/students?sort=gpa&order=desc'),
+    ('institution', '/api/institution/overview'),
+    ('institution', '/api/institution/students/search?skills=python'),
+    ('institution', '/api/institution/search?q=stu&type=students'),
+    ('admin', '/api/admin/overview'),
+    ('admin', '/api/admin/students/search?tags=iot&match=any'),
+    ('admin', '/api/admin/search?q=ben&type=institutions'),
+]
+
+
+@pytest.mark.parametrize('role, url', BUDGETED_ROUTES)
+def test_route_stays_within_its_query_budget(client, role, url):
+    response = client.get(url, headers=login(client, f"{role}@bench.in"))
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def test_budget_overrun_raises(app):
+    @query_budget(1)
+    def two_queries():
+        db.session.execute(text("SELECT 1"))
+        db.session.execute(text("SELECT 2"))
+
+    with app.test_request_context():
+        with pytest.raises(QueryBudgetExceeded):
+            two_queries()
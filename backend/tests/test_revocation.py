@@ -0,0 +1,32 @@
+import time
+
+from flask_jwt_extended import create_access_token
+
+from database import db
+from models import User
+from utils.revocation import MemoryRevocationBackend, RevocationList
+
+
+def test_revocation_is_kept_in_whole_seconds():
+    revocations = RevocationList(MemoryRevocationBackend(), sync_interval=0)
+    revocations.revoke_user_tokens(7, issued_before=1000.6)
+    assert revocations.is_revoked({'sub': '7', 'iat': 999})
+    assert not revocations.is_revoked({'sub': '7', 'iat': 1000})  # reissued later in the same second
+    assert not revocations.is_revoked({'sub': '8', 'iat': 999})
+
+
+def test_token_reissued_in_the_same_second_as_a_role_change_is_accepted(app, client):
+    app.config['AUTH_MODE'] = 'claims'
+    try:
+        with app.app_context():
+            user = User.query.filter_by(email='s1@synthetic.in').one()
+            time.sleep(1 - time.time() % 1)  # start of a second, so both steps land in it
+            user.role = 'teacher'
+            db.session.commit()  # revokes every token issued before now
+            user.role = 'student'
+            db.session.commit()
+            token = create_access_token(identity=str(user.id))
+        response = client.get('/api/student/dashboard', headers={'Authorization': f"Bearer {token}"})
+        assert response.status_code == 200, response.get_data(as_text=True)
+    finally:
+        app.config['AUTH_MODE'] = 'database'
@@ -1,10 +1,78 @@
 # Mock AI model logic placeholder
 import random
 
-def predict_student_risk(attendance, gpa):
+import numpy as np
+
+# Risk bands shared by the scalar and batch scorers: (level, message, confidence range)
+RISK_LEVELS = ["high", "medium", "low"]
+RISK_MESSAGES = [
+    "High risk of failing. Attendance or GPA is critically low.",
+    "Medium risk. Performance is average. Improvement recommended.",
+    "Low risk. Student is performing well.",
+]
+CONFIDENCE_LOW = np.array([0.8, 0.6, 0.85])
+CONFIDENCE_HIGH = np.array([0.95, 0.79, 0.98])
+
+def _unit_interval(keys, seed):
+    """
+    Deterministic uniform [0, 1) values per key (splitmix64 of seed and key), so a
+    student's confidence is reproducible and identical in scalar and batch scoring.
+    """
+    with np.errstate(over='ignore'):
+        z = np.asarray(keys, dtype=np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+def predict_student_risk_batch(attendance, gpa, seed=None, keys=None):
+    """
+    Vectorized predict_student_risk over arrays of attendance and GPA.
+
+    With a seed, confidence is derived from (seed, key) -- keys default to the row
+    index -- and equals predict_student_risk(..., seed=seed, key=key) exactly.
+    Returns a dict of arrays: risk_level, message, confidence.
+    """
+    attendance = np.asarray(attendance, dtype=np.float64)
+    gpa = np.asarray(gpa, dtype=np.float64)
+
+    high = (attendance < 70) | (gpa < 5.0)
+    medium = ((attendance >= 70) & (attendance < 80)) | ((gpa >= 5.0) & (gpa < 6.5))
+    codes = np.where(high, 0, np.where(medium, 1, 2))
+
+    if seed is None:
+        u = np.random.default_rng().random(codes.shape)
+    else:
+        u = _unit_interval(np.arange(codes.size) if keys is None else keys, seed)
+    confidence = np.round(CONFIDENCE_LOW[codes] + (CONFIDENCE_HIGH[codes] - CONFIDENCE_LOW[codes]) * u, 2)
+
+    return {
+        "risk_level": np.array(RISK_LEVELS, dtype=object)[codes],
+        "message": np.array(RISK_MESSAGES, dtype=object)[codes],
+        "confidence": confidence
+    }
+
+def score_dataframe(df, attendance_col='attendance', gpa_col='gpa', key_col=None, seed=None):
+    """
+    Batch-score a DataFrame; returns a copy with risk_level/message/confidence columns.
+    """
+    keys = df[key_col].to_numpy() if key_col else None
+    result = predict_student_risk_batch(df[attendance_col].to_numpy(), df[gpa_col].to_numpy(), seed=seed, keys=keys)
+    return df.assign(**result)
+
+def predict_student_risk(attendance, gpa, seed=None, key=0):
     """
     Mock AI model for student risk prediction based on simple rules.
+    Pass a seed (and a per-student key) for a deterministic confidence.
     """
+    if seed is not None:
+        result = predict_student_risk_batch([attendance], [gpa], seed=seed, keys=[key])
+        return {
+            "risk_level": result["risk_level"][0],
+            "message": result["message"][0],
+            "confidence": float(result["confidence"][0])
+        }
+
     if attendance < 70 or gpa < 5.0:
         risk = "high"
         message = "High risk of failing. Attendance or GPA is critically low."
@@ -0,0 +1,140 @@
+# Enrolment and department analytics: columnar passes over chunked DB snapshots
+import time
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+from flask import current_app, has_app_context
+from sqlalchemy import select, Float, type_coerce
+from sqlalchemy.sql import func
+
+from database import db
+from models import User, Student, Record
+from utils.query_budget import allow_extra_queries
+from utils.reference_data import reference_cache
+
+CHUNK_ROWS = 100_000
+CACHE_WINDOW = 3600
+# Trend bucket -> numpy datetime unit
+BUCKETS = {'year': 'datetime64[Y]', 'month': 'datetime64[M]'}
+
+
+def _setting(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+def _chunks(stmt, key_column, chunk_rows):
+    """
+    Run stmt (whose first column is key_column) in keyset batches of chunk_rows, so
+    memory stays bounded and no cursor is held open between batches.
+    """
+    # Core rows: no ORM result processing. Passing the statement lets a read replica serve it.
+    connection = db.session.connection(bind_arguments={'clause': stmt})
+    last = 0
+    while True:
+        allow_extra_queries(1)
+        rows = connection.execute(stmt.where(key_column > last).order_by(key_column).limit(chunk_rows)).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+# --- Aggregation passes ---
+
+def enrolment_trend(institution_id=None, bucket='year', chunk_rows=None):
+    """
+    Students enrolled per period (from users.created_at), with the running total.
+    Periods without enrolments in between are included with 0 new students.
+    """
+    unit = BUCKETS[bucket]
+    stmt = select(User.id, User.created_at).where(User.role == 'student', User.created_at.isnot(None))
+    if institution_id is not None:
+        stmt = stmt.where(User.institution_id == institution_id)
+
+    counts = {}
+    for rows in _chunks(stmt, User.id, chunk_rows or _setting('ANALYTICS_CHUNK_ROWS', CHUNK_ROWS)):
+        periods, n = np.unique(np.array([r[1] for r in rows], dtype=unit), return_counts=True)
+        for period, count in zip(periods, n):
+            counts[period] = counts.get(period, 0) + int(count)
+    if not counts:
+        return []
+
+    periods = np.arange(min(counts), max(counts) + 1)
+    new = np.array([counts.get(p, 0) for p in periods])
+    return [{"period": str(p), "new_students": int(n), "students": int(total)}
+            for p, n, total in zip(periods, new, np.cumsum(new))]
+
+
+def department_performance(institution_id, chunk_rows=None):
+    """
+    Average GPA and attendance per course over every semester record of the
+    institution's students. Records are read without a join and summed per course
+    with np.bincount through a student -> course lookup array, so memory scales
+    with students and the chunk size, not with the number of records.
+    """
+    allow_extra_queries(1)
+    students = db.session.query(Student.id, func.coalesce(Student.course, 'Unassigned')) \
+        .join(User, User.id == Student.user_id).filter(User.institution_id == institution_id).all()
+    if not students:
+        return []
+    student_ids = np.array([sid for sid, _ in students], dtype=np.int64)
+    codes, courses = pd.factorize(np.array([course for _, course in students], dtype=object))
+    lookup = np.full(student_ids.max() + 1, -1, dtype=np.int64)
+    lookup[student_ids] = codes
+
+    stmt = select(
+        Record.id, Record.student_id,
+        type_coerce(Record.gpa, Float), type_coerce(Record.attendance, Float)  # skip Decimal conversion
+    ).where(Record.student_id.in_(select(Student.id).join(User, User.id == Student.user_id)
+                                  .where(User.institution_id == institution_id)))
+
+    n = len(courses)
+    gpa_sum, attendance_sum, records = np.zeros(n), np.zeros(n), np.zeros(n, dtype=np.int64)
+    for rows in _chunks(stmt, Record.id, chunk_rows or _setting('ANALYTICS_CHUNK_ROWS', CHUNK_ROWS)):
+        chunk = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * 4).reshape(-1, 4)
+        ids = chunk[:, 1].astype(np.int64)
+        # A student who joined after the student query is not in the lookup: skip their records
+        course = np.full(len(ids), -1, dtype=np.int64)
+        known = ids < len(lookup)
+        course[known] = lookup[ids[known]]
+        valid = course >= 0
+        course = course[valid]
+        gpa_sum += np.bincount(course, weights=chunk[valid, 2], minlength=n)
+        attendance_sum += np.bincount(course, weights=chunk[valid, 3], minlength=n)
+        records += np.bincount(course, minlength=n)
+
+    per_course = np.bincount(codes, minlength=n)
+    return [{
+        "name": courses[i],
+        "avg_gpa": round(float(gpa_sum[i] / records[i]), 2),
+        "avg_attendance": round(float(attendance_sum[i] / records[i]), 2),
+        "students": int(per_course[i]),
+        "records": int(records[i])
+    } for i in sorted(range(n), key=lambda i: courses[i]) if records[i]]
+
+
+# --- Cached accessors (keyed by scope and time window) ---
+
+def _window():
+    window = float(_setting('ANALYTICS_CACHE_WINDOW', CACHE_WINDOW))
+    return int(time.time() // window), window
+
+
+def cache_window():
+    """
+    Index of the current cache window; cached results can change when it rolls over.
+    """
+    return _window()[0]
+
+
+def cached_enrolment_trend(institution_id=None, bucket='year'):
+    window, ttl = _window()
+    key = f"analytics:enrolment:{institution_id or 'all'}:{bucket}:{window}"
+    return reference_cache.get_or_load(key, lambda: enrolment_trend(institution_id, bucket), ttl=ttl)
+
+
+def cached_department_performance(institution_id):
+    window, ttl = _window()
+    key = f"analytics:departments:{institution_id}:{window}"
+    return reference_cache.get_or_load(key, lambda: department_performance(institution_id), ttl=ttl)
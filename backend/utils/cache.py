@@ -0,0 +1,160 @@
+# Read-through cache with TTL + LRU eviction and pluggable backends
+import json
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class MemoryCacheBackend:
+    """
+    In-process dict backend. Entries expire after their TTL and the least recently
+    used entry is evicted once `max_entries` is reached.
+    """
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def size(self):
+        return len(self._data)
+
+
+class RedisCacheBackend:
+    """
+    Shared backend for several workers. Values are stored as JSON; eviction is left
+    to the server's maxmemory policy (configure allkeys-lru).
+    """
+    def __init__(self, client, prefix='edusamagra:'):
+        self.client = client
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return _MISSING if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, max(1, int(ttl)), json.dumps(value))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*'))
+
+
+class ReadThroughCache:
+    """
+    get_or_load() returns the cached value for a key or calls the loader and stores
+    its (JSON-serialisable) result. Hit/miss counters are kept per process.
+    """
+    def __init__(self, backend=None, default_ttl=300):
+        self.backend = backend or MemoryCacheBackend()
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def configure(self, backend, default_ttl=None):
+        self.backend = backend
+        if default_ttl is not None:
+            self.default_ttl = default_ttl
+        self.reset_stats()
+
+    def get_or_load(self, key, loader, ttl=None):
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        self.backend.set(key, value, ttl or self.default_ttl)
+        return value
+
+    def peek(self, key, default=None):
+        """
+        Cached value without loading on a miss (still counted).
+        """
+        value = self.backend.get(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl or self.default_ttl)
+
+    def invalidate(self, *keys):
+        self.invalidations += len(keys)
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.invalidations = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "evictions": self.backend.evictions
+        }
+
+
+def create_backend(config):
+    """
+    Build the backend named by CACHE_BACKEND: 'memory' (default), 'redis' or 'fakeredis'.
+    """
+    name = config.get('CACHE_BACKEND', 'memory')
+    if name == 'redis':
+        import redis
+        return RedisCacheBackend(redis.Redis.from_url(config['CACHE_REDIS_URL']))
+    if name == 'fakeredis':
+        import fakeredis
+        return RedisCacheBackend(fakeredis.FakeRedis())
+    return MemoryCacheBackend(max_entries=int(config.get('CACHE_MAX_ENTRIES', 1024)))
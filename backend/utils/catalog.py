@@ -0,0 +1,250 @@
+# Normalized tag and skill catalog kept in sync with the free-text portfolio fields,
+# and student search by skills / tags / institution / state with facet counts
+import re
+
+from flask import request
+from sqlalchemy import event, select, delete, insert, func, distinct
+from sqlalchemy.orm import Session, attributes
+
+from database import db
+from models import User, Student, Institution, PortfolioProject, StudentSkill, Tag, ProjectTag, Skill
+from utils.pagination import keyset_page
+from utils.rosters import STUDENT_FIELDS
+from utils.serializers import row_serializer
+
+MAX_TERMS = 10
+FACET_LIMIT = 20
+MATCHES = ('all', 'any')
+
+# Search result fields: the roster fields plus the institution (for admins searching everywhere)
+SEARCH_FIELDS = {**STUDENT_FIELDS, 'institution_id': User.institution_id}
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(name):
+    """
+    Catalog form of a tag or skill: trimmed, inner whitespace collapsed, lower-case.
+    """
+    return _SPACES.sub(' ', name or '').strip().lower()[:100]
+
+
+def tag_names(value):
+    """
+    Distinct normalized tags of a PortfolioProject.tags string, in order.
+    """
+    return list(dict.fromkeys(n for n in map(normalize, (value or '').split(',')) if n))
+
+
+def _insert_ignore(model):
+    return insert(model.__table__).prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite')
+
+
+def ensure_names(conn, model, names):
+    """
+    {name: id} for normalized Tag or Skill names, inserting the missing ones.
+    INSERT IGNORE, so two writers adding the same new name never collide.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    found = dict(conn.execute(select(model.name, model.id).where(model.name.in_(names))).all())
+    missing = names - found.keys()
+    if missing:
+        conn.execute(_insert_ignore(model), [{"name": n} for n in missing])
+        # A locking read sees rows another transaction committed after our snapshot (InnoDB)
+        found.update(conn.execute(select(model.name, model.id).where(model.name.in_(missing))
+                                  .with_for_update(read=True)).all())
+    return found
+
+
+def sync_project_tags(conn, projects, new=False):
+    """
+    Replace the tag links of {project_id: tags string}; new=True skips the DELETE.
+    """
+    if not projects:
+        return
+    if not new:
+        conn.execute(delete(ProjectTag.__table__).where(ProjectTag.project_id.in_(list(projects))))
+    names = {project_id: tag_names(tags) for project_id, tags in projects.items()}
+    ids = ensure_names(conn, Tag, {n for project_names in names.values() for n in project_names})
+    rows = [{"project_id": project_id, "tag_id": ids[n]} for project_id, project_names in names.items()
+            for n in project_names]
+    if rows:
+        conn.execute(insert(ProjectTag.__table__), rows)
+
+
+def drop_project_tags(conn, project_ids):
+    # ON DELETE CASCADE does this on MySQL; SQLite does not enforce foreign keys
+    if project_ids:
+        conn.execute(delete(ProjectTag.__table__).where(ProjectTag.project_id.in_(list(project_ids))))
+
+
+def link_skills(conn, rows):
+    """
+    Set 'skill_id' on StudentSkill column dicts that carry a 'skill_name'.
+    """
+    rows = [r for r in rows if 'skill_name' in r]
+    ids = ensure_names(conn, Skill, {normalize(r['skill_name']) for r in rows} - {''})
+    for r in rows:
+        r['skill_id'] = ids.get(normalize(r['skill_name']))
+
+
+# --- Keeping the links in sync with ORM writes (bulk statements call the helpers above) ---
+
+def _changed(session, model, field):
+    changed = [o for o in session.new if isinstance(o, model)]
+    changed += [o for o in session.dirty if isinstance(o, model) and attributes.get_history(o, field).has_changes()]
+    return changed
+
+
+@event.listens_for(Session, 'before_flush')
+def _link_skills(session, flush_context, instances):
+    skills = _changed(session, StudentSkill, 'skill_name')
+    if skills:
+        ids = ensure_names(session.connection(), Skill, {normalize(s.skill_name) for s in skills} - {''})
+        for skill in skills:
+            skill.skill_id = ids.get(normalize(skill.skill_name))
+
+
+@event.listens_for(Session, 'after_flush')
+def _link_tags(session, flush_context):
+    # Project ids exist only after the INSERT, so tags are linked after the flush
+    projects = _changed(session, PortfolioProject, 'tags')
+    deleted = [o.id for o in session.deleted if isinstance(o, PortfolioProject)]
+    if not projects and not deleted:
+        return
+    conn = session.connection()
+    drop_project_tags(conn, deleted)
+    sync_project_tags(conn, {p.id: p.tags for p in projects if p in session.new and p.tags}, new=True)
+    sync_project_tags(conn, {p.id: p.tags for p in projects if p not in session.new})
+
+
+# --- Student search ---
+
+def _terms(name):
+    raw = request.args.get(name, '')
+    terms = list(dict.fromkeys(n for n in map(normalize, raw.split(',')) if n))
+    if len(terms) > MAX_TERMS:
+        raise ValueError(f"At most {MAX_TERMS} {name}")
+    return terms
+
+
+def parse_search_args(admin=False):
+    """
+    Read ?skills=a,b&tags=x,y&match=all|any (admins also &institution_id=&state=).
+    Raises ValueError on bad input.
+    """
+    filters = {"skills": _terms('skills'), "tags": _terms('tags'), "match": request.args.get('match', 'all')}
+    if filters['match'] not in MATCHES:
+        raise ValueError(f"match must be one of: {', '.join(MATCHES)}")
+    if admin:
+        try:
+            institution_id = request.args.get('institution_id')
+            filters['institution_id'] = int(institution_id) if institution_id else None
+        except ValueError:
+            raise ValueError("institution_id must be an integer")
+        filters['state'] = (request.args.get('state') or '').strip() or None
+    return filters
+
+
+def _students_with(column, term_id, names, match):
+    """
+    Subquery of student ids having all (or any) of the names; column/term_id come
+    from a query whose terms are already restricted to `names`.
+    """
+    query = select(column)
+    if match == 'all' and len(names) > 1:
+        query = query.group_by(column).having(func.count(distinct(term_id)) == len(names))
+    return query
+
+
+def _conditions(filters):
+    """
+    WHERE clauses over Student joined to User; empty when nothing narrows the search.
+    """
+    conditions = []
+    if filters.get('institution_id') is not None:
+        conditions.append(User.institution_id == filters['institution_id'])
+    if filters.get('state'):
+        conditions.append(User.institution_id.in_(select(Institution.id).where(Institution.state == filters['state'])))
+    if filters['skills']:
+        # skills by unique name, then ix_student_skills_skill_student
+        by_skill = _students_with(StudentSkill.student_id, StudentSkill.skill_id, filters['skills'], filters['match']) \
+            .join(Skill, Skill.id == StudentSkill.skill_id).where(Skill.name.in_(filters['skills']))
+        conditions.append(Student.id.in_(by_skill))
+    if filters['tags']:
+        # tags by unique name, then ix_project_tags_tag_project, then projects by primary key
+        by_tag = _students_with(PortfolioProject.student_id, ProjectTag.tag_id, filters['tags'], filters['match']) \
+            .select_from(Tag).join(ProjectTag, ProjectTag.tag_id == Tag.id) \
+            .join(PortfolioProject, PortfolioProject.id == ProjectTag.project_id).where(Tag.name.in_(filters['tags']))
+        conditions.append(Student.id.in_(by_tag))
+    return conditions
+
+
+def search_students(filters, fields, after_id, limit):
+    """
+    One keyset page (by student id) of students matching the filters, projected to fields.
+    """
+    names = fields if 'id' in fields else ['id'] + list(fields)
+    query = db.session.query(*(SEARCH_FIELDS[name].label(name) for name in names)) \
+        .select_from(Student).join(User, Student.user_id == User.id) \
+        .filter(User.role == 'student', *_conditions(filters))
+    rows, next_after_id = keyset_page(query, Student.id, after_id, limit)
+    return row_serializer(fields).many(rows), next_after_id
+
+
+FACET_ROW = row_serializer(['name', 'count'])
+INSTITUTION_FACET_ROW = row_serializer(['id', 'name', 'count'])
+STATE_FACET_ROW = row_serializer(['state', 'count'])
+
+
+def search_facets(filters, kinds):
+    """
+    Counts of matching students per skill, tag, institution and/or state (top
+    FACET_LIMIT each), one GROUP BY query per kind.
+    """
+    conditions = _conditions(filters)
+    students = select(Student.id).join(User, Student.user_id == User.id).where(User.role == 'student', *conditions)
+    facets = {}
+    if 'skills' in kinds:
+        count = func.count(distinct(StudentSkill.student_id))
+        query = select(Skill.name.label('name'), count.label('count')).select_from(StudentSkill) \
+            .join(Skill, Skill.id == StudentSkill.skill_id)
+        if conditions:
+            query = query.where(StudentSkill.student_id.in_(students))
+        facets['skills'] = FACET_ROW.many(db.session.execute(
+            query.group_by(Skill.id, Skill.name).order_by(count.desc(), Skill.name).limit(FACET_LIMIT)))
+    if 'tags' in kinds:
+        count = func.count(distinct(PortfolioProject.student_id))
+        query = select(Tag.name.label('name'), count.label('count')).select_from(ProjectTag) \
+            .join(Tag, Tag.id == ProjectTag.tag_id).join(PortfolioProject, PortfolioProject.id == ProjectTag.project_id)
+        if conditions:
+            query = query.where(PortfolioProject.student_id.in_(students))
+        facets['tags'] = FACET_ROW.many(db.session.execute(
+            query.group_by(Tag.id, Tag.name).order_by(count.desc(), Tag.name).limit(FACET_LIMIT)))
+    matching = select(Student.id).select_from(Student).join(User, Student.user_id == User.id) \
+        .join(Institution, Institution.id == User.institution_id).where(User.role == 'student', *conditions)
+    if 'institutions' in kinds:
+        count = func.count(Student.id)
+        query = matching.with_only_columns(Institution.id.label('id'), Institution.name.label('name'), count.label('count'))
+        facets['institutions'] = INSTITUTION_FACET_ROW.many(db.session.execute(
+            query.group_by(Institution.id, Institution.name).order_by(count.desc(), Institution.id).limit(FACET_LIMIT)))
+    if 'states' in kinds:
+        count = func.count(Student.id)
+        query = matching.with_only_columns(Institution.state.label('state'), count.label('count'))
+        facets['states'] = STATE_FACET_ROW.many(db.session.execute(
+            query.group_by(Institution.state).order_by(count.desc(), Institution.state).limit(FACET_LIMIT)))
+    return facets
+
+
+def search_response(filters, fields, after_id, limit, facet_kinds):
+    """
+    {"items", "next_after_id"} plus "facets" on the first page (?facets=0 skips them;
+    they do not change from page to page).
+    """
+    items, next_after_id = search_students(filters, fields, after_id, limit)
+    body = {"items": items, "next_after_id": next_after_id}
+    if after_id == 0 and request.args.get('facets', '1') != '0':
+        body['facets'] = search_facets(filters, facet_kinds)
+    return body
@@ -0,0 +1,230 @@
+# Conditional GET: weak ETags built from per-entity version tokens, 304 before the view runs
+import hashlib
+import secrets
+import time
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from database import db
+from models import (User, Student, Teacher, Record, Institution, Event, Scheme, AIInsight, InstitutionRollup,
+                    StateRollup, TeacherQualification, Timetable, PortfolioProject, StudentSkill, StudentLink)
+from utils.cache import MemoryCacheBackend, ReadThroughCache, create_backend
+from utils.db_routing import read_router
+from utils.identity import current_user
+from utils.log import logger
+
+# Scopes: ('user', id), ('institution', id), ('schemes', 0), ('nationwide', 0) and
+# ('all', 0), which every tag includes and bulk jobs bump when they touch everything.
+ALL = ('all', 0)
+NATIONWIDE = ('nationwide', 0)
+SCHEMES = ('schemes', 0)
+
+
+class VersionStore:
+    """
+    Version token per scope in the cache backend. A bump writes a fresh random token
+    rather than incrementing, so it needs no atomic increment in a shared store, and
+    an evicted or expired entry can never bring an old ETag back to life.
+    """
+    def __init__(self):
+        self.cache = ReadThroughCache()
+        self.ttl = 86400
+        self.enabled = False  # ETAG_ENABLED: when off, writes skip collecting and bumping versions
+        self.not_modified = 0
+        self.full = 0
+        self.untagged = 0
+
+    def configure(self, backend, ttl):
+        self.cache.configure(backend, ttl)
+        self.ttl = ttl
+        self.not_modified = self.full = self.untagged = 0
+
+    @staticmethod
+    def _key(scope):
+        return f"version:{scope[0]}:{scope[1]}"
+
+    def get(self, scope):
+        """
+        [token, bumped_at]; a scope seen for the first time gets a token that counts as old.
+        """
+        return self.cache.get_or_load(self._key(scope), lambda: [secrets.token_hex(6), 0], ttl=self.ttl)
+
+    def bump(self, *scopes):
+        now = time.time()
+        for scope in set(scopes):
+            self.cache.set(self._key(scope), [secrets.token_hex(6), now], ttl=self.ttl)
+
+    def stats(self):
+        return {
+            "backend": type(self.cache.backend).__name__,
+            "not_modified": self.not_modified,
+            "full": self.full,
+            "untagged": self.untagged,
+            "lookups": self.cache.stats()
+        }
+
+
+versions = VersionStore()
+
+
+def _etag(user, scopes, extra):
+    parts = [request.endpoint or '', request.full_path, str(user.id if user is not None else '')]
+    newest = 0.0
+    for scope in [ALL, *scopes]:
+        token, bumped_at = versions.get(scope)
+        parts.append(token)
+        newest = max(newest, bumped_at)
+    parts.extend(str(e) for e in extra)
+    return hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=12).hexdigest(), newest
+
+
+def conditional(scopes, cache_control='private, no-cache', extra=None):
+    """
+    Give a GET view a weak ETag and answer If-None-Match with 304 before it runs.
+    scopes(user) -> the version scopes the response is built from; extra() -> any
+    other values it depends on (e.g. the analytics cache window). Goes below
+    @role_required so the user is already resolved.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not current_app.config.get('ETAG_ENABLED', False):
+                return fn(*args, **kwargs)
+            user = current_user()
+            if user is None:
+                return fn(*args, **kwargs)
+            # Versions are read before the view's queries, so the tag is never newer than the body
+            tag, newest = _etag(user, scopes(user), extra() if extra else ())
+            if read_router.replica_for_request() is not None and time.time() - newest < read_router.sticky_seconds:
+                # The replica may not have the latest write yet: do not pin a possibly stale body to this tag
+                versions.untagged += 1
+                return fn(*args, **kwargs)
+
+            if request.if_none_match.contains_weak(tag):
+                versions.not_modified += 1
+                response = current_app.response_class(status=304)
+            else:
+                versions.full += 1
+                response = current_app.make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(tag, weak=True)
+            response.headers['Cache-Control'] = cache_control
+            response.vary.add('Authorization')
+            return response
+        return wrapper
+    return decorator
+
+
+# --- Bumping on writes (after COMMIT) ---
+
+def _direct(obj):
+    """
+    Scopes of one changed row; ('student'|'teacher', id) and ('member', user_id)
+    are resolved to users / institutions in _resolve.
+    """
+    if isinstance(obj, User):
+        return [('user', obj.id), ('institution', obj.institution_id)]
+    if isinstance(obj, (Student, Teacher)):
+        return [('user', obj.user_id), ('member', obj.user_id)]
+    if isinstance(obj, Record):
+        return [('student', obj.student_id), ('student_member', obj.student_id)]
+    if isinstance(obj, (PortfolioProject, StudentSkill, StudentLink)):
+        return [('student', obj.student_id)]
+    if isinstance(obj, (TeacherQualification, Timetable)):
+        return [('teacher', obj.teacher_id)]
+    if isinstance(obj, Event):
+        return [('institution', obj.institution_id)]
+    if isinstance(obj, Institution):
+        return [('institution', obj.id)]
+    if isinstance(obj, InstitutionRollup):
+        return [('institution', obj.institution_id)]
+    if isinstance(obj, StateRollup):
+        return [NATIONWIDE]
+    if isinstance(obj, Scheme):
+        return [SCHEMES]
+    if isinstance(obj, AIInsight):
+        return [('user', obj.user_id) if obj.user_id else ('institution', obj.institution_id)]
+    return []
+
+
+def _resolve(session, refs):
+    """
+    Turn profile ids into user and institution scopes with at most three queries.
+    """
+    scopes = {r for r in refs if r[0] in ('user', 'institution', 'schemes', 'nationwide', 'all')}
+    by_kind = {}
+    for kind, value in refs:
+        by_kind.setdefault(kind, set()).add(value)
+    conn = session.connection()
+    for kind, model in (('student', Student), ('teacher', Teacher)):
+        ids = by_kind.get(kind, set()) | by_kind.get(f"{kind}_member", set())
+        if ids:
+            rows = conn.execute(select(model.id, model.user_id, User.institution_id)
+                                .join(User, model.user_id == User.id).where(model.id.in_(ids)))
+            for profile_id, user_id, institution_id in rows:
+                if profile_id in by_kind.get(kind, ()):
+                    scopes.add(('user', user_id))
+                if profile_id in by_kind.get(f"{kind}_member", ()):
+                    scopes.add(('institution', institution_id))
+    if by_kind.get('member'):
+        rows = conn.execute(select(User.institution_id).where(User.id.in_(by_kind['member'])))
+        scopes.update(('institution', institution_id) for (institution_id,) in rows)
+    scopes = {s for s in scopes if s[1] is not None}
+    if any(s[0] == 'institution' for s in scopes):
+        scopes.add(NATIONWIDE)  # the admin overview aggregates every institution
+    return scopes
+
+
+def bump_versions(*scopes, session=None):
+    """
+    For writes that bypass ORM events (bulk mappings, Core inserts): bump these
+    scopes when the current transaction commits.
+    """
+    if not versions.enabled:
+        return
+    session = session or db.session()
+    pending = session.info.setdefault('version_scopes', set())
+    pending.update(s for s in scopes if s[1] is not None)
+    if any(s[0] == 'institution' for s in scopes):
+        pending.add(NATIONWIDE)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect(session, flush_context):
+    if not versions.enabled:
+        return
+    refs = []
+    for obj in list(session.new) + list(session.deleted) + [o for o in session.dirty if session.is_modified(o)]:
+        refs.extend(_direct(obj))
+    if refs:
+        session.info.setdefault('version_scopes', set()).update(_resolve(session, refs))
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump(session):
+    scopes = session.info.pop('version_scopes', None)
+    if scopes and versions.enabled:
+        versions.bump(*scopes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('version_scopes', None)
+
+
+def init_conditional(app):
+    backend = create_backend({**app.config, 'CACHE_MAX_ENTRIES': app.config.get('ETAG_VERSION_MAX_ENTRIES', 100000)})
+    ttl = float(app.config.get('ETAG_VERSION_TTL', 86400))
+    if isinstance(backend, MemoryCacheBackend):
+        # Tokens are per process: a write bumps them only in the worker that served it, and
+        # the others keep answering 304 for the old body until their own entry expires
+        ttl = min(ttl, float(app.config.get('CACHE_DEFAULT_TTL', 300)))
+        if app.config.get('ETAG_ENABLED'):
+            logger.warning("ETAG_ENABLED with CACHE_BACKEND=memory is only safe with a single worker; "
+                           "use CACHE_BACKEND=redis", extra={"etag_version_ttl": ttl})
+    versions.configure(backend, ttl)
+    versions.enabled = bool(app.config.get('ETAG_ENABLED'))
@@ -0,0 +1,226 @@
+# Connection pool configuration and pool/query metrics
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# Histogram bucket upper bounds (milliseconds); larger values land in '+Inf'
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SLOW_QUERY_CHARS = 500
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS_MS):
+        self.bounds = bounds
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count, self.sum, self.max = 0, 0.0, 0.0
+
+    def observe(self, ms):
+        i = next((i for i, bound in enumerate(self.bounds) if ms <= bound), len(self.bounds))
+        with self.lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += ms
+            self.max = max(self.max, ms)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "count": self.count,
+                "avg_ms": round(self.sum / self.count, 3) if self.count else None,
+                "max_ms": round(self.max, 3),
+                "buckets": [{"le_ms": bound, "count": n} for bound, n in zip(self.bounds + ('+Inf',), self.counts)]
+            }
+
+
+class PoolMetrics:
+    """
+    Counters for one engine, fed by its pool and cursor events.
+    """
+    def __init__(self, slow_query_ms=500, slow_query_log=50):
+        self.slow_query_ms = slow_query_ms
+        self.lock = threading.Lock()
+        self.checkout_wait = Histogram()
+        self.request_wait = Histogram()
+        self.query_time = Histogram()
+        self.slow_queries = deque(maxlen=slow_query_log)
+        self.connects = self.checkouts = self.checkins = self.invalidations = self.timeouts = 0
+        self.peak_checked_out = 0
+
+    def _add(self, name, n=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def record_wait(self, ms, timed_out=False):
+        self.checkout_wait.observe(ms)
+        if timed_out:
+            self._add('timeouts')
+        if has_request_context():
+            waits = g.setdefault('_db_wait_ms', {})
+            waits[self] = waits.get(self, 0.0) + ms
+
+    def record_query(self, statement, ms):
+        self.query_time.observe(ms)
+        if ms >= self.slow_query_ms:
+            self.slow_queries.append({
+                "duration_ms": round(ms, 3),
+                "statement": ' '.join(statement.split())[:SLOW_QUERY_CHARS],
+                "route": request.path if has_request_context() else None,
+                "at": datetime.now(timezone.utc).isoformat(timespec='seconds')
+            })
+
+    def stats(self, pool):
+        usage = {"class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            usage.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "timeout_sec": pool.timeout(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow()
+            })
+        usage.update({"recycle_sec": pool._recycle, "pre_ping": pool._pre_ping,
+                      "peak_checked_out": self.peak_checked_out})
+        return {
+            "pool": usage,
+            "events": {"connects": self.connects, "checkouts": self.checkouts, "checkins": self.checkins,
+                       "invalidations": self.invalidations, "checkout_timeouts": self.timeouts},
+            "checkout_wait": self.checkout_wait.snapshot(),
+            "request_wait": self.request_wait.snapshot(),
+            "query_time": self.query_time.snapshot(),
+            "slow_query_ms": self.slow_query_ms,
+            "slow_queries": list(reversed(self.slow_queries))
+        }
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that times every checkout. Pool events only fire once a connection
+    has been handed out, so the wait itself is measured around _do_get.
+    """
+    metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics:
+                self.metrics.record_wait((time.perf_counter() - start) * 1000, timed_out=True)
+            raise
+        if self.metrics:
+            self.metrics.record_wait((time.perf_counter() - start) * 1000)
+        return conn
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def engine_options(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings. In-memory SQLite keeps
+    Flask-SQLAlchemy's single shared connection.
+    """
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri:
+        return {}
+    options = {
+        "pool_pre_ping": bool(config.get('DB_POOL_PRE_PING', True)),
+        "pool_recycle": int(config.get('DB_POOL_RECYCLE', 1800))
+    }
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+    options.update({
+        "poolclass": TimedQueuePool,
+        "pool_size": int(config.get('DB_POOL_SIZE', 10)),
+        "max_overflow": int(config.get('DB_MAX_OVERFLOW', 20)),
+        "pool_timeout": float(config.get('DB_POOL_TIMEOUT', 30))
+    })
+    return options
+
+
+# --- Event wiring ---
+
+class DbPoolMonitor:
+    def __init__(self):
+        self.metrics = {}  # bind name -> PoolMetrics
+        self.engines = {}
+
+    def watch(self, name, engine, config):
+        metrics = PoolMetrics(float(config.get('DB_SLOW_QUERY_MS', 500)), int(config.get('DB_SLOW_QUERY_LOG', 50)))
+        self.metrics[name], self.engines[name] = metrics, engine
+        if isinstance(engine.pool, TimedQueuePool):
+            engine.pool.metrics = metrics
+        timeout_ms = int(config.get('DB_STATEMENT_TIMEOUT_MS', 0))
+
+        @event.listens_for(engine, 'connect')
+        def _connected(dbapi_conn, record):
+            metrics._add('connects')
+            # MySQL aborts read-only SELECTs running longer than this
+            if timeout_ms and engine.dialect.name == 'mysql':
+                cursor = dbapi_conn.cursor()
+                cursor.execute(f"SET SESSION max_execution_time = {timeout_ms}")
+                cursor.close()
+
+        @event.listens_for(engine, 'checkout')
+        def _checked_out(dbapi_conn, record, proxy):
+            metrics._add('checkouts')
+            checked_out = engine.pool.checkedout() if isinstance(engine.pool, QueuePool) else 1
+            if checked_out > metrics.peak_checked_out:
+                metrics.peak_checked_out = checked_out
+
+        @event.listens_for(engine, 'checkin')
+        def _checked_in(dbapi_conn, record):
+            metrics._add('checkins')
+
+        @event.listens_for(engine, 'invalidate')
+        def _invalidated(dbapi_conn, record, exception):
+            metrics._add('invalidations')
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _started(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context._query_started = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _finished(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, '_query_started', None)
+            if started is not None:
+                metrics.record_query(statement, (time.perf_counter() - started) * 1000)
+
+    def stats(self):
+        return {name: metrics.stats(self.engines[name].pool) for name, metrics in self.metrics.items()}
+
+
+db_pool_monitor = DbPoolMonitor()
+
+
+def init_db_pool(app):
+    """
+    Attach the metrics listeners to every engine (the default one and any binds)
+    and report each request's total checkout wait as a Server-Timing header.
+    """
+    from database import db
+
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            db_pool_monitor.watch(bind or 'default', engine, app.config)
+
+    @app.after_request
+    def _report_wait(response):
+        waits = g.pop('_db_wait_ms', None)
+        if waits:
+            for metrics, ms in waits.items():
+                metrics.request_wait.observe(ms)
+            response.headers.add('Server-Timing', f"db-wait;dur={sum(waits.values()):.2f}")
+        return response
@@ -0,0 +1,150 @@
+# Read-replica routing: SELECTs of read-only requests go to a replica bind, except
+# for users who wrote within the last few seconds (read-your-writes)
+import random
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def replica_binds(urls):
+    """
+    SQLALCHEMY_BINDS entries for the replica URLs: replica_0, replica_1, ...
+    """
+    return {f"replica_{i}": url for i, url in enumerate(urls)}
+
+
+def _names(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class ReadRouter:
+    def __init__(self):
+        self.replicas = []
+        self.replica_routes = set()
+        self.primary_routes = set()
+        self.sticky_seconds = 5.0
+        self.marks = None  # cache backend holding the recent-writer keys
+        self.routed = {'replica': 0, 'primary': 0}
+
+    def configure(self, app):
+        from utils.cache import create_backend
+
+        self.replicas = sorted(replica_binds(app.config.get('DB_REPLICA_URLS', [])))
+        self.replica_routes = _names(app.config.get('DB_REPLICA_ROUTES'))
+        self.primary_routes = _names(app.config.get('DB_PRIMARY_ROUTES'))
+        self.sticky_seconds = float(app.config.get('DB_REPLICA_STICKY_SECONDS', 5))
+        self.marks = create_backend(app.config)
+
+    # --- Per-request decision ---
+
+    def _route_declared(self):
+        """
+        'replica' or 'primary' for this endpoint: DB_PRIMARY_ROUTES / DB_REPLICA_ROUTES
+        entries by endpoint name first, then @read_from_* on the view, then by blueprint.
+        """
+        endpoint = request.endpoint or ''
+        if endpoint in self.primary_routes:
+            return 'primary'
+        if endpoint in self.replica_routes:
+            return 'replica'
+        declared = getattr(current_app.view_functions.get(endpoint), 'db_reads', None)
+        if declared:
+            return declared
+        if request.blueprint in self.primary_routes:
+            return 'primary'
+        return 'replica' if request.blueprint in self.replica_routes else 'primary'
+
+    def _writer_key(self):
+        """
+        The user, or for anonymous requests the client address (the real client's once
+        PROXY_FIX_X_FOR is set). Never both: behind a proxy one address is every user.
+        """
+        try:
+            identity = get_jwt_identity()
+        except RuntimeError:  # no token verified on this request
+            identity = None
+        return f"rw:user:{identity}" if identity is not None else f"rw:addr:{request.remote_addr}"
+
+    def replica_for_request(self):
+        """
+        The replica bind key this request reads from, or None for the primary.
+        Decided at the first SELECT (after the token is verified) and kept on flask.g.
+        """
+        if not self.replicas or not has_request_context():
+            return None
+        if '_db_replica' not in g:
+            replica = None
+            if request.method in READ_METHODS and self._route_declared() == 'replica' and \
+                    self.marks.get(self._writer_key()) is not True:
+                replica = random.choice(self.replicas)
+            g._db_replica = replica
+            self.routed['replica' if replica else 'primary'] += 1
+        return g._db_replica
+
+    def wrote(self):
+        """
+        The request wrote: read from the primary for the rest of it, and for
+        sticky_seconds afterwards for this user (or anonymous client address).
+        """
+        if not has_request_context():
+            return
+        g._db_replica = None
+        if self.marks is not None and not g.get('_db_marked'):
+            g._db_marked = True
+            self.marks.set(self._writer_key(), True, self.sticky_seconds)
+
+    def stats(self):
+        return {"replicas": self.replicas, "sticky_seconds": self.sticky_seconds, "requests": dict(self.routed)}
+
+
+read_router = ReadRouter()
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that sends plain SELECTs to the request's replica.
+    Flushes, DML, SELECT ... FOR UPDATE and bare connection() calls use the primary;
+    flushes and DML also make the request (and the writer) sticky to it.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            if clause is not None and getattr(clause, 'is_select', False) and \
+                    getattr(clause, '_for_update_arg', None) is None:
+                replica = read_router.replica_for_request()
+                if replica is not None:
+                    return self._db.engines[replica]
+            elif isinstance(clause, UpdateBase):
+                read_router.wrote()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    read_router.wrote()
+
+
+# --- Per-route overrides ---
+
+def read_from_replica(fn):
+    """
+    Let this view's GETs read from a replica even if its blueprint is not routed.
+    """
+    fn.db_reads = 'replica'
+    return fn
+
+
+def read_from_primary(fn):
+    """
+    Keep this view on the primary (e.g. it must see other users' writes at once).
+    """
+    fn.db_reads = 'primary'
+    return fn
+
+
+def init_db_routing(app):
+    read_router.configure(app)
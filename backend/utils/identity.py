@@ -0,0 +1,230 @@
+# Per-request identity resolution (user + role profile)
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database import db
+from models import User, Student, Teacher
+from utils.revocation import revocation_list
+
+PROFILE_MODELS = {'student': Student, 'teacher': Teacher}
+
+
+class IdentityCache:
+    """
+    Bounded TTL cache of user/profile column snapshots, shared across requests.
+    A ttl of 0 disables it, so every request does a single fresh lookup.
+    """
+    def __init__(self, ttl=0, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, ttl=None, maxsize=None):
+        if ttl is not None:
+            self.ttl = ttl
+        if maxsize is not None:
+            self.maxsize = maxsize
+        self.clear()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, user_id):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at < time.monotonic():
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return snapshot
+
+    def set(self, user_id, snapshot):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def init_identity(app):
+    """
+    Configure the cross-request cache from IDENTITY_CACHE_TTL / IDENTITY_CACHE_SIZE.
+    """
+    identity_cache.configure(
+        ttl=float(app.config.get('IDENTITY_CACHE_TTL', 0)),
+        maxsize=int(app.config.get('IDENTITY_CACHE_SIZE', 1024))
+    )
+
+
+# --- Snapshot helpers ---
+
+def _columns(obj):
+    return {attr.key: getattr(obj, attr.key) for attr in db.inspect(obj).mapper.column_attrs}
+
+
+def _snapshot(user):
+    profile = PROFILE_MODELS.get(user.role) and getattr(user, user.role)
+    return {
+        'user': _columns(user),
+        'profile': _columns(profile) if profile is not None else None
+    }
+
+
+def _restore(snapshot):
+    """
+    Rebuild the cached rows and attach them to the current session without SQL.
+    """
+    user = User(**snapshot['user'])
+    profile = None
+    profile_model = PROFILE_MODELS.get(user.role)
+    if profile_model is not None:
+        if snapshot['profile'] is not None:
+            profile = profile_model(**snapshot['profile'])
+            set_committed_value(profile, 'user', user)
+        for role, model in PROFILE_MODELS.items():
+            set_committed_value(user, role, profile if model is profile_model else None)
+    make_transient_to_detached(user)
+    if profile is not None:
+        make_transient_to_detached(profile)
+    return db.session.merge(user, load=False)
+
+
+# --- Lookup ---
+
+def load_user(user_id):
+    """
+    Load a user together with their Student/Teacher profile and institution,
+    at most once per request.
+    """
+    if user_id is None:
+        return None
+    user_id = int(user_id)
+
+    if has_request_context() and g.get('_identity_user_id') == user_id:
+        return g._identity_user
+
+    snapshot = identity_cache.get(user_id)
+    if snapshot is not None:
+        user = _restore(snapshot)
+    else:
+        user = db.session.get(User, user_id, options=[
+            joinedload(User.student), joinedload(User.teacher), joinedload(User.institution)
+        ])
+        if user is not None:
+            identity_cache.set(user_id, _snapshot(user))
+
+    if has_request_context():
+        g._identity_user_id = user_id
+        g._identity_user = user
+    return user
+
+
+def current_user():
+    """
+    The authenticated User for this request (requires a verified JWT).
+    """
+    return load_user(get_jwt_identity())
+
+
+def current_profile():
+    """
+    The Student or Teacher row of the authenticated user, if their role has one.
+    """
+    user = current_user()
+    if user is None or user.role not in PROFILE_MODELS:
+        return None
+    return getattr(user, user.role)
+
+
+def current_student():
+    user = current_user()
+    return user.student if user is not None and user.role == 'student' else None
+
+
+def current_teacher():
+    user = current_user()
+    return user.teacher if user is not None and user.role == 'teacher' else None
+
+
+def invalidate_identity(user_id=None):
+    """
+    Drop a cached identity (or all of them when user_id is None).
+    """
+    if user_id is None:
+        identity_cache.clear()
+    else:
+        identity_cache.invalidate(int(user_id))
+    if has_request_context() and (user_id is None or g.get('_identity_user_id') == int(user_id)):
+        g.pop('_identity_user_id', None)
+        g.pop('_identity_user', None)
+
+
+# --- Invalidation on user / role profile changes ---
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    identity_cache.invalidate(target.id)
+
+
+# Token revocation waits for COMMIT: a rolled-back role change or delete keeps the tokens
+
+@event.listens_for(User, 'after_update')
+def _revoke_on_role_change(mapper, connection, target):
+    # Claims-mode tokens carry the role, so a role change must retire them
+    if db.inspect(target).attrs.role.history.has_changes():
+        db.inspect(target).session.info.setdefault('revoke_user_ids', set()).add(target.id)
+
+
+@event.listens_for(User, 'after_delete')
+def _revoke_on_delete(mapper, connection, target):
+    db.inspect(target).session.info.setdefault('revoke_user_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _revoke_committed(session):
+    for user_id in session.info.pop('revoke_user_ids', ()):
+        revocation_list.revoke_user_tokens(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_revocations(session):
+    session.info.pop('revoke_user_ids', None)
+
+
+@event.listens_for(Student, 'after_insert')
+@event.listens_for(Student, 'after_update')
+@event.listens_for(Student, 'after_delete')
+@event.listens_for(Teacher, 'after_insert')
+@event.listens_for(Teacher, 'after_update')
+@event.listens_for(Teacher, 'after_delete')
+def _invalidate_profile(mapper, connection, target):
+    if target.user_id is not None:
+        identity_cache.invalidate(target.user_id)
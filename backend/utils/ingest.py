@@ -0,0 +1,213 @@
+# Bulk CSV ingestion of semester records
+import time
+
+import numpy as np
+import pandas as pd
+
+from database import db
+from models import User, Student, Record
+from utils.identity import invalidate_identity
+from utils.jobs import job_queue
+from utils.insights import mark_students_dirty
+from utils.rollups import add_rollup_delta, student_delta
+from utils.conditional import bump_versions
+
+REQUIRED_COLUMNS = ['email', 'semester', 'gpa', 'attendance']
+# Optional profile columns, written to the students row when present
+STUDENT_COLUMNS = {
+    'full_name': 'full_name', 'course': 'course', 'current_semester': 'current_semester',
+    'overall_gpa': 'overall_gpa', 'attendance_percentage': 'attendance_percentage'
+}
+NUMERIC_COLUMNS = ['semester', 'gpa', 'attendance', 'current_semester', 'overall_gpa', 'attendance_percentage']
+MAX_REPORTED_ERRORS = 1000
+
+
+class IngestReport:
+    def __init__(self):
+        self.rows_total = 0
+        self.rows_ok = 0
+        self.records_inserted = 0
+        self.records_updated = 0
+        self.students_updated = 0
+        self.errors = []
+        self.errors_total = 0
+        self.started = time.perf_counter()
+
+    def add_errors(self, row_numbers, message):
+        self.errors_total += len(row_numbers)
+        room = MAX_REPORTED_ERRORS - len(self.errors)
+        self.errors.extend({"row": int(n), "error": message} for n in row_numbers[:max(room, 0)])
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows_total": self.rows_total,
+            "rows_ok": self.rows_ok,
+            "rows_failed": self.errors_total,
+            "records_inserted": self.records_inserted,
+            "records_updated": self.records_updated,
+            "students_updated": self.students_updated,
+            "errors": self.errors,
+            "errors_truncated": self.errors_total > len(self.errors),
+            "elapsed_sec": round(elapsed, 3),
+            "rows_per_sec": round(self.rows_total / elapsed, 1) if elapsed > 0 else None
+        }
+
+
+def _validate(chunk, report):
+    """
+    Vectorized checks; returns the chunk minus invalid rows (errors go to the report).
+    """
+    checks = [
+        (chunk['email'].isna() | (chunk['email'] == ''), "email is required"),
+        (chunk['semester'].isna() | (chunk['semester'] % 1 != 0) | ~chunk['semester'].between(1, 12),
+         "semester must be a whole number between 1 and 12"),
+        (chunk['gpa'].isna() | ~chunk['gpa'].between(0, 9.99), "gpa must be a number between 0 and 9.99"),
+        (chunk['attendance'].isna() | ~chunk['attendance'].between(0, 100),
+         "attendance must be a number between 0 and 100"),
+    ]
+    if 'current_semester' in chunk:
+        checks.append((chunk['current_semester'].notna() & ~chunk['current_semester'].between(1, 12),
+                       "current_semester must be between 1 and 12"))
+    if 'overall_gpa' in chunk:
+        checks.append((chunk['overall_gpa'].notna() & ~chunk['overall_gpa'].between(0, 9.99),
+                       "overall_gpa must be between 0 and 9.99"))
+    if 'attendance_percentage' in chunk:
+        checks.append((chunk['attendance_percentage'].notna() & ~chunk['attendance_percentage'].between(0, 100),
+                       "attendance_percentage must be between 0 and 100"))
+    checks.append((chunk.duplicated(['email', 'semester'], keep='last'), "superseded by a later row for the same email/semester"))
+
+    bad = np.zeros(len(chunk), dtype=bool)
+    for mask, message in checks:
+        mask = mask.to_numpy() & ~bad  # one error per row: the first failing check
+        if mask.any():
+            report.add_errors(chunk['_row'].to_numpy()[mask].tolist(), message)
+            bad |= mask
+    return chunk[~bad]
+
+
+def _apply_chunk(chunk, institution_id, report):
+    """
+    Upsert one validated chunk in a single transaction.
+    """
+    students, current = {}, {}
+    for email, sid, uid, gpa, attendance in (
+            db.session.query(User.email, Student.id, User.id, Student.overall_gpa, Student.attendance_percentage)
+            .join(Student, Student.user_id == User.id)
+            .filter(User.institution_id == institution_id, User.email.in_(chunk['email'].unique().tolist()))):
+        students[email] = (sid, uid)
+        # Current values, for the KPI rollup delta of profile updates
+        current[sid] = {'overall_gpa': gpa, 'attendance_percentage': attendance}
+    known = chunk['email'].isin(students)
+    if not known.all():
+        report.add_errors(chunk.loc[~known, '_row'].tolist(), "no student with this email in your institution")
+        chunk = chunk[known]
+    if chunk.empty:
+        return
+
+    chunk = chunk.assign(student_id=chunk['email'].map(lambda e: students[e][0]))
+    existing = dict(
+        ((sid, sem), rid) for rid, sid, sem in
+        db.session.query(Record.id, Record.student_id, Record.semester)
+        .filter(Record.student_id.in_(chunk['student_id'].unique().tolist()))
+    )
+
+    inserts, updates = [], []
+    for sid, sem, gpa, att in zip(chunk['student_id'], chunk['semester'].astype(int), chunk['gpa'], chunk['attendance']):
+        values = {"gpa": round(float(gpa), 2), "attendance": round(float(att), 2)}
+        record_id = existing.get((sid, sem))
+        if record_id is None:
+            inserts.append({"student_id": int(sid), "semester": int(sem), **values})
+        else:
+            updates.append({"id": record_id, **values})
+
+    profile_columns = [c for c in STUDENT_COLUMNS if c in chunk]
+    student_updates = []
+    if profile_columns:
+        latest = chunk.drop_duplicates('student_id', keep='last')
+        for row in latest[['student_id'] + profile_columns].itertuples(index=False):
+            values = {STUDENT_COLUMNS[c]: getattr(row, c) for c in profile_columns if pd.notna(getattr(row, c))}
+            if 'current_semester' in values:
+                values['current_semester'] = int(values['current_semester'])
+            if values:
+                student_updates.append({"id": int(row.student_id), **values})
+
+    try:
+        if inserts:
+            db.session.bulk_insert_mappings(Record, inserts)
+        if updates:
+            db.session.bulk_update_mappings(Record, updates)
+        if student_updates:
+            db.session.bulk_update_mappings(Student, student_updates)
+        # Bulk writes skip the ORM listeners that feed the insight dirty set and the rollups
+        mark_students_dirty(chunk['student_id'].unique().tolist())
+        rollup = {}
+        for values in student_updates:
+            for field, delta in student_delta(current[values['id']], values).items():
+                rollup[field] = rollup.get(field, 0) + delta
+        add_rollup_delta(institution_id, **rollup)
+        bump_versions(('institution', institution_id))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        report.add_errors(chunk['_row'].tolist(), f"database error: {e}")
+        return
+
+    report.rows_ok += len(chunk)
+    report.records_inserted += len(inserts)
+    report.records_updated += len(updates)
+    report.students_updated += len(student_updates)
+    # Bulk updates bypass ORM events, so cached identities must be dropped by hand
+    if student_updates:
+        for email in chunk['email'].unique():
+            invalidate_identity(students[email][1])
+
+
+def ingest_records_csv(fileobj, institution_id, chunksize=5000, progress=None):
+    """
+    Parse a records CSV in chunks and bulk-upsert it for one institution.
+    Required columns: email, semester, gpa, attendance. Returns the report dict;
+    raises ValueError if the header is unusable. `progress(**counts)` is called
+    after every chunk.
+    """
+    report = IngestReport()
+    try:
+        reader = pd.read_csv(fileobj, chunksize=chunksize, dtype=str, skipinitialspace=True)
+        for n, chunk in enumerate(reader):
+            if n == 0:
+                chunk.columns = [c.strip().lower() for c in chunk.columns]
+                columns = list(chunk.columns)
+                missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+                if missing:
+                    raise ValueError(f"Missing required columns: {', '.join(missing)}")
+            else:
+                chunk.columns = columns
+
+            offset = report.rows_total
+            report.rows_total += len(chunk)
+            chunk = chunk.assign(_row=np.arange(offset + 2, offset + 2 + len(chunk)))  # line 1 is the header
+            chunk['email'] = chunk['email'].str.strip()
+            for col in NUMERIC_COLUMNS:
+                if col in chunk:
+                    chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+
+            valid = _validate(chunk, report)
+            if not valid.empty:
+                _apply_chunk(valid, institution_id, report)
+            if progress:
+                progress(rows_total=report.rows_total, rows_ok=report.rows_ok, rows_failed=report.errors_total)
+    except pd.errors.EmptyDataError:
+        raise ValueError("The uploaded file is empty")
+    except pd.errors.ParserError as e:
+        raise ValueError(f"Could not parse CSV: {e}")
+    return report.to_dict()
+
+
+@job_queue.handler('ingest_records')
+def ingest_records_job(ctx, path, institution_id):
+    """
+    Background variant of the upload: the CSV was spooled to `path` by the request
+    (the queue removes it).
+    """
+    with open(path, 'rb') as fileobj:
+        return ingest_records_csv(fileobj, institution_id, progress=ctx.report_progress)
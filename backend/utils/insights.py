@@ -0,0 +1,268 @@
+# Materialized AI insights with incremental recomputation
+import time
+
+import numpy as np
+from sqlalchemy import event, insert, select, delete, or_, exists
+from sqlalchemy.sql import func
+
+from database import db
+from models import User, Student, Teacher, Institution, Record, AIInsight, AIInsightDirty
+from utils.ai_model import predict_student_risk, predict_student_risk_batch, \
+    predict_teacher_performance, predict_institution_rank
+from utils.jobs import job_queue
+from utils.conditional import bump_versions, ALL
+
+STUDENT_RISK = 'student_risk'
+TEACHER_PERFORMANCE = 'teacher_performance'
+INSTITUTION_RANK = 'institution_rank'
+
+# Fixed seed: a student's confidence only changes when their inputs do
+CONFIDENCE_SEED = 2024
+BATCH_SIZE = 5000
+
+
+# --- Signatures (the inputs a stored insight was computed from) ---
+
+def student_signature(attendance, gpa):
+    return f"{float(attendance or 0):.2f}|{float(gpa or 0):.2f}"
+
+
+def teacher_signature(avg_class_gpa, avg_feedback):
+    return f"{float(avg_class_gpa or 0):.2f}|{float(avg_feedback or 0):.2f}"
+
+
+def institution_signature(total_students, avg_gpa):
+    return f"{int(total_students or 0)}|{float(avg_gpa or 0):.2f}"
+
+
+# --- Dirty-set tracking ---
+
+def _insert_ignore():
+    return insert(AIInsightDirty.__table__) \
+        .prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite')
+
+
+def mark_students_dirty(student_ids, connection=None):
+    """
+    Queue students (by students.id) for recomputation, inside the caller's transaction.
+    """
+    if not student_ids:
+        return
+    stmt = _insert_ignore().from_select(
+        ['user_id'], select(Student.user_id).where(Student.id.in_(list(student_ids)))
+    )
+    (connection or db.session).execute(stmt)
+
+
+def _mark_user_dirty(connection, user_id):
+    connection.execute(_insert_ignore().values(user_id=user_id))
+
+
+def _changed(target, *attrs):
+    state = db.inspect(target)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+@event.listens_for(Student, 'after_insert')
+def _student_inserted(mapper, connection, target):
+    _mark_user_dirty(connection, target.user_id)
+
+
+@event.listens_for(Student, 'after_update')
+def _student_updated(mapper, connection, target):
+    if _changed(target, 'overall_gpa', 'attendance_percentage'):
+        _mark_user_dirty(connection, target.user_id)
+
+
+@event.listens_for(Teacher, 'after_insert')
+def _teacher_inserted(mapper, connection, target):
+    _mark_user_dirty(connection, target.user_id)
+
+
+@event.listens_for(Teacher, 'after_update')
+def _teacher_updated(mapper, connection, target):
+    if _changed(target, 'avg_feedback'):
+        _mark_user_dirty(connection, target.user_id)
+
+
+@event.listens_for(Record, 'after_insert')
+@event.listens_for(Record, 'after_update')
+@event.listens_for(Record, 'after_delete')
+def _record_changed(mapper, connection, target):
+    mark_students_dirty([target.student_id], connection)
+
+
+# --- Materialization ---
+
+def _upsert(insight_type, rows, key='user_id'):
+    """
+    rows: dicts keyed by `key` (user_id or institution_id). Updates existing insights
+    and inserts the rest with bulk mappings.
+    """
+    if not rows:
+        return
+    key_column = getattr(AIInsight, key)
+    filters = [AIInsight.insight_type == insight_type, key_column.in_([r[key] for r in rows])]
+    if key == 'institution_id':
+        filters.append(AIInsight.user_id.is_(None))
+    existing = dict(db.session.query(key_column, AIInsight.id).filter(*filters))
+    updates = [{"id": existing[r[key]], **r} for r in rows if r[key] in existing]
+    inserts = [{"insight_type": insight_type, **r} for r in rows if r[key] not in existing]
+    if updates:
+        db.session.bulk_update_mappings(AIInsight, updates)
+    if inserts:
+        db.session.bulk_insert_mappings(AIInsight, inserts)
+
+
+def _student_rows():
+    return db.session.query(User.id, User.institution_id, Student.attendance_percentage, Student.overall_gpa) \
+        .join(Student, Student.user_id == User.id)
+
+
+def _score_keyset(query):
+    # Keyset batches rather than one streaming cursor, so writes can run in between
+    recomputed, last_id = 0, 0
+    while True:
+        batch = query.filter(User.id > last_id).order_by(User.id).limit(BATCH_SIZE).all()
+        if not batch:
+            return recomputed
+        recomputed += _score_student_batch(batch)
+        last_id = batch[-1][0]
+
+
+def _rebuild_students(full, dirty_ids):
+    if full:
+        return _score_keyset(_student_rows())
+    recomputed = 0
+    for i in range(0, len(dirty_ids), BATCH_SIZE):
+        batch = _student_rows().filter(User.id.in_(dirty_ids[i:i + BATCH_SIZE])).all()
+        if batch:
+            recomputed += _score_student_batch(batch)
+    # Students that never had an insight materialized
+    missing = ~exists().where(AIInsight.user_id == User.id, AIInsight.insight_type == STUDENT_RISK)
+    return recomputed + _score_keyset(_student_rows().filter(missing))
+
+
+def _score_student_batch(batch):
+    user_ids = np.array([r[0] for r in batch], dtype=np.int64)
+    attendance = np.array([float(r[2] or 0) for r in batch])
+    gpa = np.array([float(r[3] or 0) for r in batch])
+    result = predict_student_risk_batch(attendance, gpa, seed=CONFIDENCE_SEED, keys=user_ids)
+    _upsert(STUDENT_RISK, [{
+        "user_id": int(uid), "institution_id": r[1],
+        "risk_level": level, "confidence": float(conf), "prediction_text": msg,
+        "inputs_signature": student_signature(a, g)
+    } for uid, r, level, conf, msg, a, g in zip(
+        user_ids, batch, result["risk_level"], result["confidence"], result["message"], attendance, gpa)])
+    return len(batch)
+
+
+def _institution_stats():
+    rows = db.session.query(User.institution_id, func.count(Student.id), func.avg(Student.overall_gpa)) \
+        .join(Student, Student.user_id == User.id).filter(User.institution_id.isnot(None)) \
+        .group_by(User.institution_id).all()
+    return {inst_id: (count, avg) for inst_id, count, avg in rows}
+
+
+def _rebuild_teachers(full, stats):
+    # Teachers are few; compare every signature rather than trusting the dirty set alone,
+    # since a student's GPA change moves the class average of every teacher there.
+    stored = dict(db.session.query(AIInsight.user_id, AIInsight.inputs_signature)
+                  .filter(AIInsight.insight_type == TEACHER_PERFORMANCE))
+    rows = []
+    for user_id, inst_id, feedback in db.session.query(User.id, User.institution_id, Teacher.avg_feedback) \
+            .join(Teacher, Teacher.user_id == User.id):
+        avg_gpa = stats.get(inst_id, (0, None))[1]
+        signature = teacher_signature(avg_gpa, feedback)
+        if full or stored.get(user_id) != signature:
+            insight = predict_teacher_performance(float(avg_gpa or 0), float(feedback or 0))
+            rows.append({"user_id": user_id, "institution_id": inst_id, "risk_level": insight["level"],
+                         "confidence": 0, "prediction_text": insight["insight_text"],
+                         "inputs_signature": signature})
+    _upsert(TEACHER_PERFORMANCE, rows)
+    return len(rows)
+
+
+def _rebuild_institutions(full, stats):
+    stored = dict(db.session.query(AIInsight.institution_id, AIInsight.inputs_signature)
+                  .filter(AIInsight.insight_type == INSTITUTION_RANK, AIInsight.user_id.is_(None)))
+    rows = []
+    for (inst_id,) in db.session.query(Institution.id):
+        total, avg_gpa = stats.get(inst_id, (0, None))
+        signature = institution_signature(total, avg_gpa)
+        if full or stored.get(inst_id) != signature:
+            forecast = predict_institution_rank(int(total), float(avg_gpa or 0))
+            rows.append({"institution_id": inst_id, "user_id": None, "risk_level": 'N/A',
+                         "confidence": forecast["confidence"], "prediction_text": forecast["prediction_text"],
+                         "inputs_signature": signature})
+    _upsert(INSTITUTION_RANK, rows, key='institution_id')
+    return len(rows)
+
+
+def rebuild_insights(full=False):
+    """
+    Materialize insights into ai_insights. Incremental mode only recomputes students
+    in the dirty set (or without an insight) and teachers/institutions whose inputs
+    signature changed. Returns how many rows were recomputed.
+    """
+    started = time.perf_counter()
+    # Clear the snapshot inside this transaction: a concurrent re-mark waits on our
+    # row locks and lands after the commit, so no change is lost.
+    dirty_ids = [uid for (uid,) in db.session.query(AIInsightDirty.user_id)]
+    if full:
+        db.session.execute(delete(AIInsightDirty))
+    else:
+        for i in range(0, len(dirty_ids), BATCH_SIZE):
+            db.session.execute(delete(AIInsightDirty).where(AIInsightDirty.user_id.in_(dirty_ids[i:i + BATCH_SIZE])))
+
+    stats = _institution_stats()
+    counts = {
+        "students": _rebuild_students(full, dirty_ids),
+        "teachers": _rebuild_teachers(full, stats),
+        "institutions": _rebuild_institutions(full, stats),
+    }
+    if any(counts.values()):
+        bump_versions(ALL)  # bulk upserts skip the ORM listeners
+    db.session.commit()
+    return {
+        "mode": "full" if full else "incremental",
+        "recomputed": counts,
+        "dirty_processed": len(dirty_ids),
+        "elapsed_sec": round(time.perf_counter() - started, 3)
+    }
+
+
+@job_queue.handler('rebuild_insights')
+def rebuild_insights_job(ctx, full=False):
+    return rebuild_insights(full=full)
+
+
+# --- Reads for dashboards ---
+
+def _stored(insight_type, **filters):
+    return AIInsight.query.filter_by(insight_type=insight_type, **filters).first()
+
+
+def student_insight(user_id, attendance, gpa):
+    """
+    Stored risk insight if it matches the current inputs, else computed on the spot
+    (same seed, so the number does not change once the rebuild catches up).
+    """
+    row = _stored(STUDENT_RISK, user_id=user_id)
+    if row and row.inputs_signature == student_signature(attendance, gpa):
+        return {"risk_level": row.risk_level, "message": row.prediction_text, "confidence": float(row.confidence)}
+    return predict_student_risk(float(attendance), float(gpa), seed=CONFIDENCE_SEED, key=int(user_id))
+
+
+def teacher_insight(user_id, avg_class_gpa, avg_feedback):
+    row = _stored(TEACHER_PERFORMANCE, user_id=user_id)
+    if row and row.inputs_signature == teacher_signature(avg_class_gpa, avg_feedback):
+        return {"insight_text": row.prediction_text, "level": row.risk_level}
+    return predict_teacher_performance(float(avg_class_gpa or 0), float(avg_feedback or 0))
+
+
+def institution_insight(institution_id, total_students, avg_gpa):
+    row = _stored(INSTITUTION_RANK, institution_id=institution_id, user_id=None)
+    if row and row.inputs_signature == institution_signature(total_students, avg_gpa):
+        return {"prediction_text": row.prediction_text, "confidence": float(row.confidence)}
+    return predict_institution_rank(int(total_students or 0), float(avg_gpa or 0))
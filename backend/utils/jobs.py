@@ -0,0 +1,376 @@
+# Background job queue with bounded per-institution concurrency
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.log import logger
+
+JOB_FIELDS = ['id', 'kind', 'institution_id', 'user_id', 'status', 'payload', 'progress',
+              'result', 'error', 'created_at', 'started_at', 'finished_at', 'owner', 'heartbeat_at']
+JSON_FIELDS = {'payload', 'progress', 'result'}
+# Which process runs a job and when it last said so; not part of the API
+LEASE_FIELDS = {'owner', 'heartbeat_at'}
+
+
+class MemoryJobStore:
+    """
+    Keeps job state in process; finished jobs beyond `max_finished` are dropped oldest first.
+    """
+    def __init__(self, max_finished=1000):
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._finished = deque()
+        self._lock = threading.Lock()
+
+    def create(self, job):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            if fields.get('status') in ('succeeded', 'failed'):
+                self._finished.append(job_id)
+                while len(self._finished) > self.max_finished:
+                    self._jobs.pop(self._finished.popleft(), None)
+
+    def claim(self, job_id, owner, now):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] != 'queued':
+                return False
+            job.update(status='running', owner=owner, started_at=now, heartbeat_at=now)
+            return True
+
+    def finish(self, job_id, owner, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] != 'running' or job['owner'] != owner:
+                return False
+        self.update(job_id, **fields)
+        return True
+
+    def heartbeat(self, job_ids, owner, now):
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is not None and job['owner'] == owner:
+                    job['heartbeat_at'] = now
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def with_status(self, status):
+        with self._lock:
+            return [dict(j) for j in self._jobs.values() if j['status'] == status]
+
+
+class SQLiteJobStore:
+    """
+    Persistent store, which several processes may share: queued jobs survive a
+    restart, and a job runs only in the process whose claim() moved it to running.
+    """
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, institution_id INTEGER, user_id INTEGER,"
+                " status TEXT NOT NULL, payload TEXT, progress TEXT, result TEXT, error TEXT,"
+                " created_at REAL, started_at REAL, finished_at REAL, owner TEXT, heartbeat_at REAL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (('owner', 'TEXT'), ('heartbeat_at', 'REAL')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    @staticmethod
+    def _encode(fields):
+        return {k: json.dumps(v) if k in JSON_FIELDS and v is not None else v for k, v in fields.items()}
+
+    @staticmethod
+    def _decode(row):
+        job = dict(zip(JOB_FIELDS, row))
+        for k in JSON_FIELDS:
+            if job[k] is not None:
+                job[k] = json.loads(job[k])
+        return job
+
+    def create(self, job):
+        job = self._encode(job)
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO jobs ({', '.join(JOB_FIELDS)}) VALUES ({', '.join('?' * len(JOB_FIELDS))})",
+                [job.get(f) for f in JOB_FIELDS]
+            )
+
+    def update(self, job_id, **fields):
+        fields = self._encode(fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                [*fields.values(), job_id]
+            )
+
+    def claim(self, job_id, owner, now):
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, started_at = ?, heartbeat_at = ? "
+                "WHERE id = ? AND status = 'queued'", (owner, now, now, job_id)
+            ).rowcount == 1
+
+    def finish(self, job_id, owner, **fields):
+        """
+        Final update, only while this owner still holds the job (it may have been
+        failed meanwhile for a lapsed lease).
+        """
+        fields = self._encode(fields)
+        with self._connect() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} "
+                "WHERE id = ? AND status = 'running' AND owner IS ?", [*fields.values(), job_id, owner]
+            ).rowcount == 1
+
+    def heartbeat(self, job_ids, owner, now):
+        if job_ids:
+            with self._connect() as conn:
+                conn.execute(f"UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND id IN ({', '.join('?' * len(job_ids))})",
+                             [now, owner, *job_ids])
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def with_status(self, status):
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE status = ? ORDER BY created_at", (status,)
+            ).fetchall()
+        return [self._decode(r) for r in rows]
+
+
+class JobContext:
+    """
+    Handed to job handlers so they can publish progress.
+    """
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job = job
+
+    def report_progress(self, **progress):
+        self.queue.store.update(self.job['id'], progress=progress)
+
+
+class JobQueue:
+    """
+    Runs registered handlers on a small worker pool. Jobs are queued per institution
+    and dispatched round-robin, with at most `per_institution` running for any one
+    institution, so a single tenant cannot occupy every worker.
+
+    With a shared store each process holds a lease on the jobs it runs, renewed every
+    lease_seconds / 3; jobs whose lease lapsed (their process died) are failed, and
+    queued jobs nobody claimed are picked up, at startup and on every renewal.
+    """
+    def __init__(self):
+        self.app = None
+        self.store = MemoryJobStore()
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = 60.0
+        self.upload_dir = os.path.join(tempfile.gettempdir(), 'edusamagra-uploads')
+        self.workers = 4
+        self.per_institution = 1
+        self._handlers = {}
+        self._pending = defaultdict(deque)
+        self._tenants = deque()
+        self._running = defaultdict(int)
+        self._running_total = 0
+        self._executor = None
+        self._mine = set()  # ids enqueued or running in this process
+        self._heartbeat = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = int(app.config.get('JOB_WORKERS', 4))
+        self.per_institution = int(app.config.get('JOB_MAX_PER_INSTITUTION', 1))
+        self.lease_seconds = float(app.config.get('JOB_LEASE_SECONDS', 60))
+        if app.config.get('JOB_STORE', 'memory') == 'sqlite':
+            self.store = SQLiteJobStore(app.config.get('JOB_SQLITE_PATH', 'jobs.sqlite3'))
+        else:
+            self.store = MemoryJobStore()
+        self.upload_dir = app.config.get('JOB_UPLOAD_DIR', self.upload_dir)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job-worker')
+        self._recover()
+        if isinstance(self.store, SQLiteJobStore) and self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._renew_leases, name='job-heartbeat', daemon=True)
+            self._heartbeat.start()
+        self._remove_stale_spools(float(app.config.get('JOB_UPLOAD_MAX_AGE', 86400)))
+
+    def handler(self, kind):
+        """
+        Decorator registering fn(ctx, **payload) -> result as the handler for a job kind.
+        """
+        def decorator(fn):
+            self._handlers[kind] = fn
+            return fn
+        return decorator
+
+    def submit(self, kind, payload, institution_id=None, user_id=None):
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = {
+            'id': uuid.uuid4().hex, 'kind': kind, 'institution_id': institution_id, 'user_id': user_id,
+            'status': 'queued', 'payload': payload, 'progress': None, 'result': None, 'error': None,
+            'created_at': time.time(), 'started_at': None, 'finished_at': None, 'owner': None, 'heartbeat_at': None
+        }
+        self.store.create(job)
+        self._enqueue(job)
+        return job
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    # --- Spooled uploads ---
+
+    def spool(self, stream, suffix):
+        """
+        Copy an upload to a private file (0600 in a 0700 directory) for a job's
+        payload 'path'. The queue deletes it once the job ends in any state.
+        """
+        os.makedirs(self.upload_dir, mode=0o700, exist_ok=True)
+        os.chmod(self.upload_dir, 0o700)
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self.upload_dir)
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(stream, f)
+        return path
+
+    def _remove_spool(self, job):
+        path = (job.get('payload') or {}).get('path')
+        if path and os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.upload_dir):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _remove_stale_spools(self, max_age):
+        # Left behind by a process that died before its job finished (the memory store forgets the job)
+        try:
+            names = os.listdir(self.upload_dir)
+        except FileNotFoundError:
+            return
+        cutoff = time.time() - max_age
+        for name in names:
+            path = os.path.join(self.upload_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running_total,
+                "queued": sum(len(q) for q in self._pending.values()),
+                "running_by_institution": {str(k): v for k, v in self._running.items() if v}
+            }
+
+    # --- Scheduling ---
+
+    def _enqueue(self, job):
+        with self._lock:
+            if job['id'] in self._mine:
+                return
+            self._mine.add(job['id'])
+            tenant = job['institution_id']
+            if not self._pending[tenant]:
+                self._tenants.append(tenant)
+            self._pending[tenant].append(job)
+        self._dispatch()
+
+    def _dispatch(self):
+        with self._lock:
+            skipped = 0
+            while self._tenants and self._running_total < self.workers and skipped < len(self._tenants):
+                tenant = self._tenants[0]
+                self._tenants.rotate(-1)
+                if self._running[tenant] >= self.per_institution:
+                    skipped += 1
+                    continue
+                skipped = 0
+                job = self._pending[tenant].popleft()
+                if not self._pending[tenant]:
+                    self._tenants.remove(tenant)
+                    del self._pending[tenant]
+                self._running[tenant] += 1
+                self._running_total += 1
+                self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        claimed = self.store.claim(job['id'], self.owner, time.time())
+        try:
+            if claimed:  # otherwise another process sharing the store took it first
+                try:
+                    with self.app.app_context():
+                        result = self._handlers[job['kind']](JobContext(self, job), **(job['payload'] or {}))
+                    self.store.finish(job['id'], self.owner, status='succeeded', result=result, finished_at=time.time())
+                except Exception as e:
+                    self.store.finish(job['id'], self.owner, status='failed', error=str(e), finished_at=time.time())
+                self._remove_spool(job)
+        finally:
+            with self._lock:
+                self._mine.discard(job['id'])
+                self._running[job['institution_id']] -= 1
+                self._running_total -= 1
+            self._dispatch()
+
+    def _recover(self):
+        """
+        Fail running jobs whose lease lapsed and enqueue queued ones (both only
+        exist in a persistent store); claim() keeps a job from running twice.
+        """
+        now = time.time()
+        for job in self.store.with_status('running'):
+            if job['owner'] != self.owner and (job['heartbeat_at'] or 0) < now - self.lease_seconds:
+                if self.store.finish(job['id'], job['owner'], status='failed', finished_at=now,
+                                     error="Interrupted: the server running it stopped"):
+                    self._remove_spool(job)
+        for job in self.store.with_status('queued'):
+            if job['kind'] in self._handlers:
+                self._enqueue(job)
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                with self._lock:
+                    mine = list(self._mine)
+                self.store.heartbeat(mine, self.owner, time.time())
+                self._recover()
+            except Exception:
+                logger.exception("Job lease renewal failed")
+
+
+job_queue = JobQueue()
+
+
+def serialize_job(job):
+    return {k: job[k] for k in JOB_FIELDS if k != 'payload' and k not in LEASE_FIELDS}
@@ -0,0 +1,92 @@
+# Flask JSON provider: orjson when installed, stdlib json otherwise.
+# Both encode Decimal as a number and date/time/datetime as ISO 8601 strings.
+import dataclasses
+import json
+import uuid
+from datetime import date, time
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, time)):  # datetime is a date
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """
+    Flask's provider with ISO dates (not RFC 822) and Decimal support.
+    """
+    default = staticmethod(_default)
+
+
+class OrjsonJSONProvider(StdlibJSONProvider):
+    """
+    orjson for dumps/loads and responses; keeps the Flask options that matter
+    (sort_keys, compact / debug indentation). Responses are built from bytes
+    without a str round trip.
+    """
+    ensure_ascii = False  # orjson always writes UTF-8
+
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {'indent', 'separators'}:
+            # Callers asking for stdlib-only options (cls, allow_nan, ...) get stdlib json
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._options(bool(kwargs.get('indent')))) \
+            .decode('utf-8').rstrip('\n')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=_default, option=self._options(indent))
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+PROVIDERS = {'stdlib': StdlibJSONProvider, 'orjson': OrjsonJSONProvider}
+
+
+def provider_class(name='auto'):
+    """
+    JSON_PROVIDER: 'auto' (orjson if installed), 'orjson' or 'stdlib'.
+    """
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_PROVIDER=orjson but orjson is not installed")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown JSON_PROVIDER '{name}' (use auto, orjson or stdlib)")
+    return PROVIDERS[name]
+
+
+def init_json(app):
+    app.json_provider_class = provider_class(app.config.get('JSON_PROVIDER', 'auto'))
+    app.json = app.json_provider_class(app)
+    app.json.sort_keys = bool(app.config.get('JSON_SORT_KEYS', True))
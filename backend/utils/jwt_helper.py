@@ -1,34 +1,44 @@
 from functools import wraps
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from flask import jsonify
-from models import User  # <-- THIS IS THE LINE THAT IS MISSING
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask_jwt_extended.exceptions import RevokedTokenError
+from flask import jsonify, current_app
+from utils.identity import current_user
+from utils.log import logger
 
 def role_required(role_name):
     """
     Custom decorator to check if user has the required role.
+
+    With AUTH_MODE='claims' the role comes from the verified token (zero queries);
+    revoked tokens are rejected by the blocklist check in utils/revocation.
     """
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             try:
-                # This verifies the token is present and valid
+                # This verifies the token is present, valid and not revoked
                 verify_jwt_in_request()
-                
-                # We will manually get the user ID and look them up.
-                identity = get_jwt_identity()
-                user = User.query.get(identity) 
-                
-                if user and user.role == role_name:
-                    return fn(*args, **kwargs)
-                elif not user:
-                    # This case will happen if the lookup fails
-                    return jsonify(msg="Invalid token: User not found"), 422
+
+                if current_app.config.get('AUTH_MODE') == 'claims':
+                    role = get_jwt().get('role')
+                    if role is None:
+                        return jsonify(msg="Invalid token: role claim missing"), 422
                 else:
-                    return jsonify(msg=f"Access forbidden: {role_name}s only"), 403
-            
+                    # Resolved once per request (user + role profile) and kept on flask.g
+                    user = current_user()
+                    if not user:
+                        # This case will happen if the lookup fails
+                        return jsonify(msg="Invalid token: User not found"), 422
+                    role = user.role
+
+                if role == role_name:
+                    return fn(*args, **kwargs)
+                return jsonify(msg=f"Access forbidden: {role_name}s only"), 403
+
+            except RevokedTokenError:
+                return jsonify(msg="Token has been revoked"), 401
             except Exception as e:
-                # We can remove the debug print now
-                # print(f"EXCEPTION in role_required: {str(e)}")
+                logger.exception("Error in role_required", extra={"role": role_name})
                 return jsonify(msg=f"Error in decorator: {str(e)}"), 500
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
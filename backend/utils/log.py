@@ -0,0 +1,126 @@
+# Structured logging. Records are handed to a queue and written by a listener
+# thread, so request threads never block on stream or file I/O.
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger('edusamagra')
+
+# LogRecord attributes; anything else on a record came in through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, msg plus the record's extra fields.
+    """
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_fields(record)
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _fields(record)
+        return line + ''.join(f" {k}={v}" for k, v in fields.items()) if fields else line
+
+
+class Sampler:
+    """
+    Per-event sampling rates, e.g. 'auth.user_lookup=0.01,http.request=0.1';
+    events without an entry use the default rate.
+    """
+    def __init__(self, rates='', default=1.0):
+        self.configure(rates, default)
+
+    def configure(self, rates, default=1.0):
+        self.default = default
+        self.rates = {}
+        for item in filter(None, (part.strip() for part in rates.split(','))):
+            name, _, rate = item.partition('=')
+            self.rates[name.strip()] = float(rate)
+
+    def __call__(self, name):
+        rate = self.rates.get(name, self.default)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+sampler = Sampler()
+_listener = None
+
+
+def log_event(name, level=logging.DEBUG, **fields):
+    """
+    Emit a structured per-request event, subject to its sampling rate. Costs one
+    level check when the level is disabled.
+    """
+    if not logger.isEnabledFor(level) or not sampler(name):
+        return
+    if has_request_context():
+        fields.setdefault('method', request.method)
+        fields.setdefault('path', request.path)
+    logger.log(level, name, extra=fields)
+
+
+def init_logging(app):
+    """
+    Route the app, 'edusamagra' and werkzeug loggers through one QueueHandler;
+    a QueueListener thread formats (LOG_FORMAT json|text) and writes to LOG_FILE
+    or stderr. Also logs a sampled 'http.request' event per request.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    level = logging.getLevelName(str(app.config.get('LOG_LEVEL', 'INFO')).upper())
+    log_file = app.config.get('LOG_FILE')
+    handler = logging.FileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if app.config.get('LOG_FORMAT', 'json') == 'json' else TextFormatter())
+
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    queue_handler = logging.handlers.QueueHandler(records)
+    for target in (logger, app.logger, logging.getLogger('werkzeug')):
+        target.handlers = [queue_handler]
+        target.setLevel(level)
+        target.propagate = False
+
+    sampler.configure(app.config.get('LOG_SAMPLE_RATES', ''), float(app.config.get('LOG_SAMPLE_DEFAULT', 1.0)))
+
+    @app.before_request
+    def _start_timer():
+        g._log_started = time.perf_counter()
+
+    @app.after_request
+    def _log_request(response):
+        started = g.get('_log_started')
+        if started is not None:
+            log_event('http.request', status=response.status_code,
+                      duration_ms=round((time.perf_counter() - started) * 1000, 2))
+        return response
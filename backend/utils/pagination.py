@@ -0,0 +1,102 @@
+# Keyset (cursor) pagination and field projection helpers
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from flask import request
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+def parse_page_args(default_limit=DEFAULT_LIMIT, max_limit=MAX_LIMIT):
+    """
+    Read ?after_id=&limit= from the request. Raises ValueError on bad input.
+    """
+    try:
+        after_id = int(request.args.get('after_id', 0))
+        limit = int(request.args.get('limit', default_limit))
+    except ValueError:
+        raise ValueError("after_id and limit must be integers")
+    if after_id < 0 or limit < 1:
+        raise ValueError("after_id must be >= 0 and limit >= 1")
+    return after_id, min(limit, max_limit)
+
+
+def parse_fields(field_map, default=None):
+    """
+    Read ?fields=a,b,c and return the requested names (all of field_map by default).
+    Raises ValueError for unknown names.
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default or field_map)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in field_map]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def keyset_page(query, key_column, after_id, limit):
+    """
+    Rows with key_column > after_id in key order, plus the cursor for the next page
+    (None on the last page). Fetches one extra row instead of running a COUNT.
+    """
+    rows = query.filter(key_column > after_id).order_by(key_column).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_after_id = getattr(rows[-1], key_column.key) if has_more else None
+    return rows, next_after_id
+
+
+# --- Sorted keyset pagination (cursor = last row's sort value + id) ---
+
+def encode_cursor(value, row_id):
+    if isinstance(value, Decimal):
+        value = float(value)
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor; raises ValueError for a malformed token.
+    """
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return value, int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+
+def parse_sort_args(sort_map, default):
+    """
+    Read ?sort=<name>&order=asc|desc. Raises ValueError for unknown values.
+    """
+    sort = request.args.get('sort', default)
+    order = request.args.get('order', 'asc')
+    if sort not in sort_map:
+        raise ValueError(f"Unknown sort '{sort}' (use one of: {', '.join(sort_map)})")
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'")
+    return sort, order == 'desc'
+
+
+def sorted_keyset_page(query, sort_expr, key_column, cursor, limit, descending=False):
+    """
+    Keyset page ordered by sort_expr, ties broken by key_column ascending. The query
+    must select sort_expr labelled '_sort' and key_column labelled 'id'. Returns
+    (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        past = sort_expr < value if descending else sort_expr > value
+        query = query.filter(or_(past, and_(sort_expr == value, key_column > last_id)))
+    order = sort_expr.desc() if descending else sort_expr.asc()
+    rows = query.order_by(order, key_column).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]._sort, rows[-1].id) if has_more else None
+    return rows, next_cursor
@@ -0,0 +1,130 @@
+# Password hashing: configurable bcrypt cost, rehash detection and an optional
+# bounded process pool that takes the hashing off the request threads
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from itertools import repeat
+
+import bcrypt
+from flask import current_app, has_app_context
+
+DEFAULT_ROUNDS = 12
+
+
+class PasswordPoolBusy(Exception):
+    """
+    The verification pool is saturated (or too slow); the caller should ask the
+    client to retry instead of queueing more work.
+    """
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(pw_hash, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+    except ValueError:  # not a bcrypt hash
+        return False
+
+
+def hash_cost(pw_hash):
+    """
+    The cost factor stored in a bcrypt hash ('$2b$12$...' -> 12), or None.
+    """
+    parts = (pw_hash or '').split('$')
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+
+
+def target_rounds():
+    return int(current_app.config.get('BCRYPT_LOG_ROUNDS', DEFAULT_ROUNDS)) if has_app_context() else DEFAULT_ROUNDS
+
+
+def needs_rehash(pw_hash):
+    return hash_cost(pw_hash) != target_rounds()
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt inline, or in a process pool of `workers` processes with at most
+    `max_pending` hashes in flight (the rest fail fast with PasswordPoolBusy).
+    The pool is created lazily per process, so pre-forking servers are safe.
+    """
+    def __init__(self):
+        self.workers = 0
+        self.max_pending = 0
+        self.timeout = 10.0
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def configure(self, workers=0, max_pending=None, timeout=10.0):
+        self.shutdown()
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending) if workers else None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                # fork: workers only run bcrypt, and do not re-import the app like spawn would
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+                self._pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy(f"{self.max_pending} password hashes already in flight")
+        try:
+            return self._executor().submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordPoolBusy(f"password hashing took over {self.timeout}s")
+        finally:
+            self._slots.release()
+
+    def hash(self, password, rounds=None):
+        return self._run(_hashpw, password, rounds or target_rounds())
+
+    def verify(self, pw_hash, password):
+        return self._run(_checkpw, pw_hash, password)
+
+    @contextmanager
+    def batch(self, workers=None):
+        """
+        For bulk jobs: yields hash_all(passwords, rounds=None) -> hashes, spread over a
+        pool of `workers` processes (default: one per CPU) that lives for the block.
+        Independent of the per-request pool and its in-flight limit.
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            yield lambda passwords, rounds=None: [_hashpw(p, rounds or target_rounds()) for p in passwords]
+            return
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            def hash_all(passwords, rounds=None):
+                chunksize = max(1, len(passwords) // (workers * 4))
+                return list(pool.map(_hashpw, passwords, repeat(rounds or target_rounds()), chunksize=chunksize))
+            yield hash_all
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher()
+
+
+def init_password_hashing(app):
+    password_hasher.configure(
+        workers=int(app.config.get('PASSWORD_POOL_WORKERS', 0)),
+        max_pending=int(app.config.get('PASSWORD_POOL_MAX_PENDING', 0)) or None,
+        timeout=float(app.config.get('PASSWORD_POOL_TIMEOUT', 10))
+    )
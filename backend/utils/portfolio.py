@@ -0,0 +1,173 @@
+# Portfolio reads and batched add/update/delete of projects, skills and links
+from sqlalchemy import select, union_all, literal, update, delete
+
+from database import db
+from models import PortfolioProject, StudentSkill, StudentLink
+from utils.catalog import sync_project_tags, drop_project_tags, link_skills
+from utils.conditional import bump_versions
+from utils.serializers import PROJECT, SKILL, LINK
+
+MAX_OPERATIONS = 200
+OPS = ('add', 'update', 'delete')
+
+# type -> (model, {field: (max length, required)})
+KINDS = {
+    'project': (PortfolioProject, {'title': (255, True), 'description': (None, False),
+                                   'project_link': (500, False), 'tags': (255, False)}),
+    'skill': (StudentSkill, {'skill_name': (100, True), 'category': (100, False)}),
+    'link': (StudentLink, {'title': (100, True), 'url': (500, True)}),
+}
+
+
+def portfolio(student_id):
+    """
+    Projects (newest first), skills and links of one student.
+    """
+    projects = PortfolioProject.query.filter_by(student_id=student_id).order_by(PortfolioProject.created_at.desc()).all()
+    skills = StudentSkill.query.filter_by(student_id=student_id).all()
+    links = StudentLink.query.filter_by(student_id=student_id).all()
+    return {"projects": PROJECT.many(projects), "skills": SKILL.many(skills), "links": LINK.many(links)}
+
+
+def _clean(kind, data, partial):
+    """
+    Validated column values for an add (all required fields) or an update (only
+    the given ones). Raises ValueError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("data must be an object")
+    fields = KINDS[kind][1]
+    unknown = set(data) - set(fields)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    values = {}
+    for name, (max_length, required) in fields.items():
+        if name not in data:
+            if required and not partial:
+                raise ValueError(f"{name} is required")
+            continue
+        value = data[name]
+        if name == 'tags' and isinstance(value, list):
+            value = ','.join(str(t).strip() for t in value if str(t).strip())
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+        if required and not (value or '').strip():
+            raise ValueError(f"{name} is required")
+        if max_length and value and len(value) > max_length:
+            raise ValueError(f"{name} must be at most {max_length} characters")
+        values[name] = value
+    if partial and not values:
+        raise ValueError("Nothing to update")
+    return values
+
+
+def _owners(targets):
+    """
+    {(type, id): student_id} for every referenced row, in one UNION ALL query.
+    """
+    selects = []
+    for kind, ids in targets.items():
+        if ids:
+            model = KINDS[kind][0]
+            selects.append(select(literal(kind).label('kind'), model.id, model.student_id).where(model.id.in_(ids)))
+    if not selects:
+        return {}
+    rows = db.session.execute(union_all(*selects) if len(selects) > 1 else selects[0]).all()
+    return {(kind, row_id): student_id for kind, row_id, student_id in rows}
+
+
+def apply_operations(student, operations):
+    """
+    Validate every operation, then apply them all in one transaction. Returns
+    (ok, results); nothing is written unless every operation is valid.
+    Operation: {"op": "add"|"update"|"delete", "type": "project"|"skill"|"link",
+    "id": <for update/delete>, "data": {...fields} <for add/update>}.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("operations must be a non-empty list")
+    if len(operations) > MAX_OPERATIONS:
+        raise ValueError(f"At most {MAX_OPERATIONS} operations per batch")
+
+    results, planned = [], []
+    targets = {kind: set() for kind in KINDS}
+    for index, operation in enumerate(operations):
+        result = {"index": index}
+        results.append(result)
+        try:
+            if not isinstance(operation, dict):
+                raise ValueError("operation must be an object")
+            op, kind = operation.get('op'), operation.get('type')
+            result.update(op=op, type=kind)
+            if op not in OPS:
+                raise ValueError(f"op must be one of: {', '.join(OPS)}")
+            if kind not in KINDS:
+                raise ValueError(f"type must be one of: {', '.join(KINDS)}")
+            row_id = None
+            if op != 'add':
+                row_id = operation.get('id')
+                if not isinstance(row_id, int) or isinstance(row_id, bool):
+                    raise ValueError("id must be an integer")
+                targets[kind].add(row_id)
+                result['id'] = row_id
+            values = _clean(kind, operation.get('data', {}), partial=op == 'update') if op != 'delete' else None
+            planned.append((result, op, kind, row_id, values))
+        except ValueError as e:
+            result.update(status="error", error=str(e))
+
+    # Ownership of every referenced row in a single query
+    owners = _owners(targets)
+    deleted = set()
+    for result, op, kind, row_id, values in planned:
+        if op == 'add':
+            continue
+        owner = owners.get((kind, row_id))
+        if owner is None or (kind, row_id) in deleted:
+            result.update(status="error", error=f"{kind.capitalize()} not found")
+        elif owner != student.id:
+            result.update(status="error", error="Unauthorized")
+        elif op == 'delete':
+            deleted.add((kind, row_id))
+
+    if any(r.get('status') == 'error' for r in results):
+        for r in results:
+            r.setdefault('status', "not_applied")
+        return False, results
+
+    # Apply: adds through the ORM (ids come back on flush), updates and deletes as
+    # one executemany / IN statement per type
+    added = []
+    updates = {kind: [] for kind in KINDS}
+    deletes = {kind: [] for kind in KINDS}
+    for result, op, kind, row_id, values in planned:
+        if op == 'add':
+            obj = KINDS[kind][0](student_id=student.id, **values)
+            db.session.add(obj)
+            added.append((result, obj))
+        elif op == 'update':
+            updates[kind].append({"id": row_id, **values})
+        else:
+            deletes[kind].append(row_id)
+    try:
+        conn = db.session.connection()
+        # Bulk statements skip the catalog's flush hooks: link tags and skills here
+        link_skills(conn, updates['skill'])
+        drop_project_tags(conn, deletes['project'])
+        for kind, (model, _) in KINDS.items():
+            if updates[kind]:
+                db.session.execute(update(model), updates[kind])
+            if deletes[kind]:
+                db.session.execute(delete(model).where(model.id.in_(deletes[kind])))
+        sync_project_tags(conn, {u['id']: u['tags'] for u in updates['project'] if 'tags' in u})
+        db.session.flush()
+        for result, obj in added:
+            result['id'] = obj.id  # read before COMMIT expires the objects
+        # Bulk statements skip the ORM events that bump the portfolio's ETag version
+        bump_versions(('user', student.user_id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for result in results:
+        result['status'] = "ok"
+    return True, results
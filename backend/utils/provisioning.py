@@ -0,0 +1,280 @@
+# Bulk provisioning of student and teacher accounts from a CSV or JSON batch
+import io
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from flask import current_app, has_app_context, jsonify, request
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import User, Student, Teacher
+from utils.jobs import job_queue
+from utils.passwords import password_hasher
+from utils.rollups import STUDENT_SUM_COLUMNS, add_rollup_delta, student_delta
+from utils.conditional import bump_versions
+
+REQUIRED_COLUMNS = ['email', 'full_name', 'password']
+ROLES = ('student', 'teacher')
+BATCH_ROWS = 1000
+MIN_PASSWORD_LENGTH = 8
+MAX_PASSWORD_BYTES = 72  # bcrypt ignores (bcrypt>=5: rejects) anything longer
+
+
+class ProvisionReport:
+    """
+    One result per input row: {"row", "email", "status": "created" | "failed", "user_id" | "error"}.
+    """
+    def __init__(self):
+        self.rows_total = 0
+        self.rows_created = 0
+        self.rows_failed = 0
+        self.results = {}
+        self.hash_sec = 0.0
+        self.started = time.perf_counter()
+
+    def fail(self, rows, emails, message):
+        for row, email in zip(rows, emails):
+            self.results[int(row)] = {"row": int(row), "email": email, "status": "failed", "error": message}
+        self.rows_failed += len(rows)
+
+    def created(self, rows, emails, user_ids):
+        for row, email, user_id in zip(rows, emails, user_ids):
+            self.results[int(row)] = {"row": int(row), "email": email, "status": "created", "user_id": user_id}
+        self.rows_created += len(rows)
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows_total": self.rows_total,
+            "rows_created": self.rows_created,
+            "rows_failed": self.rows_failed,
+            "results": [self.results[row] for row in sorted(self.results)],
+            "hash_sec": round(self.hash_sec, 3),
+            "elapsed_sec": round(elapsed, 3),
+            "rows_per_sec": round(self.rows_total / elapsed, 1) if elapsed > 0 else None
+        }
+
+
+def _setting(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+def _validate(chunk, seen, report):
+    """
+    Vectorized checks, first failure per row; `seen` carries lower-cased emails
+    across chunks so a repeated address is caught anywhere in the batch.
+    """
+    lowered = chunk['email'].str.lower()
+    checks = [
+        (chunk['email'].isna() | ~chunk['email'].str.contains('@', na=False) | (chunk['email'].str.len() > 255),
+         "email is missing or invalid"),
+        (chunk['full_name'].isna() | (chunk['full_name'] == '') | (chunk['full_name'].str.len() > 255),
+         "full_name is required (max 255 characters)"),
+        (~chunk['role'].isin(ROLES), f"role must be one of: {', '.join(ROLES)}"),
+        (chunk['password'].isna() | (chunk['password'].str.len() < MIN_PASSWORD_LENGTH),
+         f"password must be at least {MIN_PASSWORD_LENGTH} characters"),
+        (chunk['password'].fillna('').str.encode('utf-8').str.len() > MAX_PASSWORD_BYTES,
+         f"password must be at most {MAX_PASSWORD_BYTES} bytes"),
+    ]
+    if 'current_semester' in chunk:
+        checks.append((chunk['current_semester'].notna() & ~chunk['current_semester'].between(1, 12),
+                       "current_semester must be between 1 and 12"))
+    for column in ('course', 'subject'):
+        if column in chunk:
+            checks.append((chunk[column].str.len() > 100, f"{column} must be at most 100 characters"))
+    checks.append((lowered.duplicated() | lowered.isin(seen), "duplicate email in this batch"))
+
+    bad = np.zeros(len(chunk), dtype=bool)
+    for mask, message in checks:
+        mask = mask.to_numpy(dtype=bool, na_value=False) & ~bad
+        if mask.any():
+            report.fail(chunk['_row'][mask], chunk['email'][mask].fillna(''), message)
+            bad |= mask
+    seen.update(lowered[~bad])
+    return chunk[~bad]
+
+
+def _drop_existing(chunk, report):
+    # One set-based lookup per batch instead of a query per row
+    taken = {email for (email,) in db.session.query(User.email).filter(User.email.in_(chunk['email'].tolist()))}
+    exists = chunk['email'].isin(taken)
+    if exists.any():
+        report.fail(chunk['_row'][exists], chunk['email'][exists], "email already exists")
+    return chunk[~exists]
+
+
+def _insert_batch(chunk, hashes, institution_id):
+    """
+    Users first, then their profile rows, in one transaction. Returns user ids.
+    """
+    db.session.execute(User.__table__.insert(), [
+        {"email": email, "password_hash": pw_hash, "role": role, "institution_id": institution_id}
+        for email, pw_hash, role in zip(chunk['email'], hashes, chunk['role'])])
+    ids = dict(db.session.query(User.email, User.id).filter(User.email.in_(chunk['email'].tolist())))
+
+    students, teachers = [], []
+    for row in chunk.itertuples(index=False):
+        if row.role == 'student':
+            semester = getattr(row, 'current_semester', None)
+            students.append({"user_id": ids[row.email], "full_name": row.full_name,
+                             "course": getattr(row, 'course', None) or "B.Tech",
+                             "current_semester": int(semester) if pd.notna(semester) else 1})
+        else:
+            teachers.append({"user_id": ids[row.email], "full_name": row.full_name,
+                             "subject": getattr(row, 'subject', None) or "Not Assigned"})
+    if students:
+        db.session.execute(Student.__table__.insert(), students)
+    if teachers:
+        db.session.execute(Teacher.__table__.insert(), teachers)
+    # Core inserts skip the ORM listeners that keep the KPI rollups current: add
+    # the batch as one delta (new students carry the column defaults)
+    defaults = {c: Student.__table__.c[c].default.arg for c in STUDENT_SUM_COLUMNS}
+    per_student = student_delta(None, defaults)
+    add_rollup_delta(institution_id, user_count=len(chunk), teacher_count=len(teachers),
+                     **{field: value * len(students) for field, value in per_student.items()})
+    bump_versions(('institution', institution_id))
+    db.session.commit()
+    return [ids[email] for email in chunk['email']]
+
+
+def _apply_batch(chunk, institution_id, hash_all, report):
+    chunk = _drop_existing(chunk, report)
+    if chunk.empty:
+        return
+    started = time.perf_counter()
+    rounds = int(_setting('PROVISION_BCRYPT_ROUNDS', 0)) or None
+    hashes = hash_all(chunk['password'].tolist(), rounds)
+    report.hash_sec += time.perf_counter() - started
+
+    for attempt in (1, 2):
+        try:
+            user_ids = _insert_batch(chunk, hashes, institution_id)
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == 2:
+                report.fail(chunk['_row'], chunk['email'], "database error: batch rejected")
+                return
+            # A concurrent signup took one of the addresses: drop it and retry the rest
+            keep = chunk['email'].isin(set(chunk['email']) - {
+                e for (e,) in db.session.query(User.email).filter(User.email.in_(chunk['email'].tolist()))})
+            report.fail(chunk['_row'][~keep], chunk['email'][~keep], "email already exists")
+            chunk, hashes = chunk[keep], [h for h, k in zip(hashes, keep) if k]
+            if chunk.empty:
+                return
+            continue
+        report.created(chunk['_row'], chunk['email'], user_ids)
+        return
+
+
+def _chunks(fileobj, fmt, batch_rows):
+    """
+    DataFrames of up to batch_rows rows (all columns as strings) with a 1-based
+    '_row': the CSV line number (header = 1) or the JSON array index + 1.
+    """
+    if fmt == 'csv':
+        try:
+            reader = pd.read_csv(fileobj, chunksize=batch_rows, dtype=str, skipinitialspace=True, keep_default_na=False)
+            offset = 1
+            for chunk in reader:
+                chunk.columns = [c.strip().lower() for c in chunk.columns]
+                yield chunk.assign(_row=np.arange(offset + 1, offset + 1 + len(chunk)))
+                offset += len(chunk)
+        except pd.errors.EmptyDataError:
+            raise ValueError("The uploaded file is empty")
+        except pd.errors.ParserError as e:
+            raise ValueError(f"Could not parse CSV: {e}")
+        return
+
+    try:
+        data = json.load(fileobj)
+    except ValueError as e:
+        raise ValueError(f"Could not parse JSON: {e}")
+    rows = data.get('users') if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        raise ValueError("Expected a JSON list of user objects (or {\"users\": [...]})")
+    for offset in range(0, len(rows), batch_rows):
+        chunk = pd.DataFrame(rows[offset:offset + batch_rows], dtype=object)
+        chunk.columns = [str(c).strip().lower() for c in chunk.columns]
+        # Same shape as the CSV path: every present value as a string
+        chunk = chunk.map(lambda v: None if v is None or v != v else str(v))
+        yield chunk.assign(_row=np.arange(offset + 1, offset + 1 + len(chunk)))
+
+
+def provision_users(fileobj, institution_id, fmt='csv', default_role=None, progress=None):
+    """
+    Create accounts from a batch. Columns: email, full_name, password, role
+    (student|teacher; may come from default_role), optional course and
+    current_semester (students) or subject (teachers). Returns the report dict;
+    raises ValueError when the batch itself is unusable.
+    """
+    report = ProvisionReport()
+    seen = set()
+    batch_rows = int(_setting('PROVISION_BATCH_ROWS', BATCH_ROWS))
+    workers = int(_setting('PROVISION_HASH_WORKERS', 0)) or None
+    with password_hasher.batch(workers) as hash_all:
+        for chunk in _chunks(fileobj, fmt, batch_rows):
+            missing = [c for c in REQUIRED_COLUMNS if c not in chunk]
+            if missing:
+                raise ValueError(f"Missing required columns: {', '.join(missing)}")
+            for column in chunk.columns.drop('_row'):
+                chunk[column] = chunk[column].map(lambda v: v.strip() if isinstance(v, str) else v)
+            role = chunk['role'].fillna('').str.lower() if 'role' in chunk else pd.Series('', index=chunk.index)
+            chunk['role'] = role.mask(role == '', default_role or '')
+            if 'current_semester' in chunk:
+                chunk['current_semester'] = pd.to_numeric(chunk['current_semester'], errors='coerce')
+
+            report.rows_total += len(chunk)
+            valid = _validate(chunk, seen, report)
+            if not valid.empty:
+                _apply_batch(valid, institution_id, hash_all, report)
+            if progress:
+                progress(rows_total=report.rows_total, rows_created=report.rows_created,
+                         rows_failed=report.rows_failed)
+    return report.to_dict()
+
+
+@job_queue.handler('provision_users')
+def provision_users_job(ctx, path, institution_id, fmt='csv', default_role=None):
+    """
+    Background variant: the batch was spooled to `path` by the request (the queue removes it).
+    """
+    with open(path, 'rb') as fileobj:
+        return provision_users(fileobj, institution_id, fmt, default_role, progress=ctx.report_progress)
+
+
+def provision_from_request(institution_id, user_id):
+    """
+    Shared by the institution and admin endpoints: takes a multipart CSV `file`
+    or a JSON body, ?role= as the default role. Queues a job and returns 202;
+    ?sync=1 provisions inline and returns the report.
+    """
+    default_role = request.args.get('role')
+    if default_role and default_role not in ROLES:
+        return jsonify(msg=f"role must be one of: {', '.join(ROLES)}"), 400
+    if 'file' in request.files:
+        file = request.files['file']
+        if not file.filename.endswith('.csv'):
+            return jsonify(msg="Invalid file type. Please upload a CSV."), 400
+        fmt, stream = 'csv', file.stream
+    elif request.is_json:
+        fmt, stream = 'json', io.BytesIO(request.get_data())
+    else:
+        return jsonify(msg="Send a CSV file or a JSON body"), 400
+
+    if request.args.get('sync') != '1':
+        # The batch holds plaintext passwords: job_queue.spool keeps it owner-only and deletes it
+        path = job_queue.spool(stream, f".{fmt}")
+        job = job_queue.submit('provision_users', {'path': path, 'institution_id': institution_id, 'fmt': fmt,
+                                                   'default_role': default_role},
+                               institution_id=institution_id, user_id=user_id)
+        return jsonify(msg="Batch accepted for processing", job_id=job['id'],
+                       status_url=f"/api/jobs/{job['id']}"), 202
+
+    try:
+        report = provision_users(stream, institution_id, fmt, default_role)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    msg = f"Processed {report['rows_total']} rows: {report['rows_created']} created, {report['rows_failed']} failed."
+    return jsonify(msg=msg, report=report), 200
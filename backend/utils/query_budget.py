@@ -0,0 +1,86 @@
+# Query counting and per-route query budgets
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+        self.parameters = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_local, 'counters', ()):
+        counter.statements.append(statement)
+        counter.parameters.append(parameters)
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the SQL statements executed on this thread inside the block.
+
+        with count_queries() as counter:
+            client.get('/api/student/dashboard', headers=headers)
+        assert counter.count <= 3
+    """
+    counter = QueryCounter()
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+
+
+def query_budget(max_queries):
+    """
+    Pin the number of queries a route may run (authorization included).
+
+    QUERY_BUDGET_MODE controls enforcement: 'off' (default), 'warn' logs overruns,
+    'raise' raises QueryBudgetExceeded so test runs fail on a regression.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            mode = current_app.config.get('QUERY_BUDGET_MODE', 'off')
+            if mode == 'off':
+                return fn(*args, **kwargs)
+            with count_queries() as counter:
+                response = fn(*args, **kwargs)
+            if counter.count > max_queries + g.pop('_query_budget_extra', 0):
+                msg = f"{fn.__name__} ran {counter.count} queries (budget {max_queries}):\n" + \
+                      "\n".join(counter.statements)
+                if mode == 'raise':
+                    raise QueryBudgetExceeded(msg)
+                current_app.logger.warning(msg)
+            return response
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+def allow_extra_queries(n):
+    """
+    Let the current request run n queries over its route budget, for known slow
+    paths such as a live KPI recomputation.
+    """
+    g._query_budget_extra = g.get('_query_budget_extra', 0) + n
@@ -0,0 +1,222 @@
+# Token-bucket rate limiting per blueprint, keyed per client IP and per login email
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+from utils.log import logger
+
+
+class Limit:
+    """
+    A bucket of `capacity` tokens that refills completely over `period` seconds.
+    """
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / float(period)
+
+    def __repr__(self):
+        return f"{int(self.capacity)}/{round(self.capacity / self.rate)}"
+
+
+def parse_limits(spec):
+    """
+    'auth_bp.ip=30/60;auth_bp.email=5/300' -> {'auth_bp': {'ip': Limit, 'email': Limit}}
+    """
+    rules = {}
+    for part in filter(None, (p.strip() for p in (spec or '').split(';'))):
+        try:
+            name, value = part.split('=')
+            blueprint, kind = name.strip().split('.')
+            capacity, period = value.split('/')
+            rules.setdefault(blueprint, {})[kind] = Limit(int(capacity), float(period))
+        except ValueError:
+            raise ValueError(f"Bad RATE_LIMITS entry {part!r}, expected <blueprint>.<key>=<requests>/<seconds>")
+    return rules
+
+
+def _refill(tokens, updated, limit, now):
+    return min(limit.capacity, tokens + (now - updated) * limit.rate)
+
+
+def _decide(tokens, limit, cost, consume):
+    """
+    (tokens left, retry-after seconds); retry-after 0 means the request may proceed.
+    """
+    if tokens >= cost:
+        return (tokens - cost if consume else tokens), 0.0
+    return tokens, (cost - tokens) / limit.rate
+
+
+class MemoryBucketStore:
+    """
+    In-process buckets, least recently used dropped beyond `max_keys` (an evicted
+    bucket simply starts full again).
+    """
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, limit, cost=1, consume=True):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.capacity, now))
+            tokens, retry_after = _decide(_refill(tokens, updated, limit, now), limit, cost, consume)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def size(self):
+        return len(self._buckets)
+
+
+class RedisBucketStore:
+    """
+    Buckets shared by every worker: a hash (tokens, updated) per key, updated in an
+    optimistic WATCH/MULTI transaction and expiring once it would be full again.
+    """
+    def __init__(self, client, prefix='edusamagra:rl:'):
+        self.client = client
+        self.prefix = prefix
+
+    def take(self, key, limit, cost=1, consume=True):
+        key = self.prefix + key
+        result = {}
+
+        def update(pipe):
+            now = time.time()
+            state = pipe.hmget(key, 'tokens', 'updated')
+            tokens = float(state[0]) if state[0] is not None else limit.capacity
+            updated = float(state[1]) if state[1] is not None else now
+            tokens, result['retry_after'] = _decide(_refill(tokens, updated, limit, now), limit, cost, consume)
+            pipe.multi()
+            pipe.hset(key, mapping={'tokens': tokens, 'updated': now})
+            pipe.expire(key, max(1, math.ceil((limit.capacity - tokens) / limit.rate)))
+
+        self.client.transaction(update, key)
+        return result['retry_after']
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*'))
+
+
+class RateLimiter:
+    """
+    Rules are per blueprint: the 'ip' rule is charged for every request to the
+    blueprint (before the view runs); other rules (e.g. 'email') are checked and
+    charged by the view itself. Views marked with @guards('<work>') count every
+    rejection as one unit of that work avoided.
+    """
+    def __init__(self, store=None):
+        self.store = store or MemoryBucketStore()
+        self.rules = {}
+        self.enabled = True
+        self.allowed = Counter()
+        self.rejected = Counter()
+        self.avoided = Counter()
+
+    def configure(self, store, rules, enabled=True):
+        self.store = store
+        self.rules = rules
+        self.enabled = enabled
+        self.reset_stats()
+
+    def _take(self, blueprint, kind, key, consume):
+        limit = self.rules.get(blueprint, {}).get(kind)
+        if not self.enabled or limit is None or not key:
+            return 0.0
+        try:
+            retry_after = self.store.take(f"{blueprint}:{kind}:{key}", limit, consume=consume)
+        except Exception:
+            # Fail open: a store outage must not lock everyone out
+            logger.warning("Rate limit store unavailable", exc_info=True)
+            return 0.0
+        if consume or retry_after:
+            (self.rejected if retry_after else self.allowed)[f"{blueprint}.{kind}"] += 1
+        return retry_after
+
+    def hit(self, blueprint, kind, key):
+        """
+        Spend a token; returns seconds until one is available (0 = allowed).
+        """
+        return self._take(blueprint, kind, key, consume=True)
+
+    def check(self, blueprint, kind, key):
+        """
+        Like hit() but without spending: is the bucket already empty?
+        """
+        return self._take(blueprint, kind, key, consume=False)
+
+    def reject(self, retry_after, msg="Too many requests, please retry later"):
+        view = current_app.view_functions.get(request.endpoint)
+        work = getattr(view, 'rate_limit_guards', None)
+        if work:
+            self.avoided[work] += 1
+        return jsonify(msg=msg), 429, {'Retry-After': str(max(1, math.ceil(retry_after)))}
+
+    def reset_stats(self):
+        self.allowed.clear()
+        self.rejected.clear()
+        self.avoided.clear()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "store": type(self.store).__name__,
+            "buckets": self.store.size(),
+            "rules": {bp: {kind: repr(limit) for kind, limit in kinds.items()} for bp, kinds in self.rules.items()},
+            "allowed": dict(self.allowed),
+            "rejected": dict(self.rejected),
+            "avoided": dict(self.avoided)
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+def guards(work):
+    """
+    Mark a view whose rejected requests skip `work` (e.g. 'hash_checks').
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            return fn(*args, **kwargs)
+        wrapper.rate_limit_guards = work
+        return wrapper
+    return decorator
+
+
+def create_store(config):
+    """
+    RATE_LIMIT_BACKEND: 'memory' (default, per process), 'redis' or 'fakeredis'.
+    """
+    name = config.get('RATE_LIMIT_BACKEND', 'memory')
+    if name == 'redis':
+        import redis
+        return RedisBucketStore(redis.Redis.from_url(config['RATE_LIMIT_REDIS_URL']))
+    if name == 'fakeredis':
+        import fakeredis
+        return RedisBucketStore(fakeredis.FakeRedis())
+    return MemoryBucketStore(max_keys=int(config.get('RATE_LIMIT_MAX_KEYS', 100000)))
+
+
+def init_rate_limiting(app):
+    rate_limiter.configure(
+        create_store(app.config),
+        parse_limits(app.config.get('RATE_LIMITS', '')),
+        enabled=bool(app.config.get('RATE_LIMIT_ENABLED', True))
+    )
+
+    @app.before_request
+    def _limit_by_ip():
+        if request.blueprint and request.method != 'OPTIONS':
+            retry_after = rate_limiter.hit(request.blueprint, 'ip', request.remote_addr)
+            if retry_after:
+                return rate_limiter.reject(retry_after)
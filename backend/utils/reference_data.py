@@ -0,0 +1,131 @@
+# Cached global reference data: schemes, latest events, institution profiles
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from database import db
+from models import Scheme, Event, Institution
+from utils.cache import ReadThroughCache, create_backend
+from utils.serializers import SCHEME, EVENT, INSTITUTION
+
+reference_cache = ReadThroughCache()
+
+SCHEMES_KEY = 'schemes:active'
+
+
+def events_key(institution_id):
+    return f"events:latest:{institution_id}"
+
+
+def institution_key(institution_id):
+    return f"institution:{institution_id}"
+
+
+def init_reference_cache(app):
+    reference_cache.configure(create_backend(app.config), float(app.config.get('CACHE_DEFAULT_TTL', 300)))
+
+
+# --- Read-through accessors ---
+
+def active_schemes():
+    def load():
+        schemes = Scheme.query.filter_by(status='active').all()
+        return SCHEME.many(schemes)
+    return reference_cache.get_or_load(SCHEMES_KEY, load)
+
+
+def latest_events(institution_id):
+    """
+    The institution's five most recent events, shared by all of its students.
+    """
+    if institution_id is None:
+        return []
+
+    def load():
+        events = Event.query.filter_by(institution_id=institution_id).order_by(Event.event_date.desc()).limit(5).all()
+        return EVENT.many(events)
+    return reference_cache.get_or_load(events_key(institution_id), load)
+
+
+def cached_latest_events(institution_id):
+    """
+    Cached events or None, for callers that fold the miss into a query of their own.
+    """
+    return reference_cache.peek(events_key(institution_id))
+
+
+def store_latest_events(institution_id, event_list):
+    reference_cache.set(events_key(institution_id), event_list)
+
+
+def institution_profile(institution_id):
+    """
+    Profile dict of one institution, or None if it does not exist (not cached).
+    """
+    key = institution_key(institution_id)
+    profile = reference_cache.peek(key)
+    if profile is None:
+        institution = db.session.get(Institution, institution_id)
+        if institution is None:
+            return None
+        profile = INSTITUTION.one(institution)
+        reference_cache.set(key, profile)
+    return profile
+
+
+# --- Invalidation hooks ---
+
+def invalidate_schemes():
+    reference_cache.invalidate(SCHEMES_KEY)
+
+
+def invalidate_events(institution_id):
+    reference_cache.invalidate(events_key(institution_id))
+
+
+def invalidate_institution(institution_id):
+    """
+    Drop an institution's profile and its events (events cascade in the DB on delete).
+    """
+    reference_cache.invalidate(institution_key(institution_id), events_key(institution_id))
+
+
+def _queue_invalidation(target, key):
+    # Invalidate after COMMIT, so a concurrent reader cannot re-cache the old rows
+    session = object_session(target)
+    if session is None:
+        reference_cache.invalidate(key)
+    else:
+        session.info.setdefault('reference_cache_keys', set()).add(key)
+
+
+@event.listens_for(Scheme, 'after_insert')
+@event.listens_for(Scheme, 'after_update')
+@event.listens_for(Scheme, 'after_delete')
+def _scheme_changed(mapper, connection, target):
+    _queue_invalidation(target, SCHEMES_KEY)
+
+
+@event.listens_for(Event, 'after_insert')
+@event.listens_for(Event, 'after_update')
+@event.listens_for(Event, 'after_delete')
+def _event_changed(mapper, connection, target):
+    _queue_invalidation(target, events_key(target.institution_id))
+
+
+@event.listens_for(Institution, 'after_update')
+@event.listens_for(Institution, 'after_delete')
+def _institution_changed(mapper, connection, target):
+    _queue_invalidation(target, institution_key(target.id))
+    _queue_invalidation(target, events_key(target.id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _flush_invalidations(session):
+    keys = session.info.pop('reference_cache_keys', None)
+    if keys:
+        reference_cache.invalidate(*keys)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('reference_cache_keys', None)
@@ -0,0 +1,151 @@
+# Token revocation list for stateless (claims-based) authorization
+import math
+import sqlite3
+import threading
+import time
+
+
+class MemoryRevocationBackend:
+    """
+    Process-local backend; every revocation is an entry in an append-only log.
+    """
+    def __init__(self):
+        self._log = []
+        self._lock = threading.Lock()
+
+    def append(self, kind, key, value):
+        with self._lock:
+            self._log.append((kind, key, value))
+            return len(self._log)
+
+    def changes_since(self, seq):
+        with self._lock:
+            return [(i + 1, *row) for i, row in enumerate(self._log[seq:], start=seq)]
+
+    def purge(self, before):
+        # Entries are tiny; the in-process log is only trimmed on restart.
+        pass
+
+
+class SQLiteRevocationBackend:
+    """
+    Shared backend for several worker processes on one host (a stand-in for Redis).
+    """
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revocations ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " kind TEXT NOT NULL, key TEXT NOT NULL, value REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def append(self, kind, key, value):
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO revocations (kind, key, value) VALUES (?, ?, ?)", (kind, key, value)
+            )
+            return cur.lastrowid
+
+    def changes_since(self, seq):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT seq, kind, key, value FROM revocations WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+
+    def purge(self, before):
+        # Only expired jti entries can go; "tokens issued before" entries stay authoritative.
+        with self._connect() as conn:
+            conn.execute("DELETE FROM revocations WHERE kind = 'jti' AND value < ?", (before,))
+
+
+class RevocationList:
+    """
+    Compact in-process view of revoked tokens, refreshed from the backend at most
+    every `sync_interval` seconds so checks on the hot path never leave the process.
+    """
+    def __init__(self, backend=None, sync_interval=1.0):
+        self.backend = backend or MemoryRevocationBackend()
+        self.sync_interval = sync_interval
+        self._jtis = {}            # jti -> token expiry (epoch seconds)
+        self._not_before = {}      # user id -> tokens issued before this are revoked
+        self._seq = 0
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, backend, sync_interval=None):
+        with self._lock:
+            self.backend = backend
+            if sync_interval is not None:
+                self.sync_interval = sync_interval
+            self._jtis.clear()
+            self._not_before.clear()
+            self._seq = 0
+            self._last_sync = 0.0
+
+    # --- Writes ---
+
+    def revoke_token(self, jti, expires_at):
+        self.backend.append('jti', jti, float(expires_at))
+        self.sync(force=True)
+
+    def revoke_user_tokens(self, user_id, issued_before=None):
+        """
+        Revoke every token of a user issued before `issued_before` (default: now).
+        Kept in whole seconds like the token's iat, so a token issued later in the
+        same second (a new login right after a role change) stays valid.
+        """
+        self.backend.append('user', str(user_id), math.floor(issued_before or time.time()))
+        self.sync(force=True)
+
+    # --- Reads ---
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        with self._lock:
+            for seq, kind, key, value in self.backend.changes_since(self._seq):
+                if kind == 'jti':
+                    self._jtis[key] = value
+                else:
+                    self._not_before[key] = max(value, self._not_before.get(key, 0))
+                self._seq = seq
+            self._last_sync = now
+            self._drop_expired()
+
+    def _drop_expired(self):
+        now = time.time()
+        for jti in [j for j, exp in self._jtis.items() if exp < now]:
+            del self._jtis[jti]
+
+    def is_revoked(self, jwt_payload):
+        self.sync()
+        if jwt_payload.get('jti') in self._jtis:
+            return True
+        not_before = self._not_before.get(str(jwt_payload.get('sub')))
+        # floor: entries written before not_before was whole seconds
+        return not_before is not None and jwt_payload.get('iat', 0) < math.floor(not_before)
+
+
+revocation_list = RevocationList()
+
+
+def init_revocation(app, jwt):
+    """
+    Pick the backend from REVOCATION_BACKEND ('memory' or 'sqlite') and register the
+    blocklist check with Flask-JWT-Extended.
+    """
+    if app.config.get('REVOCATION_BACKEND', 'memory') == 'sqlite':
+        backend = SQLiteRevocationBackend(app.config.get('REVOCATION_SQLITE_PATH', 'revocations.sqlite3'))
+        backend.purge(time.time())
+    else:
+        backend = MemoryRevocationBackend()
+    revocation_list.configure(backend, float(app.config.get('REVOCATION_SYNC_INTERVAL', 1.0)))
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(_jwt_header, jwt_payload):
+        return revocation_list.is_revoked(jwt_payload)
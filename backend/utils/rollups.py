@@ -0,0 +1,448 @@
+# Precomputed per-institution and per-state KPI rollups
+import threading
+import time
+from decimal import Decimal
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert, delete, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.sql import func
+
+from database import db
+from models import User, Student, Teacher, Institution, InstitutionRollup, StateRollup, RollupDirty
+from utils.jobs import job_queue
+from utils.query_budget import allow_extra_queries
+from utils.conditional import bump_versions, ALL
+
+SUM_FIELDS = ['user_count', 'student_count', 'teacher_count',
+              'gpa_sum', 'gpa_count', 'attendance_sum', 'attendance_count']
+STUDENT_SUMS = ['student_count', 'gpa_sum', 'gpa_count', 'attendance_sum', 'attendance_count']
+CENTS = Decimal('0.01')
+
+
+def _zeros():
+    return dict.fromkeys(SUM_FIELDS, 0)
+
+
+# --- Aggregation over the base tables ---
+
+def _aggregates(session, group_col, *filters):
+    """
+    {key: sums} over users/students/teachers grouped by group_col
+    (User.institution_id or Institution.state). Three grouped queries.
+    """
+    totals = {}
+
+    def grouped(*columns):
+        return session.query(group_col, *columns).select_from(User) \
+            .join(Institution, Institution.id == User.institution_id) \
+            .filter(*filters).group_by(group_col)
+
+    for key, users in grouped(func.count(User.id)):
+        totals.setdefault(key, _zeros())['user_count'] = users
+    students = grouped(
+        func.count(Student.id), func.sum(Student.overall_gpa), func.count(Student.overall_gpa),
+        func.sum(Student.attendance_percentage), func.count(Student.attendance_percentage)
+    ).join(Student, Student.user_id == User.id)
+    for key, *values in students:
+        totals.setdefault(key, _zeros()).update(zip(STUDENT_SUMS, (v or 0 for v in values)))
+    for key, teachers in grouped(func.count(Teacher.id)).join(Teacher, Teacher.user_id == User.id):
+        totals.setdefault(key, _zeros())['teacher_count'] = teachers
+    return totals
+
+
+def _summary(sums):
+    gpa_count, attendance_count = sums['gpa_count'], sums['attendance_count']
+    return {
+        "total_users": int(sums['user_count']),
+        "total_students": int(sums['student_count']),
+        "total_teachers": int(sums['teacher_count']),
+        "avg_gpa": round(float(sums['gpa_sum']) / gpa_count, 2) if gpa_count else 0.0,
+        "avg_attendance": round(float(sums['attendance_sum']) / attendance_count, 2) if attendance_count else 0.0
+    }
+
+
+def _sums(row):
+    return {f: getattr(row, f) for f in SUM_FIELDS}
+
+
+# --- Refresh ---
+
+def _insert_ignore(model):
+    return insert(model.__table__).prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite')
+
+
+def _write(session, model, key, rows):
+    # INSERT IGNORE the keys first, then UPDATE: two transactions refreshing the
+    # same institution never collide on the primary key
+    if not rows:
+        return
+    session.execute(_insert_ignore(model), [{key: k} for k in rows])
+    session.bulk_update_mappings(model, [{key: k, **values} for k, values in rows.items()])
+
+
+def refresh_institutions(session, institution_ids=None):
+    """
+    Recompute institution rollups (all of them when institution_ids is None) and
+    drop rows of deleted institutions. Returns the states the institutions are in.
+    """
+    institutions = session.query(Institution.id, Institution.state)
+    filters = ()
+    if institution_ids is not None:
+        institution_ids = list(institution_ids)
+        institutions = institutions.filter(Institution.id.in_(institution_ids))
+        filters = (User.institution_id.in_(institution_ids),)
+    states = dict(institutions)
+    totals = _aggregates(session, User.institution_id, *filters)
+    _write(session, InstitutionRollup, 'institution_id', {i: totals.get(i, _zeros()) for i in states})
+
+    if institution_ids is None:
+        session.execute(delete(InstitutionRollup).where(InstitutionRollup.institution_id.not_in(select(Institution.id))))
+    else:
+        gone = set(institution_ids) - set(states)
+        if gone:
+            session.execute(delete(InstitutionRollup).where(InstitutionRollup.institution_id.in_(gone)))
+    return set(states.values())
+
+
+def refresh_states(session, states=None):
+    """
+    Recompute state rollups from the institution rollups (all states when states is None).
+    """
+    query = session.query(
+        Institution.state, func.count(Institution.id),
+        *(func.coalesce(func.sum(getattr(InstitutionRollup, f)), 0) for f in SUM_FIELDS)
+    ).outerjoin(InstitutionRollup, InstitutionRollup.institution_id == Institution.id).group_by(Institution.state)
+    if states is not None:
+        states = set(states)
+        query = query.filter(Institution.state.in_(states))
+    rows = {state: {"institution_count": n, **dict(zip(SUM_FIELDS, sums))} for state, n, *sums in query}
+    _write(session, StateRollup, 'state', rows)
+
+    if states is None:
+        session.execute(delete(StateRollup).where(StateRollup.state.not_in(list(rows) or [''])))
+    elif states - set(rows):
+        session.execute(delete(StateRollup).where(StateRollup.state.in_(states - set(rows))))
+    return len(rows)
+
+
+def refresh_rollups(full=False):
+    """
+    Refresh job body: recompute institutions in the dirty set (or every institution)
+    and the states they belong to. Returns what was refreshed.
+    """
+    started = time.perf_counter()
+    session = db.session
+    if full:
+        session.execute(delete(RollupDirty))
+        refresh_institutions(session)
+        states = refresh_states(session)
+        institutions = session.query(func.count(InstitutionRollup.institution_id)).scalar()
+        bump_versions(ALL, session=session)
+    else:
+        dirty = [i for (i,) in session.query(RollupDirty.institution_id)]
+        states = 0
+        if dirty:
+            session.execute(delete(RollupDirty).where(RollupDirty.institution_id.in_(dirty)))
+            states = refresh_states(session, refresh_institutions(session, dirty))
+            bump_versions(*(('institution', i) for i in dirty), session=session)
+        institutions = len(dirty)
+    session.commit()
+    return {
+        "mode": "full" if full else "incremental",
+        "institutions": institutions,
+        "states": states,
+        "elapsed_sec": round(time.perf_counter() - started, 3)
+    }
+
+
+@job_queue.handler('refresh_rollups')
+def refresh_rollups_job(ctx, full=False):
+    return refresh_rollups(full=full)
+
+
+# --- Change tracking (applied at COMMIT, or deferred to the job) ---
+#
+# Inserts and updates of users, students and teachers become per-institution deltas
+# that COMMIT adds to the rollup rows (UPDATE ... SET x = x + :d), so a write costs
+# the same whatever the institution's size. Deletes, users changing institution and
+# institutions changing state recompute the institutions involved instead.
+
+# Student columns summed in the rollups -> field prefix
+STUDENT_SUM_COLUMNS = {'overall_gpa': 'gpa', 'attendance_percentage': 'attendance'}
+
+
+def _pending(session):
+    return session.info.setdefault('rollup_pending', {'institutions': set(), 'users': set(), 'states': set(),
+                                                      'deltas': {}})
+
+
+def _merge(sums, deltas):
+    for field, value in deltas.items():
+        if value:
+            sums[field] = sums.get(field, 0) + value
+    return sums
+
+
+def _value_sums(prefix, value, sign):
+    if value is None:
+        return {}
+    return {f"{prefix}_sum": sign * Decimal(str(value)).quantize(CENTS), f"{prefix}_count": sign}
+
+
+def student_delta(old, new):
+    """
+    Rollup amounts for one student row going from old to new ({column: value}; a
+    column missing from new is unchanged). old=None for a new student.
+    """
+    sums = {'student_count': 1} if old is None else {}
+    for column, prefix in STUDENT_SUM_COLUMNS.items():
+        if column in new:
+            _merge(sums, _value_sums(prefix, new[column], 1))
+            if old is not None:
+                _merge(sums, _value_sums(prefix, old.get(column), -1))
+    return sums
+
+
+def add_rollup_delta(institution_id, session=None, **deltas):
+    """
+    For bulk writes that bypass ORM events: add these amounts (user_count=,
+    student_count=, gpa_sum=, ...) to the institution's rollup and its state's at commit.
+    """
+    if institution_id is not None:
+        _merge(_pending(session or db.session())['deltas'].setdefault(('institution', institution_id), {}), deltas)
+
+
+def mark_institution_dirty(institution_id, session=None):
+    """
+    For bulk writes whose effect cannot be expressed as a delta: recompute this
+    institution's rollup at commit.
+    """
+    if institution_id is not None:
+        _pending(session or db.session())['institutions'].add(institution_id)
+
+
+def _member_key(session, user_id):
+    # The user is usually in the session already (signup adds both); otherwise COMMIT looks it up
+    user = session.identity_map.get(identity_key(User, user_id))
+    if user is not None and 'institution_id' in user.__dict__:
+        return ('institution', user.institution_id)
+    return ('user', user_id)
+
+
+def _add_member_delta(target, deltas):
+    session = db.inspect(target).session
+    _merge(_pending(session)['deltas'].setdefault(_member_key(session, target.user_id), {}), deltas)
+
+
+@event.listens_for(User, 'after_insert')
+def _user_added(mapper, connection, target):
+    add_rollup_delta(target.institution_id, db.inspect(target).session, user_count=1)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_removed(mapper, connection, target):
+    mark_institution_dirty(target.institution_id, db.inspect(target).session)
+
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    history = db.inspect(target).attrs.institution_id.history
+    if history.has_changes():
+        for institution_id in (history.added or ()) + (history.deleted or ()):
+            mark_institution_dirty(institution_id, db.inspect(target).session)
+
+
+@event.listens_for(Student, 'after_insert')
+def _student_added(mapper, connection, target):
+    _add_member_delta(target, student_delta(None, {c: getattr(target, c) for c in STUDENT_SUM_COLUMNS}))
+
+
+@event.listens_for(Teacher, 'after_insert')
+def _teacher_added(mapper, connection, target):
+    _add_member_delta(target, {'teacher_count': 1})
+
+
+@event.listens_for(Student, 'after_delete')
+@event.listens_for(Teacher, 'after_delete')
+def _member_removed(mapper, connection, target):
+    _pending(db.inspect(target).session)['users'].add(target.user_id)
+
+
+@event.listens_for(Student, 'after_update')
+def _student_updated(mapper, connection, target):
+    state = db.inspect(target)
+    old, new = {}, {}
+    for column in STUDENT_SUM_COLUMNS:
+        history = state.attrs[column].history
+        if not history.has_changes():
+            continue
+        if not history.deleted:
+            # Previous value unknown: recompute the institution instead
+            _pending(state.session)['users'].add(target.user_id)
+            return
+        old[column], new[column] = history.deleted[0], history.added[0] if history.added else None
+    if new:
+        _add_member_delta(target, student_delta(old, new))
+
+
+@event.listens_for(Institution, 'after_insert')
+@event.listens_for(Institution, 'after_delete')
+def _institution_added_or_removed(mapper, connection, target):
+    pending = _pending(db.inspect(target).session)
+    pending['institutions'].add(target.id)
+    pending['states'].add(target.state)
+
+
+@event.listens_for(Institution, 'after_update')
+def _institution_updated(mapper, connection, target):
+    history = db.inspect(target).attrs.state.history
+    if history.has_changes():
+        pending = _pending(db.inspect(target).session)
+        pending['institutions'].add(target.id)
+        pending['states'].update(s for s in (history.added or ()) + (history.deleted or ()) if s)
+
+
+def _refresh_mode():
+    return current_app.config.get('ROLLUP_REFRESH', 'commit') if has_app_context() else 'commit'
+
+
+def _add_to(session, table, key_column, key, sums):
+    """
+    UPDATE ... SET field = field + delta for one rollup row; False if the row does not exist yet.
+    """
+    return session.execute(update(table).where(key_column == key).values(
+        {field: table.c[field] + value for field, value in sums.items()})).rowcount > 0
+
+
+def _apply_deltas(session, deltas):
+    """
+    Add {institution_id: sums} to the institution rollups and their states' rows,
+    in key order so concurrent writers lock rows in the same order. Returns the
+    institutions and states whose rollup row is missing (to be recomputed).
+    """
+    states = dict(session.query(Institution.id, Institution.state).filter(Institution.id.in_(list(deltas))))
+    missing, missing_states, by_state = set(), set(), {}
+    institutions = InstitutionRollup.__table__
+    for institution_id in sorted(set(deltas) & set(states)):
+        if _add_to(session, institutions, institutions.c.institution_id, institution_id, deltas[institution_id]):
+            _merge(by_state.setdefault(states[institution_id], {}), deltas[institution_id])
+        else:
+            missing.add(institution_id)
+    rollups = StateRollup.__table__
+    for state in sorted(by_state):
+        if not _add_to(session, rollups, rollups.c.state, state, by_state[state]):
+            missing_states.add(state)
+    return missing, missing_states
+
+
+@event.listens_for(Session, 'before_commit')
+def _refresh_pending(session):
+    # COMMIT runs this hook before its final flush, so flush first to see every change
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.pop('rollup_pending', None)
+    if pending is None:
+        return
+    user_ids = pending['users'] | {key for kind, key in pending['deltas'] if kind == 'user'}
+    user_institutions = dict(session.query(User.id, User.institution_id).filter(
+        User.id.in_(user_ids), User.institution_id.isnot(None))) if user_ids else {}
+    recompute = set(pending['institutions'])
+    recompute.update(user_institutions[u] for u in pending['users'] if u in user_institutions)
+    deltas = {}
+    for (kind, key), sums in pending['deltas'].items():
+        institution_id = key if kind == 'institution' else user_institutions.get(key)
+        if institution_id is not None:
+            _merge(deltas.setdefault(institution_id, {}), sums)
+    deltas = {i: sums for i, sums in deltas.items() if sums and i not in recompute}
+    if not recompute and not deltas and not pending['states']:
+        return
+
+    if _refresh_mode() == 'deferred':
+        if recompute or deltas:
+            session.execute(_insert_ignore(RollupDirty), [{"institution_id": i} for i in recompute | set(deltas)])
+        return
+    missing, states = _apply_deltas(session, deltas) if deltas else (set(), set())
+    recompute |= missing
+    if recompute:
+        states |= refresh_institutions(session, recompute)
+    states |= pending['states']
+    if states:
+        refresh_states(session, states)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('rollup_pending', None)
+
+
+# --- Reads for the overview endpoints ---
+
+def institution_kpis(institution_id, live=False):
+    """
+    One institution's KPIs from its rollup row (one query). live=True, or a missing
+    row, aggregates the base tables instead.
+    """
+    if not live:
+        row = db.session.get(InstitutionRollup, institution_id)
+        if row is not None:
+            return {**_summary(_sums(row)), "source": "rollup", "refreshed_at": row.refreshed_at}
+    allow_extra_queries(3)
+    sums = _aggregates(db.session, User.institution_id, User.institution_id == institution_id)
+    return {**_summary(sums.get(institution_id, _zeros())), "source": "live", "refreshed_at": None}
+
+
+def nationwide_kpis(live=False):
+    """
+    Nationwide totals plus one entry per state. Reads the state rollups (two queries);
+    live=True, or no rollups yet, aggregates the base tables instead.
+    """
+    rows = [] if live else StateRollup.query.order_by(StateRollup.state).all()
+    if rows:
+        states = {r.state: {"institution_count": r.institution_count, **_sums(r)} for r in rows}
+        source, refreshed_at = "rollup", min((r.refreshed_at for r in rows if r.refreshed_at), default=None)
+    else:
+        allow_extra_queries(4)
+        states = _aggregates(db.session, Institution.state)
+        for state, n in db.session.query(Institution.state, func.count(Institution.id)).group_by(Institution.state):
+            states.setdefault(state, _zeros())['institution_count'] = n
+        states = dict(sorted(states.items()))
+        source, refreshed_at = "live", None
+
+    totals = _zeros()
+    for sums in states.values():
+        for f in SUM_FIELDS:
+            totals[f] += sums[f]
+    # Admins and users of deleted institutions belong to no state
+    totals['user_count'] += db.session.query(func.count(User.id)).filter(User.institution_id.is_(None)).scalar()
+    return {
+        "kpis": {"total_institutions": sum(s.get('institution_count', 0) for s in states.values()), **_summary(totals)},
+        "states": [{"state": state, "institutions": sums.get('institution_count', 0), **_summary(sums)}
+                   for state, sums in states.items()],
+        "source": source,
+        "refreshed_at": refreshed_at
+    }
+
+
+# --- Scheduled refresh ---
+
+def _schedule_refresh(interval):
+    job_id = None
+    while True:
+        time.sleep(interval)
+        job = job_queue.get(job_id) if job_id else None
+        if job and job['status'] in ('queued', 'running'):
+            continue
+        job_id = job_queue.submit('refresh_rollups', {'full': False})['id']
+
+
+def init_rollups(app):
+    """
+    ROLLUP_REFRESH='commit' applies the writing transaction's deltas to the rollups;
+    'deferred' only marks them for the refresh job, which ROLLUP_REFRESH_INTERVAL
+    (seconds, 0 = off) schedules periodically.
+    """
+    interval = float(app.config.get('ROLLUP_REFRESH_INTERVAL', 0))
+    if interval > 0:
+        threading.Thread(target=_schedule_refresh, args=(interval,), name='rollup-scheduler', daemon=True).start()
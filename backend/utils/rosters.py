@@ -0,0 +1,107 @@
+# Column maps and queries for institution student/teacher rosters
+import re
+
+from flask import request
+from sqlalchemy import and_, or_, false
+from sqlalchemy.sql import func
+
+from database import db
+from models import User, Student, Teacher
+from utils.export import FORMATS, stream_query, wants_gzip
+from utils.log import logger
+from utils.pagination import parse_fields
+
+# Public field name -> column; email comes from the joined users row, never a lazy load
+STUDENT_FIELDS = {
+    'id': Student.id, 'user_id': Student.user_id, 'name': Student.full_name,
+    'email': User.email, 'course': Student.course,
+    'gpa': Student.overall_gpa, 'attendance': Student.attendance_percentage
+}
+TEACHER_FIELDS = {
+    'id': Teacher.id, 'user_id': Teacher.user_id, 'name': Teacher.full_name,
+    'email': User.email, 'subject': Teacher.subject, 'avg_feedback': Teacher.avg_feedback
+}
+ROSTERS = {'students': (Student, STUDENT_FIELDS), 'teachers': (Teacher, TEACHER_FIELDS)}
+ROLES = {'students': 'student', 'teachers': 'teacher'}
+# Sort keys for class lists; nulls sort as 0 so the keyset cursor can compare them
+STUDENT_SORTS = {
+    'id': Student.id, 'name': Student.full_name,
+    'gpa': func.coalesce(Student.overall_gpa, 0),
+    'attendance': func.coalesce(Student.attendance_percentage, 0)
+}
+# Timetable class names follow "<course> - Sem <n>", e.g. "B.Tech CSE - Sem 4"
+CLASS_NAME_RE = re.compile(r'^\s*(.+?)\s*-\s*Sem(?:ester)?\s*(\d+)\s*$', re.IGNORECASE)
+
+
+def roster_query(kind, institution_id, fields):
+    """
+    Column-projected query over one institution's students or teachers.
+    The primary key is always selected (as 'id') so callers can paginate on it.
+    """
+    model, field_map = ROSTERS[kind]
+    names = fields if 'id' in fields else ['id'] + list(fields)
+    return db.session.query(*(field_map[name].label(name) for name in names)) \
+        .select_from(model).join(User, model.user_id == User.id) \
+        .filter(User.institution_id == institution_id, User.role == ROLES[kind])  # ix_users_institution_role
+
+
+def export_roster(kind, institution_id):
+    """
+    Streaming export of a roster: ?format=ndjson|csv&fields=...&gzip=1
+    Raises ValueError for bad arguments.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}' (use {' or '.join(FORMATS)})")
+    model, field_map = ROSTERS[kind]
+    fields = parse_fields(field_map)
+    query = roster_query(kind, institution_id, fields).order_by(model.id)
+    return stream_query(query, fields, fmt, filename=f"institution-{institution_id}-{kind}", gzip=wants_gzip())
+
+
+# --- Teacher class lists ---
+
+def parse_class_name(class_name):
+    """
+    (course, semester) for a timetable class name, or None if it does not follow the convention.
+    """
+    match = CLASS_NAME_RE.match(class_name or '')
+    return (match.group(1), int(match.group(2))) if match else None
+
+
+def unmatched_class_names(class_names):
+    """
+    Class names that do not follow the convention, and so match no students. Each
+    is logged once per process so a timetable that needs renaming gets noticed.
+    """
+    unmatched = sorted({name for name in class_names if parse_class_name(name) is None})
+    for name in unmatched:
+        if name not in _warned_class_names:
+            _warned_class_names.add(name)
+            logger.warning("Timetable class name does not match '<course> - Sem <n>'", extra={"class_name": name})
+    return unmatched
+
+
+_warned_class_names = set()
+
+
+def class_filter(class_names):
+    """
+    WHERE clause for students enrolled in the given timetable classes (course +
+    current semester); unparseable class names match nobody.
+    """
+    classes = {c for c in map(parse_class_name, class_names) if c}
+    if not classes:
+        return false()
+    return or_(*(and_(Student.course == course, Student.current_semester == semester)
+                 for course, semester in sorted(classes)))
+
+
+def class_student_query(institution_id, class_names, fields, sort_expr=None):
+    """
+    Column-projected query over the students enrolled in the given timetable classes.
+    """
+    query = roster_query('students', institution_id, fields)
+    if sort_expr is not None:
+        query = query.add_columns(sort_expr.label('_sort'))
+    return query.filter(class_filter(class_names))
@@ -0,0 +1,257 @@
+# Full-text search over institutions, students and portfolio projects:
+# SQLite FTS5 (external-content tables kept in sync by triggers) or MySQL FULLTEXT
+import re
+
+from flask import request
+from sqlalchemy import Float, Integer, and_, or_, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from database import db
+from models import Institution, Student, User, PortfolioProject
+from utils.pagination import decode_cursor, sorted_keyset_page
+from utils.serializers import row_serializer
+
+MAX_TERMS = 8
+MAX_QUERY_LENGTH = 100
+# Beyond this many matches (a one- or two-letter prefix) bm25 scores are nearly all
+# equal and scoring every row dominates the query: results come in id order instead.
+# Both engines match one- and two-letter prefixes (FTS5 through its prefix indexes,
+# MySQL through a LIKE fallback below innodb_ft_min_token_size, see MysqlFulltextSearch)
+RANK_MAX_MATCHES = 2000
+TOKEN_RE = re.compile(r'\w+')
+
+# index -> (table, indexed columns, bm25 weights per column)
+INDEXES = {
+    'institutions': ('institutions', ('name', 'state', 'district'), (10.0, 2.0, 2.0)),
+    'students': ('students', ('full_name', 'course'), (10.0, 2.0)),
+    'projects': ('portfolio_projects', ('title', 'description'), (5.0, 1.0)),
+}
+
+# index -> (model, public field -> column); every result query selects 'id'
+RESULTS = {
+    'institutions': (Institution, {'id': Institution.id, 'name': Institution.name, 'type': Institution.type,
+                                   'state': Institution.state, 'district': Institution.district}),
+    'students': (Student, {'id': Student.id, 'user_id': Student.user_id, 'name': Student.full_name,
+                           'course': Student.course, 'institution_id': User.institution_id}),
+    'projects': (PortfolioProject, {'id': PortfolioProject.id, 'title': PortfolioProject.title,
+                                    'student_id': PortfolioProject.student_id, 'student_name': Student.full_name,
+                                    'institution_id': User.institution_id}),
+}
+
+
+class SearchUnavailable(RuntimeError):
+    pass
+
+
+class Fts5Search:
+    """
+    One external-content FTS5 table per index (<table>_fts, rowid = the row's id),
+    maintained by AFTER INSERT/UPDATE/DELETE triggers so Core bulk writes are
+    covered too. 2- and 3-character prefix indexes keep typeahead queries cheap.
+    """
+    @staticmethod
+    def available(conn):
+        return bool(conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+    def install(self, conn):
+        for table, columns, _ in INDEXES.values():
+            fts = f"{table}_fts"
+            cols = ', '.join(columns)
+            new = ', '.join(f"new.{c}" for c in columns)
+            old = ', '.join(f"old.{c}" for c in columns)
+            conn.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END")
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END")
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END")
+        self.rebuild(conn)
+
+    def uninstall(self, conn):
+        for table, _, _ in INDEXES.values():
+            for suffix in ('ai', 'ad', 'au'):
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}_fts")
+
+    def rebuild(self, conn):
+        """
+        Re-read every row of the content tables (after a restore or a manual edit).
+        """
+        for table, _, _ in INDEXES.values():
+            conn.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+    @staticmethod
+    def _match(terms):
+        # Every term quoted (no FTS5 operators from user input) and prefix-matched
+        return ' '.join(f'"{t}"*' for t in terms)
+
+    def count(self, index, terms, cap):
+        fts = f"{INDEXES[index][0]}_fts"
+        return db.session.execute(text(f"SELECT count(*) FROM (SELECT 1 FROM {fts} WHERE {fts} MATCH :match LIMIT :cap)"),
+                                  {"match": self._match(terms), "cap": cap}).scalar()
+
+    def hits(self, index, terms, ranked=True):
+        table, _, weights = INDEXES[index]
+        fts = f"{table}_fts"
+        score = f"bm25({fts}, {', '.join(map(str, weights))})" if ranked else "0.0"
+        return text(f"SELECT rowid AS id, {score} AS score FROM {fts} WHERE {fts} MATCH :match") \
+            .bindparams(match=self._match(terms)).columns(id=Integer, score=Float).subquery('hits')
+
+
+class MysqlFulltextSearch:
+    """
+    InnoDB FULLTEXT index per table (ft_<table>), which MySQL maintains on every
+    write. Scores are negated relevance so both engines rank ascending.
+
+    InnoDB does not index words shorter than innodb_ft_min_token_size (default 3),
+    so a shorter term could never match: those terms are matched with LIKE as a
+    prefix of the value or of a space-separated word in it instead (a scan of the
+    rows the other terms leave, or of the table when every term is short).
+    """
+    min_token_size = None  # read from the server on first use
+
+    @staticmethod
+    def available(conn):
+        return True
+
+    def install(self, conn):
+        from migrations import has_index
+
+        for table, columns, _ in INDEXES.values():
+            if not has_index(conn, table, f"ft_{table}"):
+                conn.exec_driver_sql(f"CREATE FULLTEXT INDEX ft_{table} ON {table} ({', '.join(columns)})")
+
+    def uninstall(self, conn):
+        from migrations import drop_index
+
+        for table, _, _ in INDEXES.values():
+            drop_index(conn, f"ft_{table}", table)
+
+    def rebuild(self, conn):
+        for table, _, _ in INDEXES.values():
+            conn.exec_driver_sql(f"OPTIMIZE TABLE {table}")
+
+    @staticmethod
+    def _against(index):
+        return f"MATCH({', '.join(INDEXES[index][1])}) AGAINST (:match IN BOOLEAN MODE)"
+
+    def _where(self, index, terms):
+        """
+        (WHERE clause, bind values, whether it uses the FULLTEXT index): boolean mode
+        with every indexable term required and prefix-matched, plus a word-prefix LIKE
+        per shorter term.
+        """
+        if self.min_token_size is None:
+            MysqlFulltextSearch.min_token_size = int(
+                db.session.execute(text("SELECT @@innodb_ft_min_token_size")).scalar())
+        indexed = [t for t in terms if len(t) >= self.min_token_size]
+        clauses, params = [], {}
+        if indexed:
+            clauses.append(self._against(index))
+            params['match'] = ' '.join(f'+{t}*' for t in indexed)
+        for i, term in enumerate(t for t in terms if len(t) < self.min_token_size):
+            # Start of the value or of any word in it (\w tokens: only _ needs escaping)
+            params[f"short{i}"] = term.replace('_', '\\_') + '%'
+            params[f"short{i}_word"] = '% ' + params[f"short{i}"]
+            clauses.append('(' + ' OR '.join(f"{c} LIKE :short{i} OR {c} LIKE :short{i}_word"
+                                             for c in INDEXES[index][1]) + ')')
+        return ' AND '.join(clauses), params, bool(indexed)
+
+    def count(self, index, terms, cap):
+        table = INDEXES[index][0]
+        where, params = self._where(index, terms)[:2]
+        return db.session.execute(text(f"SELECT COUNT(*) FROM (SELECT 1 FROM {table} WHERE {where} "
+                                       f"LIMIT :cap) AS capped"), {**params, "cap": cap}).scalar()
+
+    def hits(self, index, terms, ranked=True):
+        table = INDEXES[index][0]
+        where, params, indexed = self._where(index, terms)
+        score = f"-{self._against(index)}" if ranked and indexed else "0.0"
+        return text(f"SELECT id, {score} AS score FROM {table} WHERE {where}") \
+            .bindparams(**params).columns(id=Integer, score=Float).subquery('hits')
+
+
+ENGINES = {'sqlite': Fts5Search, 'mysql': MysqlFulltextSearch}
+
+
+def search_engine(dialect_name):
+    """
+    The engine for a database dialect, or None if it has no full-text support here.
+    """
+    cls = ENGINES.get(dialect_name)
+    return cls() if cls else None
+
+
+def parse_terms(q):
+    """
+    Lower-case word tokens of a user query (punctuation and operators dropped).
+    Raises ValueError when nothing searchable is left.
+    """
+    if len(q or '') > MAX_QUERY_LENGTH:
+        raise ValueError(f"q must be at most {MAX_QUERY_LENGTH} characters")
+    terms = list(dict.fromkeys(TOKEN_RE.findall((q or '').lower())))[:MAX_TERMS]
+    if not terms:
+        raise ValueError("q must contain at least one letter or digit")
+    return terms
+
+
+def _page(hits, cursor, limit):
+    """
+    The next limit + 1 hits after the cursor, ordered inside the index query.
+    """
+    page = select(hits.c.id, hits.c.score)
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        page = page.where(or_(hits.c.score > value, and_(hits.c.score == value, hits.c.id > last_id)))
+    return page.order_by(hits.c.score, hits.c.id).limit(limit + 1).subquery('page')
+
+
+def text_search(index, q, institution_id=None, cursor=None, limit=20):
+    """
+    One page of rows matching every term of q as a prefix, best match first.
+    Returns (items, next_cursor). Raises ValueError for a bad query or cursor,
+    SearchUnavailable when the database has no search index.
+    """
+    engine = search_engine(db.engine.dialect.name)
+    if engine is None:
+        raise SearchUnavailable(f"Full-text search is not supported on {db.engine.dialect.name}")
+    terms = parse_terms(q)
+    model, field_map = RESULTS[index]
+    scoped = institution_id is not None and index != 'institutions'
+    try:
+        hits = engine.hits(index, terms, ranked=engine.count(index, terms, RANK_MAX_MATCHES + 1) <= RANK_MAX_MATCHES)
+        if not scoped:
+            # Every hit is a result, so only one page of them needs joining to the rows
+            hits = _page(hits, cursor, limit)
+        query = db.session.query(*(column.label(name) for name, column in field_map.items()),
+                                 hits.c.score.label('_sort')).select_from(hits).join(model, model.id == hits.c.id)
+        if index == 'projects':
+            query = query.join(Student, Student.id == PortfolioProject.student_id)
+        if index in ('students', 'projects'):
+            query = query.join(User, User.id == Student.user_id)
+            if scoped:
+                query = query.filter(User.institution_id == institution_id)
+        rows, next_cursor = sorted_keyset_page(query, hits.c.score, model.id, cursor, limit)
+    except (OperationalError, ProgrammingError) as e:
+        db.session.rollback()
+        raise SearchUnavailable("Search index is not built (run: python migrate.py upgrade)") from e
+    return row_serializer(field_map).many(rows), next_cursor
+
+
+def parse_text_search_args(indexes):
+    """
+    Read ?q=&type=. Raises ValueError on bad input.
+    """
+    index = request.args.get('type', indexes[0])
+    if index not in indexes:
+        raise ValueError(f"type must be one of: {', '.join(indexes)}")
+    q = request.args.get('q', '')
+    parse_terms(q)
+    return index, q
@@ -1,6 +1,9 @@
 CREATE DATABASE IF NOT EXISTS edusamagra_db;
 USE edusamagra_db;
 
+-- Existing databases: bring them up to date with `python backend/migrate.py upgrade`
+-- (versioned and idempotent, so it is also safe to run after this script).
+
 -- 1. Institutions Table
 CREATE TABLE IF NOT EXISTS institutions (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -19,6 +22,7 @@ CREATE TABLE IF NOT EXISTS users (
     role ENUM('student', 'teacher', 'institution', 'admin') NOT NULL,
     institution_id INT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_users_institution_role (institution_id, role),
     FOREIGN KEY (institution_id) REFERENCES institutions(id) ON DELETE SET NULL
 );
 
@@ -31,6 +35,7 @@ CREATE TABLE IF NOT EXISTS students (
     current_semester INT DEFAULT 1,
     overall_gpa DECIMAL(3, 2) DEFAULT 0.00,
     attendance_percentage DECIMAL(5, 2) DEFAULT 100.00,
+    INDEX ix_students_course_semester (course, current_semester),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
@@ -51,6 +56,7 @@ CREATE TABLE IF NOT EXISTS records (
     semester INT NOT NULL,
     gpa DECIMAL(3, 2) NOT NULL,
     attendance DECIMAL(5, 2) NOT NULL,
+    INDEX ix_records_student_semester (student_id, semester),
     FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE
 );
 
@@ -59,7 +65,8 @@ CREATE TABLE IF NOT EXISTS schemes (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     description TEXT,
-    status ENUM('active', 'inactive') DEFAULT 'active'
+    status ENUM('active', 'inactive') DEFAULT 'active',
+    INDEX ix_schemes_status (status)
 );
 
 -- 7. AI Insights
@@ -71,11 +78,54 @@ CREATE TABLE IF NOT EXISTS ai_insights (
     risk_level ENUM('low', 'medium', 'high', 'N/A') DEFAULT 'N/A',
     confidence DECIMAL(5, 2) DEFAULT 0.00,
     prediction_text TEXT,
+    inputs_signature VARCHAR(64),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_ai_insights_user_type (user_id, insight_type),
+    INDEX ix_ai_insights_institution_type (institution_id, insight_type),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
     FOREIGN KEY (institution_id) REFERENCES institutions(id) ON DELETE SET NULL
 );
 
+-- 7b. Users whose AI insight inputs changed since the last materialization
+CREATE TABLE IF NOT EXISTS ai_insight_dirty (
+    user_id INT PRIMARY KEY,
+    marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- 7c. KPI rollups (sums and counts, refreshed on writes or by the refresh job)
+CREATE TABLE IF NOT EXISTS institution_rollups (
+    institution_id INT PRIMARY KEY,
+    user_count INT NOT NULL DEFAULT 0,
+    student_count INT NOT NULL DEFAULT 0,
+    teacher_count INT NOT NULL DEFAULT 0,
+    gpa_sum DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    gpa_count INT NOT NULL DEFAULT 0,
+    attendance_sum DECIMAL(16, 2) NOT NULL DEFAULT 0,
+    attendance_count INT NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS state_rollups (
+    state VARCHAR(100) PRIMARY KEY,
+    institution_count INT NOT NULL DEFAULT 0,
+    user_count INT NOT NULL DEFAULT 0,
+    student_count INT NOT NULL DEFAULT 0,
+    teacher_count INT NOT NULL DEFAULT 0,
+    gpa_sum DECIMAL(16, 2) NOT NULL DEFAULT 0,
+    gpa_count INT NOT NULL DEFAULT 0,
+    attendance_sum DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    attendance_count INT NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Institutions waiting for a deferred rollup refresh
+CREATE TABLE IF NOT EXISTS rollup_dirty (
+    institution_id INT PRIMARY KEY,
+    marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- 8. Teacher Qualifications
 CREATE TABLE IF NOT EXISTS teacher_qualifications (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -83,6 +133,7 @@ CREATE TABLE IF NOT EXISTS teacher_qualifications (
     degree VARCHAR(100) NOT NULL,
     university VARCHAR(255) NOT NULL,
     year_completed INT,
+    INDEX ix_teacher_qualifications_teacher (teacher_id),
     FOREIGN KEY (teacher_id) REFERENCES teachers(id) ON DELETE CASCADE
 );
 
@@ -93,6 +144,7 @@ CREATE TABLE IF NOT EXISTS events (
     title VARCHAR(255) NOT NULL,
     description TEXT,
     event_date DATE NOT NULL,
+    INDEX ix_events_institution_date (institution_id, event_date DESC),
     FOREIGN KEY (institution_id) REFERENCES institutions(id) ON DELETE CASCADE
 );
 
@@ -106,6 +158,68 @@ CREATE TABLE IF NOT EXISTS timetables (
     day_of_week ENUM('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday') NOT NULL,
     start_time TIME NOT NULL,
     end_time TIME NOT NULL,
+    INDEX ix_timetables_teacher (teacher_id),
     FOREIGN KEY (institution_id) REFERENCES institutions(id) ON DELETE CASCADE,
     FOREIGN KEY (teacher_id) REFERENCES teachers(id) ON DELETE SET NULL
-);
\ No newline at end of file
+);
+-- 11. Student Portfolio Projects
+CREATE TABLE IF NOT EXISTS portfolio_projects (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    student_id INT NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    description TEXT,
+    project_link VARCHAR(500),
+    tags VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_portfolio_projects_student_created (student_id, created_at),
+    FOREIGN KEY (student_id) REFERENCES students(id)
+);
+
+-- 12. Tag catalog (normalized portfolio_projects.tags, kept in sync by backend/utils/catalog.py)
+CREATE TABLE IF NOT EXISTS tags (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS project_tags (
+    project_id INT NOT NULL,
+    tag_id INT NOT NULL,
+    PRIMARY KEY (project_id, tag_id),
+    INDEX ix_project_tags_tag_project (tag_id, project_id),
+    FOREIGN KEY (project_id) REFERENCES portfolio_projects(id) ON DELETE CASCADE,
+    FOREIGN KEY (tag_id) REFERENCES tags(id)
+);
+
+-- 13. Skill catalog (normalized student_skills.skill_name)
+CREATE TABLE IF NOT EXISTS skills (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE
+);
+
+-- 14. Student Skills
+CREATE TABLE IF NOT EXISTS student_skills (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    student_id INT NOT NULL,
+    skill_name VARCHAR(100) NOT NULL,
+    category VARCHAR(100),
+    skill_id INT,
+    INDEX ix_student_skills_student (student_id),
+    INDEX ix_student_skills_skill_student (skill_id, student_id),
+    FOREIGN KEY (student_id) REFERENCES students(id),
+    FOREIGN KEY (skill_id) REFERENCES skills(id)
+);
+
+-- 15. Student Links
+CREATE TABLE IF NOT EXISTS student_links (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    student_id INT NOT NULL,
+    title VARCHAR(100) NOT NULL,
+    url VARCHAR(500) NOT NULL,
+    INDEX ix_student_links_student (student_id),
+    FOREIGN KEY (student_id) REFERENCES students(id)
+);
+
+-- Full-text search (institutions, students, portfolio_projects) is not declared here:
+-- backend/migrations/0004_full_text_search.py creates it (FULLTEXT indexes ft_<table>
+-- on MySQL, FTS5 tables and triggers on SQLite) and builds it from the existing rows.
+-- Run `python backend/migrate.py upgrade` after this script, or /api/*/search returns 503.
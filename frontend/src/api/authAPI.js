@@ -14,7 +14,15 @@ export const signup = async (email, password, role, fullName) => {
     await axiosInstance.post('/signup', { email, password, role, fullName, institutionId });
 };
 
-export const logout = () => {
-    localStorage.removeItem('access_token');
-    localStorage.removeItem('user_role');
+export const logout = async () => {
+    // Revoke the token server-side before clearing it: the request interceptor reads
+    // the token from localStorage asynchronously. Local logout proceeds regardless.
+    try {
+        await axiosInstance.post('/logout');
+    } catch (err) {
+        // Expired token or server unreachable: nothing left to revoke
+    } finally {
+        localStorage.removeItem('access_token');
+        localStorage.removeItem('user_role');
+    }
 };
\ No newline at end of file
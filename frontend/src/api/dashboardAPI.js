@@ -4,6 +4,12 @@ const getDashboardData = (role) => {
     return axiosInstance.get(`/${role}/dashboard`);
 };
 
+// params: { class, sort, order, limit, cursor }
+const getClassStudents = (params = {}) => {
+    return axiosInstance.get('/teacher/students', { params });
+};
+
 export const dashboardAPI = {
     getDashboardData,
-};
\ No newline at end of file
+    getClassStudents,
+};
@@ -17,8 +17,8 @@ const Navbar = ({ role, userName }) => {
     ];
     // --- End Mock ---
 
-    const handleLogout = () => {
-        logout();
+    const handleLogout = async () => {
+        await logout();
         navigate('/login');
     };
 
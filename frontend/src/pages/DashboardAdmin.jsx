@@ -99,7 +99,7 @@ const DashboardAdmin = () => {
                         <ResponsiveContainer width="100%" height={300}>
                             <LineChart data={charts?.enrolment_trend || []}>
                                 <CartesianGrid strokeDasharray="3 3" strokeOpacity={0.3} />
-                                <XAxis dataKey="year" tick={{ fill: '#6b7280', fontSize: 12 }} />
+                                <XAxis dataKey="period" tick={{ fill: '#6b7280', fontSize: 12 }} />
                                 <YAxis tick={{ fill: '#6b7280', fontSize: 12 }} />
                                 <Tooltip /> <Legend />
                                 <Line type="monotone" dataKey="students" stroke="#06b6d4" strokeWidth={2} activeDot={{ r: 6 }} dot={false} />
@@ -1,13 +1,32 @@
-import React from 'react'; // Removed useEffect, useState
+import React, { useEffect, useState } from 'react';
 // Removed DashboardLayout and TeachersSideBar imports
 import ChartCard from '../components/common/ChartCard';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
+import { dashboardAPI } from '../api/dashboardAPI';
 // Removed link/icon imports as they are handled by MainLayout
 
 // Component now receives dashboardData as a prop
 const DashboardTeacher = ({ dashboardData }) => {
     // --- Data Preparation (Using Data from MainLayout) ---
-    const { profile, kpis, students = [], charts } = dashboardData || {};
+    const { profile, kpis, students: firstPage, students_next_cursor, charts } = dashboardData || {};
+    // Class roster: the dashboard's first page, then /teacher/students pages in the same order
+    const [students, setStudents] = useState([]);
+    const [cursor, setCursor] = useState(null);
+
+    useEffect(() => {
+        setStudents(firstPage || []);
+        setCursor(students_next_cursor ?? null);
+    }, [firstPage, students_next_cursor]);
+
+    const loadMore = async () => {
+        try {
+            const response = await dashboardAPI.getClassStudents({ sort: 'name', order: 'asc', cursor });
+            setStudents(rows => [...rows, ...response.data.students]);
+            setCursor(response.data.next_cursor);
+        } catch (err) {
+            console.error("Failed to load more students", err);
+        }
+    };
 
     // Check if data is still loading (passed as empty object)
     if (!profile) {
@@ -21,7 +40,7 @@ const DashboardTeacher = ({ dashboardData }) => {
     ];
 
     // Use data?.students safely
-    const studentAttendanceData = students.slice(0, 4).map(s => ({
+    const studentAttendanceData = students.map(s => ({
         name: s.name,
         percentage: s.attendance || 90.0, // Use 90 as fallback
         count: `${Math.round(((s.attendance || 90) / 100) * 28)} of 28`
@@ -76,6 +95,11 @@ const DashboardTeacher = ({ dashboardData }) => {
                         </tbody>
                     </table>
                 </div>
+                {cursor !== null && (
+                    <button onClick={loadMore} className="mt-3 text-sm text-primary-600 hover:underline">
+                        Load more
+                    </button>
+                )}
             </div>
 
             <div className="grid grid-cols-1 md:grid-cols-2 gap-6 animate-fade-in-up" style={{ animationDelay: '200ms' }}>
@@ -15,6 +15,9 @@ const InstitutionDetailAdmin = () => {
     const [institutionData, setInstitutionData] = useState(null);
     const [students, setStudents] = useState([]);
     const [teachers, setTeachers] = useState([]);
+    // Keyset cursors for the next page of each roster (null when fully loaded)
+    const [cursors, setCursors] = useState({ students: null, teachers: null });
+    const [counts, setCounts] = useState({ students: 0, teachers: 0 });
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
 
@@ -26,11 +29,19 @@ const InstitutionDetailAdmin = () => {
             setError('');
             try {
                 // Call the correct backend endpoint
-                const response = await axiosInstance.get(`/admin/institutions/${institutionId}/details`);
+                const [response, countsResponse] = await Promise.all([
+                    axiosInstance.get(`/admin/institutions/${institutionId}/details`),
+                    axiosInstance.get(`/admin/institutions/${institutionId}/counts`)
+                ]);
 
                 setInstitutionData(response.data.institution);
                 setStudents(response.data.students);
                 setTeachers(response.data.teachers);
+                setCursors({
+                    students: response.data.students_next_after_id,
+                    teachers: response.data.teachers_next_after_id
+                });
+                setCounts(countsResponse.data);
             } catch (err) {
                 console.error("Failed to fetch institution details", err);
                 setError(`Failed to load data for Institution ID: ${institutionId}.`);
@@ -41,6 +52,25 @@ const InstitutionDetailAdmin = () => {
         fetchData();
     }, [institutionId]);
 
+    const loadMore = async (kind) => {
+        try {
+            const response = await axiosInstance.get(`/admin/institutions/${institutionId}/${kind}`, {
+                params: { after_id: cursors[kind] }
+            });
+            const setRows = kind === 'students' ? setStudents : setTeachers;
+            setRows(rows => [...rows, ...response.data.items]);
+            setCursors(c => ({ ...c, [kind]: response.data.next_after_id }));
+        } catch (err) {
+            console.error(`Failed to load more ${kind}`, err);
+        }
+    };
+
+    const loadMoreButton = (kind) => cursors[kind] !== null && (
+        <button onClick={() => loadMore(kind)} className="mt-3 text-sm text-primary-600 hover:underline">
+            Load more
+        </button>
+    );
+
     if (loading) {
         return <div className="p-6 text-center text-xl text-text-secondary">Loading Institution Details...</div>;
     }
@@ -74,7 +104,7 @@ const InstitutionDetailAdmin = () => {
             {/* Students Table */}
             <div className="bg-light-card p-4 rounded-lg shadow-md">
                 <DataTable
-                    title={`Students (${students.length})`}
+                    title={`Students (${counts.students})`}
                     columns={['ID', 'Name', 'Email', 'Course', 'GPA', 'Attendance']}
                     data={students.map(s => ({
                         id: s.id,
@@ -85,12 +115,13 @@ const InstitutionDetailAdmin = () => {
                         attendance: s.attendance ? `${s.attendance}%` : 'N/A'
                     }))}
                 />
+                {loadMoreButton('students')}
             </div>
 
             {/* Teachers Table */}
             <div className="bg-light-card p-4 rounded-lg shadow-md">
                 <DataTable
-                    title={`Teachers (${teachers.length})`}
+                    title={`Teachers (${counts.teachers})`}
                     columns={['ID', 'Name', 'Email', 'Subject', 'Feedback']}
                     data={teachers.map(t => ({
                         id: t.id,
@@ -100,6 +131,7 @@ const InstitutionDetailAdmin = () => {
                         avg_feedback: t.avg_feedback || 'N/A'
                     }))}
                 />
+                {loadMoreButton('teachers')}
             </div>
         </div>
         // --- END Removed DashboardLayout Wrapper ---